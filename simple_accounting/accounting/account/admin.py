@@ -1,7 +1,9 @@
 from django.contrib import admin, messages
-from django.db import transaction
+from django.db import transaction, models
 from .forms import AccountForm
+from .search import search_accounts, ranked_account_ids
 from django.forms.models import model_to_dict
+from accounting.routers import ReplicaChangelistMixin
 
 class AccountActiveListFilter(admin.SimpleListFilter):
 
@@ -19,23 +21,36 @@ class AccountActiveListFilter(admin.SimpleListFilter):
       return queryset
     return queryset.filter(inactive = self.value()=='0')
 
-class AccountAdmin(admin.ModelAdmin):
+class AccountAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
   form = AccountForm
   fieldsets = [
     (
       "Account Info", {
-        "fields": ('name', 'parent', 'account_type', 'account_number', 'description', 'inactive')
+        "fields": ('name', 'parent', 'account_type', 'account_number', 'entity', 'description', 'inactive')
       }
     )
   ]
   list_display = ('__str__', 'account_type', 'is_active')
   list_display_links = ('__str__',)
   ordering = ('account_number',)
-  list_filter = ('account_type', AccountActiveListFilter,)
+  list_filter = ('account_type', 'entity', AccountActiveListFilter,)
   search_fields = ('name', 'account_number',)
   autocomplete_fields=('parent',)
   actions = ('make_active', 'make_inactive',)
 
+  def get_search_results(self, request, queryset, search_term):
+    if not search_term.strip():
+      return super().get_search_results(request, queryset, search_term)
+    match = getattr(request, 'resolver_match', None)
+    if match is None or match.url_name != 'autocomplete':
+      return search_accounts(search_term, queryset), False
+    # autocomplete only shows the top results, served from the hot prefix cache
+    ids = ranked_account_ids(search_term)
+    if not ids:
+      return queryset.none(), False
+    rank = models.Case(*(models.When(pk=pk, then=models.Value(i)) for i, pk in enumerate(ids)), output_field=models.IntegerField())
+    return queryset.filter(pk__in=ids).order_by(rank), False
+
   def is_active(self, account):
     return not account.inactive
   
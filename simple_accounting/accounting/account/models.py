@@ -1,7 +1,20 @@
-from django.db import models
+from django.db import models, transaction
 from datetime import datetime
-from django.db import transaction
-from accounting.utils import comply
+from django.utils import timezone
+from accounting.utils import comply, tokenize
+from accounting.metrics.registry import timed
+from accounting.journal.recorder import Journaled, record_update
+from accounting.entity.models import Entity
+from accounting.checkpoint.models import Checkpoint
+
+CHART_VERSION = 'chart.version'
+
+def chart_version() -> str:
+  return Checkpoint.version(CHART_VERSION)
+
+def chart_changed():
+  """invalidates everything derived from the chart (tree, search caches) once the change commits"""
+  Checkpoint.bump(CHART_VERSION)
 
 class AccountQuerySet(models.QuerySet):
 
@@ -14,9 +27,22 @@ class AccountQuerySet(models.QuerySet):
 
   @comply(version)
   def update(self, **kwargs) -> int:
-    return super().update(**kwargs)
+    # auto_now is only applied by save(), incremental jobs walk updated_at
+    kwargs.setdefault('updated_at', timezone.now())
+    renamed = list(self.values_list('pk', flat=True)) if 'name' in kwargs else []
+    updated = record_update(self, kwargs, super().update)
+    if updated:
+      chart_changed()
+    if renamed:
+      AccountNameToken.index(Account.objects.filter(pk__in=renamed))
+    return updated
+
+  def delete(self):
+    result = super().delete()
+    chart_changed()
+    return result
 
-class Account(models.Model):
+class Account(Journaled, models.Model):
 
   objects = AccountQuerySet.as_manager()
 
@@ -35,6 +61,13 @@ class Account(models.Model):
   created_at: datetime = models.DateTimeField(auto_now_add=True)
   updated_at: datetime = models.DateTimeField(auto_now=True)
   inactive: bool = models.BooleanField(default=False)
+  # numbers stay unique across entities, subtrees are found by number prefix
+  entity: Entity = models.ForeignKey(Entity, null=True, blank=True, on_delete=models.PROTECT, related_name='accounts')
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['entity', 'account_number']),
+    ]
 
   _inactive_changed = False
 
@@ -44,11 +77,47 @@ class Account(models.Model):
     return super().__setattr__(__name, __value)
 
   def save(self, **kwargs):
+    if self.parent_id is not None and self.entity_id is None:
+      self.entity_id = self.parent.entity_id
     with transaction.atomic():
       super(Account, self).save(**kwargs)
       if self._inactive_changed:
-        Account.objects.filter(account_number__startswith=self.account_number).update(inactive=self.inactive, __v=1)
+        with timed('Account.save.inactive_cascade'):
+          Account.objects.filter(account_number__startswith=self.account_number).update(inactive=self.inactive, __v=1)
         self._inactive_changed = False
+      AccountNameToken.index([self])
+      chart_changed()
+
+  def delete(self, **kwargs):
+    with transaction.atomic():
+      result = super(Account, self).delete(**kwargs)
+      chart_changed()
+    return result
 
   def __str__(self):
     return f"{self.account_number} - {self.name}"
+
+
+class AccountNameToken(models.Model):
+  """Normalized words of account names, searched by prefix instead of LIKE '%term%' scans"""
+
+  account: Account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='name_tokens')
+  token: str = models.CharField(max_length=64)
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['token', 'account']),
+    ]
+
+  @classmethod
+  def index(cls, accounts):
+    accounts = list(accounts)
+    cls.objects.filter(account__in=[account.pk for account in accounts]).delete()
+    cls.objects.bulk_create(
+      cls(account_id=account.pk, token=token)
+      for account in accounts
+      for token in tokenize(account.name)
+    )
+
+  def __str__(self):
+    return self.token
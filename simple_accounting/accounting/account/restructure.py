@@ -0,0 +1,72 @@
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models.functions import Concat, Substr
+from .models import Account
+from .tree import AccountTree
+
+def _renumber(queryset, old: str, new: str) -> int:
+  return queryset.update(
+    account_number=Concat(models.Value(new), Substr('account_number', len(old) + 1), output_field=models.CharField()),
+    __v=1,
+  )
+
+def move_subtree(account: Account, parent: Account = None, account_number: str = None) -> int:
+  """
+  Moves `account` with all its descendants under `parent` (None for a root
+  account) and renames the number prefix of the whole subtree to
+  `account_number`, by default the parent number plus the last segment of
+  the current number. Only the subtree's rows are read to validate it, and
+  they are renumbered with one prefix replacing UPDATE; returns the accounts
+  renumbered. Accounts stay in their entity.
+  """
+  with transaction.atomic():
+    locked = [account.pk] + ([parent.pk] if parent else [])
+    rows = {row.pk: row for row in Account.objects.select_for_update().filter(pk__in=locked)}
+    account = rows[account.pk]
+    parent = rows[parent.pk] if parent else None
+    old = account.account_number
+    if account_number is None:
+      segment = old.rsplit('.', 1)[-1]
+      account_number = f'{parent.account_number}.{segment}' if parent else segment
+    new = account_number
+    # the subtree is exactly the account and the numbers under its prefix
+    in_subtree = models.Q(pk=account.pk) | models.Q(account_number__startswith=f'{old}.')
+    rows = list(Account.objects.filter(in_subtree).values_list('id', 'parent_id', 'account_type', 'account_number', 'inactive'))
+    tree = AccountTree(row[:4] for row in rows)
+    ids = {row[0] for row in rows}
+    errors = []
+    if parent is not None and parent.pk in ids:
+      errors.append(f'{parent} is inside the moved subtree')
+    if parent is not None and parent.entity_id != account.entity_id:
+      errors.append(f"{account} can't move under {parent} of another entity")
+    if parent is not None and not new.startswith(f'{parent.account_number}.'):
+      errors.append(f'account number should have the prefix {parent.account_number}.')
+    if parent is not None and any(row[2] != parent.account_type for row in rows):
+      errors.append("account type should be same as parent's account type")
+    if parent is not None and parent.inactive and any(not row[4] for row in rows):
+      errors.append("can't move active accounts under an inactive parent")
+    if Account.objects.filter(parent__in=ids).exclude(pk__in=ids).exists():
+      errors.append(f'sub accounts of {old} do not all have it as prefix, fix them first')
+    longest = max(len(row[3]) for row in rows)
+    if longest - len(old) + len(new) > Account._meta.get_field('account_number').max_length:
+      errors.append('renumbered account numbers would be too long')
+    if errors:
+      raise ValidationError(errors)
+    position = tree.positions[account.pk]
+    if tree.ends[position] - position != len(rows):
+      raise ValidationError(f'accounts outside the subtree use the prefix {old}.')
+    taken = Account.objects.filter(models.Q(account_number=new) | models.Q(account_number__startswith=f'{new}.')).exclude(in_subtree)
+    if new != old and taken.exists():
+      raise ValidationError(f'account numbers under {new} are already taken: {", ".join(taken.values_list("account_number", flat=True)[:5])}')
+    renumbered = 0
+    if new != old:
+      if new.startswith(f'{old}.') or old.startswith(f'{new}.'):
+        # overlapping prefixes could collide row by row on the unique index, go through a free prefix
+        scratch = f'~{account.pk}'
+        _renumber(Account.objects.filter(in_subtree), old, scratch)
+        renumbered = _renumber(Account.objects.filter(models.Q(pk=account.pk) | models.Q(account_number__startswith=f'{scratch}.')), scratch, new)
+      else:
+        renumbered = _renumber(Account.objects.filter(in_subtree), old, new)
+    if account.parent_id != (parent.pk if parent else None):
+      Account.objects.filter(pk=account.pk).update(parent=parent, __v=1)
+  return renumbered
@@ -0,0 +1,58 @@
+import hashlib
+from typing import List
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from accounting.utils import tokenize
+from .models import Account, AccountNameToken, chart_version
+
+def _rank(term: str):
+  return models.Case(
+    models.When(account_number=term, then=models.Value(0)),
+    models.When(account_number__startswith=term, then=models.Value(1)),
+    default=models.Value(2),
+    output_field=models.IntegerField(),
+  )
+
+def _name_matches(tokens: List[str]):
+  """ids of accounts having, for every search token, a name token starting with it"""
+  hits = {f'hit_{i}': models.Count('id', filter=models.Q(token__startswith=token)) for i, token in enumerate(tokens)}
+  matches = models.Q()
+  for token in tokens:
+    matches |= models.Q(token__startswith=token)
+  return (
+    AccountNameToken.objects
+      .filter(matches)
+      .values('account_id')
+      .annotate(**hits)
+      .filter(**{f'{hit}__gt': 0 for hit in hits})
+      .values('account_id')
+  )
+
+def search_accounts(term: str, queryset=None):
+  """
+  Accounts matching term, exact account number first, then account number
+  prefixes, then accounts whose name has words starting with every word of
+  term. All three use indexes: account_number and (token, account).
+  """
+  queryset = Account.objects.all() if queryset is None else queryset
+  term = term.strip()
+  if not term:
+    return queryset
+  condition = models.Q(account_number__startswith=term)
+  tokens = tokenize(term)
+  if tokens:
+    condition |= models.Q(pk__in=_name_matches(tokens))
+  return queryset.filter(condition).annotate(search_rank=_rank(term)).order_by('search_rank', 'account_number')
+
+def ranked_account_ids(term: str, limit: int = None) -> List[int]:
+  """first `limit` ids of search_accounts(term), cached per term until the chart changes"""
+  limit = limit or getattr(settings, 'ACCOUNTING_ACCOUNT_SEARCH_CACHE_SIZE', 100)
+  term = term.strip()
+  digest = hashlib.md5(term.encode()).hexdigest()
+  key = f'accounting:account-search:{chart_version()}:{limit}:{digest}'
+  ids = cache.get(key)
+  if ids is None:
+    ids = list(search_accounts(term).values_list('pk', flat=True)[:limit])
+    cache.set(key, ids, getattr(settings, 'ACCOUNTING_ACCOUNT_SEARCH_CACHE_TIMEOUT', 300))
+  return ids
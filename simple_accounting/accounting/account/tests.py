@@ -1,6 +1,14 @@
 from django.test import TestCase
-from .models import Account
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from accounting.checkpoint.models import Checkpoint
+from accounting.entity.models import Entity
+from .models import Account, CHART_VERSION
 from .forms import AccountForm
+from .tree import AccountTree
+from .search import search_accounts, ranked_account_ids
+from .restructure import move_subtree
+
 class AccountFormTest(TestCase):
 
   sample_asset = {
@@ -223,3 +231,153 @@ class AccountModelTest(TestCase):
   def test_str_representation(self):
     """Account shows it's representation in str properly"""
     self.assertEqual(str(Account(**self.sample_asset)), "1 - Cash")
+
+
+class AccountTreeTest(TestCase):
+
+  def setUp(self):
+    cache.clear()
+    self.assets = Account(name="Assets", account_number="1", account_type=Account.AccountTypes.ASSET)
+    self.assets.save()
+    self.cash = Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET, parent=self.assets)
+    self.cash.save()
+    self.petty = Account(name="Petty Cash", account_number="1.1.1", account_type=Account.AccountTypes.ASSET, parent=self.cash)
+    self.petty.save()
+    self.bank = Account(name="Bank", account_number="1.2", account_type=Account.AccountTypes.ASSET, parent=self.assets)
+    self.bank.save()
+    self.equity = Account(name="Equity", account_number="3", account_type=Account.AccountTypes.EQUITY)
+    self.equity.save()
+
+  def test_builds_preorder_from_one_query(self):
+    """tree is built in preorder from a single query"""
+    with self.assertNumQueries(1):
+      tree = AccountTree.build()
+    self.assertEqual(list(tree.ids), [self.assets.pk, self.cash.pk, self.petty.pk, self.bank.pk, self.equity.pk])
+    self.assertEqual(sorted(tree.subtree(self.cash.pk)), sorted([self.cash.pk, self.petty.pk]))
+    self.assertEqual(tree.ancestors(self.petty.pk), [self.cash.pk, self.assets.pk])
+    self.assertEqual(tree.depth(self.petty.pk), 2)
+    self.assertTrue(tree.is_leaf(self.bank.pk))
+    self.assertEqual(tree.account_type(self.equity.pk), Account.AccountTypes.EQUITY)
+
+  def test_rolls_up_subtree_totals(self):
+    """subtree totals include every descendant"""
+    tree = AccountTree.build()
+    rollup = tree.rollup({self.cash.pk: 10, self.petty.pk: 5, self.bank.pk: 100, self.equity.pk: 115})
+    self.assertEqual(rollup.total(self.assets.pk), 115)
+    self.assertEqual(rollup.total(self.cash.pk), 15)
+    self.assertEqual(rollup.totals()[self.equity.pk], 115)
+
+  def test_current_tree_is_rebuilt_when_chart_changes(self):
+    """shared tree is reused until the chart changes, in this or any other process"""
+    tree = AccountTree.current()
+    with self.assertNumQueries(1):
+      self.assertIs(AccountTree.current(), tree)
+    Checkpoint.bump(CHART_VERSION)
+    self.assertIsNot(AccountTree.current(), tree)
+    tree = AccountTree.current()
+    with self.captureOnCommitCallbacks(execute=True):
+      Account(name="Loan", account_number="2", account_type=Account.AccountTypes.LIABILITY).save()
+    self.assertIsNot(AccountTree.current(), tree)
+    self.assertEqual(len(AccountTree.current()), 6)
+
+class AccountSearchTest(TestCase):
+
+  def setUp(self):
+    cache.clear()
+    self.cash = Account(name="Petty Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET)
+    self.cash.save()
+    self.bank = Account(name="Bank - Crédit Agricole", account_number="1.10", account_type=Account.AccountTypes.ASSET)
+    self.bank.save()
+    self.sales = Account(name="Cash Sales", account_number="4.1", account_type=Account.AccountTypes.REVENUE)
+    self.sales.save()
+
+  def test_name_tokens_are_kept_in_sync(self):
+    """name tokens are normalized and follow renames"""
+    self.assertEqual(sorted(self.bank.name_tokens.values_list('token', flat=True)), ['agricole', 'bank', 'credit'])
+    self.bank.name = 'Bank Asia'
+    self.bank.save()
+    self.assertEqual(sorted(self.bank.name_tokens.values_list('token', flat=True)), ['asia', 'bank'])
+
+  def test_exact_number_ranks_first(self):
+    """exact account number matches come before prefix matches"""
+    self.assertEqual(list(search_accounts('1.1')), [self.cash, self.bank])
+    self.assertEqual(list(search_accounts('1.10')), [self.bank])
+
+  def test_matches_name_word_prefixes(self):
+    """every search word must start a word of the name"""
+    self.assertEqual(list(search_accounts('cas')), [self.cash, self.sales])
+    self.assertEqual(list(search_accounts('cash sal')), [self.sales])
+    self.assertEqual(list(search_accounts('credit')), [self.bank])
+    self.assertEqual(list(search_accounts('ash')), [])
+
+  def test_hot_prefixes_are_cached(self):
+    """repeated searches are served from the cache until the chart changes"""
+    self.assertEqual(ranked_account_ids('cash'), [self.cash.pk, self.sales.pk])
+    with self.assertNumQueries(1):
+      self.assertEqual(ranked_account_ids('cash'), [self.cash.pk, self.sales.pk])
+    with self.captureOnCommitCallbacks(execute=True):
+      Account(name="Cash in Transit", account_number="1.3", account_type=Account.AccountTypes.ASSET).save()
+    self.assertEqual(len(ranked_account_ids('cash')), 3)
+
+class SubtreeMoveTest(TestCase):
+
+  def setUp(self):
+    cache.clear()
+    self.assets = Account(name="Assets", account_number="1", account_type=Account.AccountTypes.ASSET)
+    self.assets.save()
+    self.current = Account(name="Current Assets", account_number="1.5", account_type=Account.AccountTypes.ASSET, parent=self.assets)
+    self.current.save()
+    self.cash = Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET, parent=self.assets)
+    self.cash.save()
+    self.petty = Account(name="Petty Cash", account_number="1.1.1", account_type=Account.AccountTypes.ASSET, parent=self.cash)
+    self.petty.save()
+    self.till = Account(name="Till", account_number="1.1.1.1", account_type=Account.AccountTypes.ASSET, parent=self.petty)
+    self.till.save()
+    self.equity = Account(name="Equity", account_number="3", account_type=Account.AccountTypes.EQUITY)
+    self.equity.save()
+
+  def numbers(self):
+    return dict(Account.objects.values_list('name', 'account_number'))
+
+  def test_moves_and_renumbers_the_whole_subtree(self):
+    """descendants follow the moved account and keep their suffixes"""
+    self.assertEqual(move_subtree(self.cash, self.current), 3)
+    numbers = self.numbers()
+    self.assertEqual([numbers['Cash'], numbers['Petty Cash'], numbers['Till']], ['1.5.1', '1.5.1.1', '1.5.1.1.1'])
+    self.cash.refresh_from_db()
+    self.assertEqual(self.cash.parent, self.current)
+    self.assertEqual(AccountTree.build().ancestors(self.till.pk), [self.petty.pk, self.cash.pk, self.current.pk, self.assets.pk])
+
+  def test_query_count_does_not_grow_with_the_subtree(self):
+    """renumbering is one UPDATE whatever the subtree size"""
+    with self.assertNumQueries(16):
+      move_subtree(self.cash, self.current, '1.5.7')
+    for i in range(5):
+      Account(name=f"Till {i}", account_number=f"1.5.7.{i + 2}", account_type=Account.AccountTypes.ASSET, parent=self.cash).save()
+    with self.assertNumQueries(16):
+      move_subtree(self.cash, self.assets, '1.1')
+    self.assertEqual(Account.objects.filter(account_number__startswith='1.1.').count(), 7)
+
+  def test_overlapping_prefixes(self):
+    """renumbering into its own old prefix does not trip the unique index"""
+    move_subtree(self.cash, None, '1.1.1')
+    self.petty.refresh_from_db()
+    self.assertEqual(self.petty.account_number, '1.1.1.1')
+    move_subtree(self.cash, self.assets, '1.1')
+    self.assertEqual(self.numbers()['Till'], '1.1.1.1')
+
+  def test_rejects_invalid_moves(self):
+    """cycles, type mismatches and taken numbers are refused"""
+    with self.assertRaises(ValidationError):
+      move_subtree(self.cash, self.petty, '1.1.1.9')
+    with self.assertRaises(ValidationError):
+      move_subtree(self.cash, self.equity)
+    with self.assertRaises(ValidationError):
+      move_subtree(self.cash, self.assets, '1.5')
+    with self.assertRaises(ValidationError):
+      move_subtree(self.cash, self.current, '2.1')
+    branch = Account(name="Branch Assets", account_number="9", account_type=Account.AccountTypes.ASSET, entity=Entity.objects.create(code="B", name="Branch"))
+    branch.save()
+    with self.assertRaisesMessage(ValidationError, "of another entity"):
+      move_subtree(self.cash, branch)
+    self.assertEqual(self.numbers()['Till'], '1.1.1.1')
@@ -0,0 +1,137 @@
+from array import array
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from .models import Account, chart_version
+
+class AccountTree:
+  """
+  The chart of accounts as parallel arrays in preorder. Position i holds the
+  i-th account of a depth first walk (children in account number order), so
+  the subtree of position i is the slice [i, ends[i]) and subtree sums are
+  differences of one prefix sum array.
+  """
+
+  __slots__ = ('ids', 'parents', 'ends', 'types', 'numbers', 'positions', 'version')
+
+  _current: Optional["AccountTree"] = None
+
+  def __init__(self, rows: Iterable[Tuple[int, Optional[int], int, str]], version: str = None):
+    rows = sorted(rows, key=lambda row: row[3])
+    known = {row[0] for row in rows}
+    children: Dict[Optional[int], List[tuple]] = {}
+    for row in rows:
+      parent_id = row[1] if row[1] in known else None
+      children.setdefault(parent_id, []).append(row)
+    self.ids = array('q')
+    self.parents = array('l')
+    self.ends = array('l')
+    self.types = array('b')
+    self.numbers: List[str] = []
+    self.positions: Dict[int, int] = {}
+    self.version = version
+    # accounts caught in a parent cycle are unreachable from the roots, walk them as roots
+    for root in children.get(None, []) + rows:
+      if root[0] not in self.positions:
+        self._walk(root, children)
+
+  def _walk(self, root: tuple, children: Mapping[Optional[int], List[tuple]]):
+    stack = [(root, -1, False)]
+    while stack:
+      row, parent, done = stack.pop()
+      if done:
+        self.ends[self.positions[row[0]]] = len(self.ids)
+        continue
+      if row[0] in self.positions:
+        continue
+      position = len(self.ids)
+      self.positions[row[0]] = position
+      self.ids.append(row[0])
+      self.parents.append(parent)
+      self.ends.append(position + 1)
+      self.types.append(row[2])
+      self.numbers.append(row[3])
+      stack.append((row, parent, True))
+      for child in reversed(children.get(row[0], ())):
+        stack.append((child, position, False))
+
+  @classmethod
+  def build(cls, queryset=None, version: str = None) -> "AccountTree":
+    queryset = Account.objects.all() if queryset is None else queryset
+    return cls(queryset.values_list('id', 'parent_id', 'account_type', 'account_number'), version)
+
+  @classmethod
+  def current(cls) -> "AccountTree":
+    """shared tree of the whole chart, rebuilt only after the chart changes"""
+    version = chart_version()
+    tree = cls._current
+    if tree is None or tree.version != version:
+      tree = cls._current = cls.build(version=version)
+    return tree
+
+  def __len__(self):
+    return len(self.ids)
+
+  def __contains__(self, account_id):
+    return account_id in self.positions
+
+  def account_type(self, account_id: int) -> int:
+    return self.types[self.positions[account_id]]
+
+  def parent(self, account_id: int) -> Optional[int]:
+    parent = self.parents[self.positions[account_id]]
+    return None if parent < 0 else self.ids[parent]
+
+  def depth(self, account_id: int) -> int:
+    depth = 0
+    parent = self.parents[self.positions[account_id]]
+    while parent >= 0:
+      depth += 1
+      parent = self.parents[parent]
+    return depth
+
+  def ancestors(self, account_id: int) -> List[int]:
+    """ids from the parent up to the root"""
+    ancestors = []
+    parent = self.parents[self.positions[account_id]]
+    while parent >= 0:
+      ancestors.append(self.ids[parent])
+      parent = self.parents[parent]
+    return ancestors
+
+  def subtree(self, account_id: int) -> array:
+    """ids of the account and all its descendants"""
+    position = self.positions[account_id]
+    return self.ids[position:self.ends[position]]
+
+  def is_leaf(self, account_id: int) -> bool:
+    position = self.positions[account_id]
+    return self.ends[position] == position + 1
+
+  def rollup(self, values: Mapping[int, object], zero=0) -> "Rollup":
+    return Rollup(self, values, zero)
+
+class Rollup:
+  """Subtree totals of per account values, each one prefix sum difference"""
+
+  __slots__ = ('tree', 'prefix')
+
+  def __init__(self, tree: AccountTree, values: Mapping[int, object], zero=0):
+    self.tree = tree
+    prefix = [zero]
+    running = zero
+    for account_id in tree.ids:
+      value = values.get(account_id)
+      if value:
+        running = running + value
+      prefix.append(running)
+    self.prefix = prefix
+
+  def total(self, account_id: int):
+    position = self.tree.positions[account_id]
+    return self.prefix[self.tree.ends[position]] - self.prefix[position]
+
+  def totals(self) -> Dict[int, object]:
+    prefix, ends = self.prefix, self.tree.ends
+    return {
+      account_id: prefix[ends[position]] - prefix[position]
+      for position, account_id in enumerate(self.tree.ids)
+    }
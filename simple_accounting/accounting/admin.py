@@ -1,9 +1,27 @@
 from django.contrib import admin
-from .models import Account, Voucher, VoucherType
+from .models import Account, Voucher, VoucherType, ExchangeRate, BankStatement, Dimension, JournalEntry, RecurringTemplate, OutboxEvent, Archive, Entity, GroupMapping
 
 from .account.admin import AccountAdmin
 from .voucher.admin import VoucherTypeAdmin, VoucherAdmin
+from .currency.admin import ExchangeRateAdmin
+from .reconciliation.admin import BankStatementAdmin
+from .analytics.admin import DimensionAdmin
+from .journal.admin import JournalEntryAdmin
+from .recurring.admin import RecurringTemplateAdmin
+from .outbox.admin import OutboxEventAdmin
+from .archive.admin import ArchiveAdmin
+from .entity.admin import EntityAdmin
+from .consolidation.admin import GroupMappingAdmin
 
 admin.site.register(Account, AccountAdmin)
 admin.site.register(VoucherType, VoucherTypeAdmin)
-admin.site.register(Voucher, VoucherAdmin)
\ No newline at end of file
+admin.site.register(Voucher, VoucherAdmin)
+admin.site.register(ExchangeRate, ExchangeRateAdmin)
+admin.site.register(BankStatement, BankStatementAdmin)
+admin.site.register(Dimension, DimensionAdmin)
+admin.site.register(JournalEntry, JournalEntryAdmin)
+admin.site.register(RecurringTemplate, RecurringTemplateAdmin)
+admin.site.register(OutboxEvent, OutboxEventAdmin)
+admin.site.register(Archive, ArchiveAdmin)
+admin.site.register(Entity, EntityAdmin)
+admin.site.register(GroupMapping, GroupMappingAdmin)
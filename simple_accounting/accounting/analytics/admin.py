@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import DimensionValue
+
+class DimensionValueInline(admin.TabularInline):
+  model = DimensionValue
+  extra = 0
+
+class DimensionAdmin(admin.ModelAdmin):
+  list_display = ('code', 'name')
+  search_fields = ('code', 'name')
+  inlines = [DimensionValueInline]
@@ -0,0 +1,228 @@
+import json
+from datetime import date
+from decimal import Decimal
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models.functions import TruncMonth
+from accounting.utils import keyset_after
+from accounting.fields import MinorUnitAmountField
+from accounting.checkpoint.models import Checkpoint
+from accounting.outbox import feed
+from accounting.outbox.models import OutboxEvent
+from accounting.account.models import Account
+from accounting.voucher.models import Voucher, Ledger
+from accounting.archive.models import Archive, ArchivedLedger
+from .models import Dimension, LedgerDimension, CubeCell
+
+CHECKPOINTS = (
+  ('cube.vouchers', Voucher, 'voucher_date'),
+  ('cube.ledgers', Ledger, 'voucher__voucher_date'),
+  ('cube.dimensions', LedgerDimension, 'ledger__voucher__voucher_date'),
+)
+# change feed consumer for the months rows left: deletes and moved vouchers
+FEED_CONSUMER = 'cube'
+
+def month(day: date) -> date:
+  return day.replace(day=1)
+
+def cube_combinations() -> List[Tuple[int, ...]]:
+  """
+  Dimension id tuples kept in the cube, lower id first. ACCOUNTING_CUBE_DIMENSIONS
+  lists code tuples of one or two dimensions; by default every dimension and
+  every pair of dimensions is kept.
+  """
+  ids = dict(Dimension.objects.values_list('code', 'id'))
+  configured = getattr(settings, 'ACCOUNTING_CUBE_DIMENSIONS', None)
+  if configured is None:
+    everything = sorted(ids.values())
+    return [(pk,) for pk in everything] + list(combinations(everything, 2))
+  return [tuple(sorted(ids[code] for code in codes)) for codes in configured if all(code in ids for code in codes)]
+
+def _next_month(first: date) -> date:
+  return date(first.year + first.month // 12, first.month % 12 + 1, 1)
+
+def _month_filter(months: Iterable[date]) -> models.Q:
+  condition = models.Q()
+  for first in months:
+    condition |= models.Q(voucher__voucher_date__gte=first, voucher__voucher_date__lt=_next_month(first))
+  return condition
+
+def _tagged(ledgers, dimension_ids: Tuple[int, ...]):
+  """approved ledgers tagged with every dimension, the tags joined as dimension_0, dimension_1"""
+  relations = {
+    f'dimension_{i}': models.FilteredRelation('dimensions', condition=models.Q(dimensions__dimension_id=pk))
+    for i, pk in enumerate(dimension_ids)
+  }
+  return ledgers.annotate(**relations).filter(
+    voucher__status=Voucher.Status.APPROVED,
+    **{f'{name}__isnull': False for name in relations},
+  )
+
+def _grouped(ledgers, dimension_ids: Tuple[int, ...], months: Optional[Iterable[date]]):
+  ledgers = _tagged(ledgers, dimension_ids)
+  if months is not None:
+    ledgers = ledgers.filter(_month_filter(months))
+  values = {f'value_{i}': models.F(f'dimension_{i}__value_id') for i in range(len(dimension_ids))}
+  return (
+    ledgers
+      .values('account_id', period=TruncMonth('voucher__voucher_date'), **values)
+      .annotate(total=models.Sum('amount'), count=models.Count('id'))
+      .order_by()
+  )
+
+def aggregate(dimension_ids: Tuple[int, ...], months: Optional[Iterable[date]] = None) -> List[CubeCell]:
+  """
+  Cube cells of one combination, from one grouped query over approved
+  ledgers, and one over archived ledgers for months before the archive cutoff.
+  """
+  sources = [Ledger.objects.all()]
+  cutoff = Archive.latest_cutoff()
+  if cutoff is not None and (months is None or any(first < cutoff for first in months)):
+    sources.append(ArchivedLedger.objects.all())
+  cells: Dict[tuple, list] = {}
+  for ledgers in sources:
+    for row in _grouped(ledgers, dimension_ids, months):
+      cell = cells.setdefault((row['account_id'], row['period'], row['value_0'], row.get('value_1')), [0, 0])
+      cell[0] += row['total']
+      cell[1] += row['count']
+  dimension_b = dimension_ids[1] if len(dimension_ids) > 1 else None
+  return [
+    CubeCell(
+      account_id=account_id, period=period,
+      dimension_a_id=dimension_ids[0], value_a_id=value_a,
+      dimension_b_id=dimension_b, value_b_id=value_b,
+      amount=total, ledgers=count,
+    )
+    for (account_id, period, value_a, value_b), (total, count) in cells.items()
+  ]
+
+def rebuild(months: Optional[Iterable[date]] = None, batch_size: int = 1000) -> int:
+  """replaces the cube cells of the given months, or the whole cube"""
+  months = None if months is None else sorted(set(months))
+  if months == []:
+    return 0
+  cells = CubeCell.objects.all() if months is None else CubeCell.objects.filter(period__in=months)
+  created = 0
+  with transaction.atomic():
+    cells.delete()
+    for dimension_ids in cube_combinations():
+      created += len(CubeCell.objects.bulk_create(aggregate(dimension_ids, months), batch_size=batch_size))
+  return created
+
+def changed_months(chunk_size: int = 1000) -> Tuple[Set[date], Dict[str, tuple]]:
+  """months touched since the cube checkpoints, and the positions to advance them to"""
+  months, positions = set(), {}
+  for name, model, date_field in CHECKPOINTS:
+    checkpoint = Checkpoint.load(name)
+    position = (checkpoint.position_at, checkpoint.position_id)
+    while True:
+      chunk = list(
+        keyset_after(model.objects.all(), 'updated_at', *position).values_list('updated_at', 'id', date_field)[:chunk_size]
+      )
+      if not chunk:
+        break
+      months.update(month(row[2]) for row in chunk)
+      position = chunk[-1][:2]
+    positions[name] = position
+  return months, positions
+
+def left_months(chunk_size: int = 1000) -> Tuple[Set[date], Optional[int]]:
+  """
+  Months rows left since the cube's feed offset, read from the outbox: the
+  voucher date of deleted vouchers and ledgers, and the previous voucher
+  date of moved vouchers and ledgers. Returns them with the offset reached.
+  """
+  feed.sequence()
+  position = feed.consumer(FEED_CONSUMER).position_id
+  reached = None
+  months, voucher_ids = set(), set()
+  voucher, ledger = Voucher._meta.label_lower, Ledger._meta.label_lower
+  while True:
+    events = feed.read(position, chunk_size)
+    if not events:
+      break
+    for event in events:
+      if event.action == OutboxEvent.Actions.DELETE:
+        values = json.loads(event.payload)
+      elif event.action == OutboxEvent.Actions.UPDATE and event.before:
+        values = json.loads(event.before)
+      else:
+        continue
+      if event.model == voucher and values.get('voucher_date'):
+        months.add(month(date.fromisoformat(values['voucher_date'])))
+      elif event.model == ledger and values.get('voucher_id'):
+        voucher_ids.add(values['voucher_id'])
+    position = reached = events[-1].offset
+  # vouchers deleted since have their month from their own delete event
+  ids = list(voucher_ids)
+  for start in range(0, len(ids), chunk_size):
+    months.update(month(day) for day in Voucher.objects.filter(pk__in=ids[start:start + chunk_size]).values_list('voucher_date', flat=True))
+  return months, reached
+
+def refresh(full: bool = False, chunk_size: int = 1000) -> int:
+  """
+  Brings the cube up to date. Months of vouchers, ledgers and dimension tags
+  changed since the last refresh are rebuilt, and so are the months deleted
+  or moved rows left, taken from the change feed.
+  """
+  with transaction.atomic():
+    months, positions = changed_months(chunk_size)
+    left, reached = left_months(chunk_size)
+    created = rebuild(None if full else months | left)
+    for name, position in positions.items():
+      Checkpoint.load(name).advance(*position)
+    if reached is not None:
+      feed.acknowledge(FEED_CONSUMER, reached)
+  return created
+
+def _kept(codes: List[str]) -> bool:
+  configured = getattr(settings, 'ACCOUNTING_CUBE_DIMENSIONS', None)
+  return configured is None or any(sorted(kept) == sorted(codes) for kept in configured)
+
+def pivot(rows: str, columns: str = None, start: date = None, end: date = None, accounts=None, profit=False) -> Dict[tuple, Decimal]:
+  """
+  Totals by (row value code, column value code) read from the cube, by whole
+  months between start and end. `accounts` narrows to an account queryset;
+  `profit` sums revenue minus expenses instead of natural balances.
+  Combinations left out of ACCOUNTING_CUBE_DIMENSIONS are summed from the
+  ledger tags instead.
+  """
+  codes = [rows] if columns is None else [rows, columns]
+  ids = dict(Dimension.objects.filter(code__in=codes).values_list('code', 'id'))
+  unknown = [code for code in codes if code not in ids]
+  if unknown:
+    raise ValidationError(f'unknown dimensions: {", ".join(unknown)}')
+  ordered = sorted(codes, key=lambda code: ids[code])
+  if _kept(codes):
+    cells = CubeCell.objects.filter(dimension_a_id=ids[ordered[0]], dimension_b_id=ids[ordered[1]] if columns else None)
+    sources = [(cells, ['value_a__code', 'value_b__code'][:len(codes)], 'period')]
+  else:
+    dimension_ids = tuple(ids[code] for code in ordered)
+    names = [f'dimension_{i}__value__code' for i in range(len(codes))]
+    sources = [(_tagged(model.objects.all(), dimension_ids), names, 'voucher__voucher_date') for model in (Ledger, ArchivedLedger)]
+  if profit:
+    total = models.Sum(models.Case(
+      models.When(account__account_type=Account.AccountTypes.EXPENSE, then=-models.F('amount')),
+      default=models.F('amount'),
+      output_field=MinorUnitAmountField(),
+    ))
+  else:
+    total = models.Sum('amount')
+  result = {}
+  for queryset, names, period in sources:
+    if start is not None:
+      queryset = queryset.filter(**{f'{period}__gte': month(start)})
+    if end is not None:
+      queryset = queryset.filter(**{f'{period}__lt': _next_month(month(end))})
+    if accounts is not None:
+      queryset = queryset.filter(account__in=accounts)
+    if profit:
+      queryset = queryset.filter(account__account_type__in=(Account.AccountTypes.REVENUE, Account.AccountTypes.EXPENSE))
+    for row in queryset.values(*names).annotate(total=total).order_by():
+      key = tuple(row[name] for name in names)
+      key = key if ordered == codes else key[::-1]
+      result[key] = result.get(key, 0) + row['total']
+  return result
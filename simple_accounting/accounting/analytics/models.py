@@ -0,0 +1,77 @@
+from django.db import models
+from datetime import date, datetime
+from decimal import Decimal
+from accounting.fields import MinorUnitAmountField
+from accounting.account.models import Account
+from accounting.voucher.models import Ledger
+
+class Dimension(models.Model):
+  """An analytic axis ledgers can be tagged with, e.g. cost center, project or department"""
+
+  code: str = models.SlugField(max_length=32, unique=True)
+  name: str = models.CharField(max_length=128)
+
+  def __str__(self):
+    return self.name
+
+class DimensionValue(models.Model):
+
+  dimension: Dimension = models.ForeignKey(Dimension, on_delete=models.CASCADE, related_name='values')
+  code: str = models.CharField(max_length=32)
+  name: str = models.CharField(max_length=128)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=['dimension', 'code'], name='unique_dimension_value_code'),
+    ]
+
+  def __str__(self):
+    return f'{self.dimension.code}: {self.name}'
+
+class LedgerDimension(models.Model):
+  """The value of one dimension on one ledger; dimension repeats value.dimension so it can be unique per ledger"""
+
+  ledger: Ledger = models.ForeignKey(Ledger, on_delete=models.CASCADE, related_name='dimensions')
+  dimension: Dimension = models.ForeignKey(Dimension, on_delete=models.CASCADE, related_name='+')
+  value: DimensionValue = models.ForeignKey(DimensionValue, on_delete=models.CASCADE, related_name='+')
+  updated_at: datetime = models.DateTimeField(auto_now=True)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=['ledger', 'dimension'], name='unique_ledger_dimension'),
+    ]
+    indexes = [
+      models.Index(fields=['dimension', 'value', 'ledger']),
+      models.Index(fields=['updated_at', 'id']),
+    ]
+
+  @classmethod
+  def tag(cls, ledger: Ledger, *values: DimensionValue):
+    for value in values:
+      cls.objects.update_or_create(ledger=ledger, dimension_id=value.dimension_id, defaults={'value': value})
+
+  def save(self, **kwargs):
+    self.dimension_id = self.value.dimension_id
+    super(LedgerDimension, self).save(**kwargs)
+
+class CubeCell(models.Model):
+  """
+  Approved ledger amounts summed per account, month and the values of one
+  dimension (dimension_b empty) or of a pair of dimensions (dimension_a
+  having the lower id). Maintained by accounting.analytics.cube.
+  """
+
+  account: Account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='+')
+  period: date = models.DateField()
+  dimension_a: Dimension = models.ForeignKey(Dimension, on_delete=models.CASCADE, related_name='+')
+  value_a: DimensionValue = models.ForeignKey(DimensionValue, on_delete=models.CASCADE, related_name='+')
+  dimension_b: Dimension = models.ForeignKey(Dimension, on_delete=models.CASCADE, null=True, related_name='+')
+  value_b: DimensionValue = models.ForeignKey(DimensionValue, on_delete=models.CASCADE, null=True, related_name='+')
+  amount: Decimal = MinorUnitAmountField()
+  ledgers: int = models.IntegerField(default=0)
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['dimension_a', 'dimension_b', 'period']),
+      models.Index(fields=['period']),
+    ]
@@ -0,0 +1,77 @@
+from datetime import date
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.test import override_settings
+from accounting.models import Account, Voucher, Ledger, Dimension, DimensionValue, LedgerDimension, CubeCell
+from accounting.testing import LedgerTestCase
+from .cube import refresh, pivot
+
+class AnalyticCubeTest(LedgerTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.rent = self.account("Rent", "5.1", Account.AccountTypes.EXPENSE)
+    self.center = Dimension.objects.create(code='cost_center', name='Cost Center')
+    self.project = Dimension.objects.create(code='project', name='Project')
+    self.north = DimensionValue.objects.create(dimension=self.center, code='N', name='North')
+    self.south = DimensionValue.objects.create(dimension=self.center, code='S', name='South')
+    self.alpha = DimensionValue.objects.create(dimension=self.project, code='A', name='Alpha')
+
+  def tagged(self, on, account, amount, *values, status=Voucher.Status.APPROVED):
+    voucher = self.post(on, (account, amount), (self.cash, amount if account == self.sales else -amount), status=status)
+    ledger = voucher.ledgers.get(account=account)
+    LedgerDimension.tag(ledger, *values)
+    return ledger
+
+  def test_pivot_reads_profit_by_two_dimensions(self):
+    """profit per cost center and project comes from the cube"""
+    self.tagged("2022-01-05", self.sales, 500, self.north, self.alpha)
+    self.tagged("2022-01-20", self.rent, 120, self.north, self.alpha)
+    self.tagged("2022-02-01", self.sales, 300, self.south, self.alpha)
+    self.tagged("2022-02-02", self.sales, 999, self.south, self.alpha, status=Voucher.Status.PENDING)
+    refresh()
+    self.assertEqual(CubeCell.objects.filter(dimension_b=self.project).count(), 3)
+    with self.assertNumQueries(2):
+      result = pivot('cost_center', 'project', profit=True)
+    self.assertEqual(result, {('N', 'A'): Decimal(380), ('S', 'A'): Decimal(300)})
+    self.assertEqual(pivot('project', 'cost_center', profit=True)[('A', 'N')], Decimal(380))
+    self.assertEqual(pivot('cost_center', start=date(2022, 2, 1), profit=True), {('S',): Decimal(300)})
+
+  def test_refresh_rebuilds_changed_months(self):
+    """a refresh only rebuilds months touched since the previous one"""
+    self.tagged("2022-01-05", self.sales, 500, self.north)
+    refresh()
+    january = CubeCell.objects.get(dimension_a=self.center, dimension_b=None)
+    self.tagged("2022-03-01", self.sales, 70, self.south)
+    self.assertEqual(refresh(), 1)
+    self.assertTrue(CubeCell.objects.filter(pk=january.pk).exists())
+    ledger = Ledger.objects.get(account=self.sales, amount=500)
+    LedgerDimension.tag(ledger, self.south)
+    refresh()
+    self.assertEqual(pivot('cost_center'), {('S',): Decimal(570)})
+
+  @override_settings(ACCOUNTING_IMMUTABLE_APPROVED_VOUCHERS=False)
+  def test_refresh_clears_months_rows_left(self):
+    """months of deleted and moved vouchers are rebuilt from the change feed"""
+    moved = self.tagged("2022-01-05", self.sales, 500, self.north).voucher
+    deleted = self.tagged("2022-03-01", self.sales, 70, self.south).voucher
+    refresh()
+    moved.refresh_from_db()
+    moved.voucher_date = date(2022, 2, 10)
+    moved.save()
+    deleted.delete()
+    refresh()
+    self.assertEqual(set(CubeCell.objects.values_list('period', flat=True)), {date(2022, 2, 1)})
+    self.assertEqual(pivot('cost_center', end=date(2022, 1, 31)), {})
+    self.assertEqual(pivot('cost_center'), {('N',): Decimal(500)})
+
+  @override_settings(ACCOUNTING_CUBE_DIMENSIONS=[('project',)])
+  def test_configured_combinations(self):
+    """only configured dimension combinations are kept"""
+    self.tagged("2022-01-05", self.sales, 500, self.north, self.alpha)
+    refresh(full=True)
+    self.assertEqual(set(CubeCell.objects.values_list('dimension_a', 'dimension_b')), {(self.project.pk, None)})
+    self.assertEqual(pivot('project'), {('A',): Decimal(500)})
+    self.assertEqual(pivot('project', 'cost_center', end=date(2022, 1, 1)), {('A', 'N'): Decimal(500)})
+    self.assertEqual(pivot('cost_center', start=date(2022, 2, 1)), {})
+    self.assertRaises(ValidationError, pivot, 'region')
@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from accounting.models import Account, VoucherType, Voucher, Ledger
+
+class VoucherApiTest(TestCase):
+
+  def setUp(self):
+    self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+    self.client.force_login(self.user)
+    self.cash = Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET)
+    self.revenue = Account(name="Revenue", account_number="3.1", account_type=Account.AccountTypes.REVENUE)
+    self.cash.save()
+    self.revenue.save()
+    self.vtype = VoucherType(name="Sale Voucher", prefix="SV")
+    self.vtype.save()
+    self.vouchers = [self.make_voucher(100 + i) for i in range(5)]
+
+  def make_voucher(self, amount):
+    voucher = Voucher(voucher_date="2022-01-01", voucher_type=self.vtype, description="sale")
+    voucher.save()
+    Ledger(voucher=voucher, account=self.cash, amount=amount).save()
+    Ledger(voucher=voucher, account=self.revenue, amount=amount).save()
+    return voucher
+
+  def test_requires_permission(self):
+    """anonymous clients are refused"""
+    self.client.logout()
+    self.assertEqual(self.client.get('/api/vouchers/').status_code, 401)
+
+  def test_lists_vouchers_with_ledgers(self):
+    """vouchers come with embedded ledgers, accounts and voucher type"""
+    data = self.client.get('/api/vouchers/').json()
+    self.assertEqual([item['id'] for item in data['results']], [voucher.pk for voucher in self.vouchers])
+    first = data['results'][0]
+    self.assertEqual(first['voucher_type']['prefix'], 'SV')
+    self.assertEqual(first['amount'], '100.000000')
+    self.assertEqual([ledger['account']['account_number'] for ledger in first['ledgers']], ['1.1', '3.1'])
+    self.assertIsNone(data['next_cursor'])
+
+  def test_cursor_pagination(self):
+    """cursor pages walk every voucher once"""
+    seen, cursor = [], None
+    while True:
+      params = {'limit': 2, 'fields': 'id'}
+      if cursor:
+        params['cursor'] = cursor
+      data = self.client.get('/api/vouchers/', params).json()
+      seen += [item['id'] for item in data['results']]
+      cursor = data['next_cursor']
+      if not cursor:
+        break
+    self.assertEqual(seen, [voucher.pk for voucher in self.vouchers])
+
+  def test_sparse_fields(self):
+    """only requested fields are returned"""
+    data = self.client.get('/api/vouchers/', {'fields': 'id,voucher_number'}).json()
+    self.assertEqual(set(data['results'][0]), {'id', 'voucher_number'})
+    self.assertEqual(self.client.get('/api/vouchers/', {'fields': 'nope'}).status_code, 400)
+
+  def test_query_count_does_not_grow_with_page_size(self):
+    """a page costs the same number of queries whatever its size"""
+    def count(limit):
+      with CaptureQueriesContext(connection) as queries:
+        self.client.get('/api/vouchers/', {'limit': limit})
+      return len(queries)
+    self.assertEqual(count(1), count(5))
+
+  def test_etag_and_updated_since(self):
+    """unchanged pages answer 304, updated_since only returns changes"""
+    response = self.client.get('/api/vouchers/')
+    self.assertEqual(self.client.get('/api/vouchers/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+    since = timezone.now()
+    ledger = self.vouchers[2].ledgers.first()
+    ledger.amount = 150
+    ledger.save()
+    data = self.client.get('/api/vouchers/', {'updated_since': since.isoformat(), 'fields': 'id'}).json()
+    self.assertEqual([item['id'] for item in data['results']], [self.vouchers[2].pk])
+    self.assertEqual(self.client.get('/api/vouchers/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+  def test_accounts_and_voucher_types(self):
+    """accounts and voucher types are listed"""
+    accounts = self.client.get('/api/accounts/').json()['results']
+    self.assertEqual([account['account_number'] for account in accounts], ['1.1', '3.1'])
+    self.assertEqual(self.client.get(f'/api/voucher-types/{self.vtype.pk}/').json()['prefix'], 'SV')
@@ -0,0 +1,16 @@
+from django.urls import path
+from . import views
+
+app_name = 'accounting_api'
+
+urlpatterns = [
+  path('vouchers/', views.VoucherView.as_view(), name='vouchers'),
+  path('vouchers/<int:pk>/', views.VoucherView.as_view(), name='voucher'),
+  path('archived-vouchers/', views.ArchivedVoucherView.as_view(), name='archived_vouchers'),
+  path('archived-vouchers/<int:pk>/', views.ArchivedVoucherView.as_view(), name='archived_voucher'),
+  path('accounts/', views.AccountView.as_view(), name='accounts'),
+  path('accounts/<int:pk>/', views.AccountView.as_view(), name='account'),
+  path('voucher-types/', views.VoucherTypeView.as_view(), name='voucher_types'),
+  path('voucher-types/<int:pk>/', views.VoucherTypeView.as_view(), name='voucher_type'),
+  path('changes/', views.ChangeFeedView.as_view(), name='changes'),
+]
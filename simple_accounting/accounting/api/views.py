@@ -0,0 +1,294 @@
+import base64
+import hashlib
+import json
+from typing import Callable, Dict
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags, quote_etag
+from django.views import View
+from accounting.routers import reporting_reads
+from accounting.utils import keyset_after
+from accounting.account.models import Account
+from accounting.voucher.models import VoucherType, Voucher, Ledger
+from accounting.archive.models import ArchivedVoucher, ArchivedLedger
+from accounting.outbox import feed
+from accounting.outbox.models import OutboxEvent
+
+class ApiError(Exception):
+  def __init__(self, message, status=400):
+    super().__init__(message)
+    self.status = status
+
+def encode_cursor(updated_at, pk) -> str:
+  raw = json.dumps([updated_at.isoformat(), pk]).encode()
+  return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str):
+  try:
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+    updated_at, pk = json.loads(raw)
+    updated_at = parse_datetime(updated_at)
+  except (ValueError, TypeError):
+    raise ApiError('invalid cursor')
+  if updated_at is None or not isinstance(pk, int):
+    raise ApiError('invalid cursor')
+  return updated_at, pk
+
+def account_data(account: Account) -> dict:
+  return {
+    'id': account.pk,
+    'account_number': account.account_number,
+    'name': account.name,
+  }
+
+def voucher_type_data(voucher_type: VoucherType) -> dict:
+  return {
+    'id': voucher_type.pk,
+    'name': voucher_type.name,
+    'prefix': voucher_type.prefix,
+  }
+
+def ledger_data(ledger: Ledger) -> dict:
+  return {
+    'id': ledger.pk,
+    'account': account_data(ledger.account),
+    'amount': ledger.amount,
+    'currency': ledger.currency or None,
+    'currency_amount': ledger.currency_amount,
+    'updated_at': ledger.updated_at,
+  }
+
+LEDGERS = models.Prefetch('ledgers', queryset=Ledger.objects.select_related('account').order_by('pk'))
+ARCHIVED_LEDGERS = models.Prefetch('ledgers', queryset=ArchivedLedger.objects.select_related('account').order_by('pk'))
+
+class JsonResourceView(View):
+  """
+  Read-only JSON listing in (updated_at, id) order with cursor pagination.
+
+  `fields` picks attributes (?fields=a,b), `updated_since` only returns rows
+  changed at or after a timestamp, and every response carries an ETag so an
+  unchanged page answers If-None-Match with 304.
+  """
+
+  model = None
+  permission = None
+  fields: Dict[str, Callable] = {}
+  # related lookups needed by each field, so sparse requests skip them
+  select_related: Dict[str, tuple] = {}
+  prefetch_related: Dict[str, tuple] = {}
+  default_limit = 100
+  max_limit = 1000
+
+  def dispatch(self, request, *args, **kwargs):
+    if not request.user.is_authenticated:
+      return JsonResponse({'error': 'authentication required'}, status=401)
+    if not request.user.has_perm(self.permission):
+      return JsonResponse({'error': 'permission denied'}, status=403)
+    try:
+      with reporting_reads():
+        data = super().dispatch(request, *args, **kwargs)
+    except ApiError as error:
+      return JsonResponse({'error': str(error)}, status=error.status)
+    if isinstance(data, HttpResponse):
+      return data
+    return self.respond(request, data)
+
+  def respond(self, request, data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    etag = quote_etag(hashlib.sha1(body).hexdigest())
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+      response = HttpResponseNotModified()
+    else:
+      response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+  def selected_fields(self, request):
+    requested = request.GET.get('fields')
+    if not requested:
+      return list(self.fields)
+    selected = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in selected if name not in self.fields]
+    if unknown:
+      raise ApiError(f'unknown fields: {", ".join(unknown)}')
+    return selected
+
+  def get_queryset(self, selected):
+    queryset = self.model.objects.all()
+    select = list(dict.fromkeys(lookup for name in selected for lookup in self.select_related.get(name, ())))
+    prefetch = list(dict.fromkeys(lookup for name in selected for lookup in self.prefetch_related.get(name, ())))
+    if select:
+      queryset = queryset.select_related(*select)
+    if prefetch:
+      queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+  def changed_since(self, queryset, since):
+    return queryset.filter(updated_at__gte=since)
+
+  def serialize(self, obj, selected) -> dict:
+    return {name: self.fields[name](obj) for name in selected}
+
+  def limit(self, request) -> int:
+    try:
+      limit = min(int(request.GET.get('limit', self.default_limit)), self.max_limit)
+    except ValueError:
+      raise ApiError('invalid limit')
+    if limit < 1:
+      raise ApiError('invalid limit')
+    return limit
+
+  def get(self, request, pk=None):
+    selected = self.selected_fields(request)
+    queryset = self.get_queryset(selected)
+    if pk is not None:
+      obj = queryset.filter(pk=pk).first()
+      if obj is None:
+        raise ApiError('not found', status=404)
+      return self.serialize(obj, selected)
+    limit = self.limit(request)
+    since = request.GET.get('updated_since')
+    if since:
+      since = parse_datetime(since)
+      if since is None:
+        raise ApiError('invalid updated_since')
+      if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+      queryset = self.changed_since(queryset, since)
+    cursor = request.GET.get('cursor')
+    updated_at, last_pk = decode_cursor(cursor) if cursor else (None, None)
+    rows = list(keyset_after(queryset, 'updated_at', updated_at, last_pk)[:limit + 1])
+    page, more = rows[:limit], len(rows) > limit
+    return {
+      'results': [self.serialize(obj, selected) for obj in page],
+      'next_cursor': encode_cursor(page[-1].updated_at, page[-1].pk) if more else None,
+    }
+
+class VoucherView(JsonResourceView):
+  model = Voucher
+  permission = 'accounting.view_voucher'
+  fields = {
+    'id': lambda voucher: voucher.pk,
+    'voucher_number': lambda voucher: voucher.voucher_number,
+    'voucher_date': lambda voucher: voucher.voucher_date,
+    'voucher_type': lambda voucher: voucher_type_data(voucher.voucher_type),
+    'description': lambda voucher: voucher.description,
+    'status': lambda voucher: Voucher.Status(voucher.status).label,
+    'amount': lambda voucher: voucher.amount,
+    'ledgers': lambda voucher: [ledger_data(ledger) for ledger in voucher.ledgers.all()],
+    'created_at': lambda voucher: voucher.created_at,
+    'updated_at': lambda voucher: voucher.updated_at,
+  }
+  select_related = {
+    'voucher_type': ('voucher_type',),
+  }
+  prefetch_related = {
+    'amount': (LEDGERS,),
+    'ledgers': (LEDGERS,),
+  }
+
+  def changed_since(self, queryset, since):
+    # ledgers written directly do not touch their voucher
+    return queryset.filter(
+      models.Q(updated_at__gte=since) |
+      models.Q(pk__in=Ledger.objects.filter(updated_at__gte=since).values('voucher_id'))
+    )
+
+class ArchivedVoucherView(VoucherView):
+  """vouchers moved to the archive, which the live listing only shows as carry-forward vouchers"""
+  model = ArchivedVoucher
+  permission = 'accounting.view_archivedvoucher'
+  prefetch_related = {
+    'amount': (ARCHIVED_LEDGERS,),
+    'ledgers': (ARCHIVED_LEDGERS,),
+  }
+
+  def changed_since(self, queryset, since):
+    # archived rows are never written again
+    return queryset.filter(updated_at__gte=since)
+
+class AccountView(JsonResourceView):
+  model = Account
+  permission = 'accounting.view_account'
+  fields = {
+    'id': lambda account: account.pk,
+    'account_number': lambda account: account.account_number,
+    'name': lambda account: account.name,
+    'account_type': lambda account: Account.AccountTypes(account.account_type).label,
+    'parent_id': lambda account: account.parent_id,
+    'description': lambda account: account.description,
+    'inactive': lambda account: account.inactive,
+    'created_at': lambda account: account.created_at,
+    'updated_at': lambda account: account.updated_at,
+  }
+
+class VoucherTypeView(JsonResourceView):
+  model = VoucherType
+  permission = 'accounting.view_vouchertype'
+  fields = {
+    'id': lambda voucher_type: voucher_type.pk,
+    'name': lambda voucher_type: voucher_type.name,
+    'prefix': lambda voucher_type: voucher_type.prefix,
+  }
+
+  def get(self, request, pk=None):
+    # voucher types carry no timestamps and are few, list them whole
+    selected = self.selected_fields(request)
+    queryset = self.get_queryset(selected).order_by('pk')
+    if pk is not None:
+      obj = queryset.filter(pk=pk).first()
+      if obj is None:
+        raise ApiError('not found', status=404)
+      return self.serialize(obj, selected)
+    return {'results': [self.serialize(obj, selected) for obj in queryset], 'next_cursor': None}
+
+def event_data(event: OutboxEvent) -> dict:
+  return {
+    'offset': event.offset,
+    'model': event.model,
+    'object_id': event.object_id,
+    'action': event.action,
+    'data': json.loads(event.payload) if event.payload else None,
+    'created_at': event.created_at,
+  }
+
+class ChangeFeedView(JsonResourceView):
+  """
+  Outbox events after ?after=<offset> (or after the acknowledged offset of
+  ?consumer=<name>); POST consumer and position to acknowledge a batch.
+  Events are served once `change_feed sequence` has given them offsets.
+  """
+
+  model = OutboxEvent
+  permission = 'accounting.view_outboxevent'
+  default_limit = 1000
+  max_limit = 10000
+
+  def get(self, request, pk=None):
+    limit = self.limit(request)
+    name = request.GET.get('consumer')
+    try:
+      after = int(request.GET['after']) if 'after' in request.GET else (feed.position(name) if name else 0)
+    except ValueError:
+      raise ApiError('invalid offset')
+    events = feed.read(after, limit)
+    return {
+      'events': [event_data(event) for event in events],
+      'next_offset': events[-1].offset if events else after,
+    }
+
+  def post(self, request, pk=None):
+    if not request.user.has_perm('accounting.change_checkpoint'):
+      raise ApiError('permission denied', status=403)
+    name = request.POST.get('consumer', '').strip()
+    if not name:
+      raise ApiError('consumer required')
+    try:
+      position = int(request.POST.get('position', ''))
+    except ValueError:
+      raise ApiError('invalid position')
+    return {'consumer': name, 'position': feed.acknowledge(name, position)}
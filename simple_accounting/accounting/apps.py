@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AccountingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'accounting'
+
+    def ready(self):
+        from .outbox import recorder as outbox
+        from .journal import recorder as journal
+        outbox.connect()
+        journal.connect()
@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+class ArchiveAdmin(admin.ModelAdmin):
+  list_display = ('cutoff', 'vouchers', 'ledgers', 'voucher', 'archived_at')
+  ordering = ('-cutoff',)
+
+  def has_add_permission(self, request):
+    return False
+
+  def has_change_permission(self, request, obj=None):
+    return False
+
+  def has_delete_permission(self, request, obj=None):
+    return False
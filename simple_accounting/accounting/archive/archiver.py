@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Tuple
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+from accounting.journal.recorder import record_created, snapshot
+from accounting.outbox.recorder import event, publish
+from accounting.analytics.models import LedgerDimension
+from accounting.closing.models import YearClosing
+from accounting.recurring.models import RecurringOccurrence
+from accounting.voucher.models import VoucherType, Voucher, Ledger, VoucherSearchToken
+from accounting.voucher.posting import post_vouchers
+from .models import Archive, ArchivedVoucher, ArchivedLedger, ArchivedLedgerDimension
+
+def archivable(cutoff: date):
+  """
+  Approved and rejected vouchers dated before cutoff, except those live rows
+  still point at: closing and carry-forward vouchers, vouchers with a live
+  reversal and vouchers with reconciled ledgers.
+  """
+  return (
+    Voucher.objects
+      .filter(voucher_date__lt=cutoff, status__in=(Voucher.Status.APPROVED, Voucher.Status.REJECTED))
+      .exclude(pk__in=YearClosing.voucher_ids())
+      .exclude(pk__in=Archive.voucher_ids())
+      .exclude(reversal__voucher_date__gte=cutoff)
+      .exclude(ledgers__statement_line__isnull=False)
+      .exclude(reversal__ledgers__statement_line__isnull=False)
+  )
+
+def _copy(source, target, column: str, ids: List[int]):
+  """INSERT ... SELECT of the target's columns for rows of source whose column is in ids"""
+  columns = ', '.join(connection.ops.quote_name(field.column) for field in target._meta.concrete_fields)
+  placeholders = ', '.join(['%s'] * len(ids))
+  with connection.cursor() as cursor:
+    cursor.execute(
+      f'INSERT INTO {connection.ops.quote_name(target._meta.db_table)} ({columns}) '
+      f'SELECT {columns} FROM {connection.ops.quote_name(source._meta.db_table)} '
+      f'WHERE {connection.ops.quote_name(column)} IN ({placeholders})',
+      ids,
+    )
+    return cursor.rowcount
+
+def _delete(model, column: str, ids: List[int]) -> int:
+  # plain DELETE: neither signals nor the approved voucher lock apply to rows that were copied
+  placeholders = ', '.join(['%s'] * len(ids))
+  with connection.cursor() as cursor:
+    cursor.execute(
+      f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} WHERE {connection.ops.quote_name(column)} IN ({placeholders})',
+      ids,
+    )
+    return cursor.rowcount
+
+def _unlink_reversals(ids: List[int]):
+  column = connection.ops.quote_name(Voucher._meta.get_field('reversal_of').column)
+  placeholders = ', '.join(['%s'] * len(ids))
+  with connection.cursor() as cursor:
+    cursor.execute(
+      f'UPDATE {connection.ops.quote_name(Voucher._meta.db_table)} SET {column} = NULL '
+      f'WHERE {connection.ops.quote_name("id")} IN ({placeholders}) AND {column} IS NOT NULL',
+      ids,
+    )
+
+def archive_before(cutoff: date, voucher_type: VoucherType, batch_size: int = 500) -> Archive:
+  """
+  Moves vouchers dated before cutoff, their ledgers and dimension tags into
+  the archive tables, batch by batch with INSERT ... SELECT and DELETE, and posts one
+  approved voucher dated the day before cutoff carrying their balances
+  forward per account and currency.
+  """
+  with transaction.atomic():
+    list(Archive.objects.select_for_update().all())
+    latest = Archive.latest_cutoff()
+    if latest is not None and cutoff <= latest:
+      raise ValidationError(f'vouchers before {latest} are already archived')
+    if Voucher.objects.filter(voucher_date__lt=cutoff, status=Voucher.Status.PENDING).exists():
+      raise ValidationError(f'pending vouchers dated before {cutoff} must be approved or rejected first')
+    if archivable(cutoff).exclude(entity=voucher_type.entity_id).exists():
+      raise ValidationError(f'vouchers dated before {cutoff} belong to other entities than {voucher_type}, whose carry-forward voucher covers one entity')
+    archive = Archive.objects.create(cutoff=cutoff)
+    balances: Dict[Tuple[int, str], List[Decimal]] = {}
+    last = 0
+    while True:
+      ids = list(archivable(cutoff).filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+      if not ids:
+        break
+      last = ids[-1]
+      # a reversal goes with its original whatever batches their pks fall in
+      related = ids
+      while related:
+        related = list(
+          archivable(cutoff)
+            .filter(models.Q(reversal_of__in=related) | models.Q(reversal__in=related))
+            .exclude(pk__in=ids)
+            .values_list('pk', flat=True)
+        )
+        ids += related
+      totals = (
+        Ledger.objects
+          .filter(voucher_id__in=ids, voucher__status=Voucher.Status.APPROVED)
+          .values('account_id', 'currency')
+          .annotate(total=models.Sum('amount'), currency_total=models.Sum('currency_amount'))
+          .order_by()
+      )
+      for row in totals:
+        balance = balances.setdefault((row['account_id'], row['currency']), [Decimal(0), Decimal(0)])
+        balance[0] += row['total'] or 0
+        balance[1] += row['currency_total'] or 0
+      archive.vouchers += _copy(Voucher, ArchivedVoucher, 'id', ids)
+      archive.ledgers += _copy(Ledger, ArchivedLedger, 'voucher_id', ids)
+      ledger_ids = list(Ledger.objects.filter(voucher_id__in=ids).values_list('pk', flat=True))
+      for start in range(0, len(ledger_ids), batch_size):
+        _copy(LedgerDimension, ArchivedLedgerDimension, 'ledger_id', ledger_ids[start:start + batch_size])
+        _delete(LedgerDimension, 'ledger_id', ledger_ids[start:start + batch_size])
+      VoucherSearchToken.objects.filter(voucher_id__in=ids).delete()
+      RecurringOccurrence.objects.filter(voucher_id__in=ids).update(voucher=None)
+      _delete(Ledger, 'voucher_id', ids)
+      # InnoDB checks the reversal_of key row by row, not at commit
+      _unlink_reversals(ids)
+      _delete(Voucher, 'id', ids)
+    ledgers = [
+      Ledger(account_id=account_id, amount=amount, currency=currency, currency_amount=currency_amount if currency else None)
+      for (account_id, currency), (amount, currency_amount) in sorted(balances.items())
+      if amount or currency_amount
+    ]
+    if ledgers:
+      archive.voucher, = post_vouchers([(Voucher(
+        voucher_date=cutoff - timedelta(days=1),
+        voucher_type=voucher_type,
+        description=f'Balances carried forward from vouchers archived before {cutoff}',
+        status=Voucher.Status.APPROVED,
+      ), ledgers)], check_duplicates=False)
+    archive.save()
+    record_created([archive])
+    publish([event(Archive, archive.pk, 'create', snapshot(archive))])
+  return archive
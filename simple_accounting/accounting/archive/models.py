@@ -0,0 +1,99 @@
+from django.db import models
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+from accounting.fields import MinorUnitAmountField
+from accounting.account.models import Account
+from accounting.entity.models import Entity
+from accounting.voucher.models import VoucherType, Voucher, DEBIT_ACCOUNT_TYPES, debit_condition
+from accounting.analytics.models import Dimension, DimensionValue
+
+class ArchivedVoucher(models.Model):
+  """A voucher moved out of the live table, keeping its id and columns"""
+
+  id: int = models.BigIntegerField(primary_key=True)
+  voucher_number: str = models.CharField(max_length=12, db_index=True)
+  voucher_date: date = models.DateField()
+  voucher_type: VoucherType = models.ForeignKey(VoucherType, on_delete=models.PROTECT, related_name='+')
+  description: str = models.TextField(null=True, blank=True)
+  status: int = models.IntegerField(choices=Voucher.Status.choices)
+  # plain id, the reversed voucher may be live or archived
+  reversal_of_id: int = models.BigIntegerField(null=True, blank=True)
+  entity: Entity = models.ForeignKey(Entity, null=True, blank=True, on_delete=models.PROTECT, related_name='+')
+  created_at: datetime = models.DateTimeField()
+  updated_at: datetime = models.DateTimeField()
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['voucher_date', 'status']),
+    ]
+
+  @property
+  def amount(self):
+    """debit total, like Voucher.amount"""
+    if 'ledgers' in getattr(self, '_prefetched_objects_cache', {}):
+      return sum(
+        ledger.amount for ledger in self.ledgers.all()
+        if (ledger.amount > 0) == (ledger.account.account_type in DEBIT_ACCOUNT_TYPES) and ledger.amount
+      )
+    return self.ledgers.filter(debit_condition()).aggregate(total=models.Sum('amount'))['total'] or 0
+
+  def __str__(self):
+    return self.voucher_number
+
+class ArchivedLedger(models.Model):
+
+  id: int = models.BigIntegerField(primary_key=True)
+  voucher: ArchivedVoucher = models.ForeignKey(ArchivedVoucher, on_delete=models.CASCADE, related_name='ledgers')
+  account: Account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name='+')
+  amount: Decimal = MinorUnitAmountField()
+  currency: str = models.CharField(max_length=3, blank=True, default='')
+  currency_amount: Decimal = MinorUnitAmountField(null=True, blank=True)
+  entity: Entity = models.ForeignKey(Entity, null=True, blank=True, on_delete=models.PROTECT, related_name='+')
+  created_at: datetime = models.DateTimeField()
+  updated_at: datetime = models.DateTimeField()
+
+  def __str__(self):
+    return f'{self.voucher.voucher_number} - {self.account.name}'
+
+class ArchivedLedgerDimension(models.Model):
+  """A dimension tag of an archived ledger, read by cube rebuilds of archived months"""
+
+  id: int = models.BigIntegerField(primary_key=True)
+  ledger: ArchivedLedger = models.ForeignKey(ArchivedLedger, on_delete=models.CASCADE, related_name='dimensions')
+  dimension: Dimension = models.ForeignKey(Dimension, on_delete=models.CASCADE, related_name='+')
+  value: DimensionValue = models.ForeignKey(DimensionValue, on_delete=models.CASCADE, related_name='+')
+  updated_at: datetime = models.DateTimeField()
+
+class Archive(models.Model):
+  """
+  One archival run: vouchers dated before `cutoff` moved to the archive
+  tables, their balances carried forward by `voucher`, dated the day before.
+  """
+
+  cutoff: date = models.DateField(unique=True)
+  voucher: Voucher = models.OneToOneField(Voucher, on_delete=models.PROTECT, null=True, related_name='+')
+  vouchers: int = models.IntegerField(default=0)
+  ledgers: int = models.IntegerField(default=0)
+  archived_at: datetime = models.DateTimeField(auto_now_add=True)
+
+  @classmethod
+  def latest_cutoff(cls) -> Optional[date]:
+    return cls.objects.aggregate(cutoff=models.Max('cutoff'))['cutoff']
+
+  @classmethod
+  def voucher_ids(cls):
+    """carry-forward vouchers, left out wherever archived rows are read instead"""
+    return cls.objects.filter(voucher__isnull=False).values('voucher_id')
+
+  @staticmethod
+  def spans(start: Optional[date], end: date, cutoff: Optional[date]) -> bool:
+    """whether live rows plus carry-forwards can't answer the range (start None for everything before end)"""
+    if cutoff is None:
+      return False
+    if start is None:
+      return end < cutoff - timedelta(days=1)
+    return start < cutoff
+
+  def __str__(self):
+    return f'before {self.cutoff}'
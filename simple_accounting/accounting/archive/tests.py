@@ -0,0 +1,115 @@
+import os
+import re
+import tempfile
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from accounting.models import Account, Voucher, Ledger, Archive, ArchivedVoucher, ArchivedLedger, ArchivedLedgerDimension
+from accounting.models import Dimension, DimensionValue, LedgerDimension
+from accounting.analytics.cube import refresh, pivot
+from accounting.snapshot.ledger import write_snapshot, LedgerSnapshot
+from accounting.statements.builders import BalanceSheet, IncomeStatement
+from accounting.testing import LedgerTestCase
+from accounting.voucher.posting import reverse_vouchers
+from .archiver import archive_before
+
+class ArchiveTest(LedgerTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.equity = self.account("Capital", "3.1", Account.AccountTypes.EQUITY)
+    self.rent = self.account("Rent", "5.1", Account.AccountTypes.EXPENSE)
+    self.post("2021-01-05", (self.equity, 500), (self.cash, 500))
+    self.post("2021-03-01", (self.sales, 1000), (self.cash, 1000))
+    self.post("2021-09-01", (self.rent, 400), (self.cash, -400))
+    self.post("2022-02-01", (self.sales, 50), (self.cash, 50))
+
+  def figures(self):
+    return [
+      BalanceSheet(date(2021, 6, 30), date(2022, 12, 31)).build().to_dict(),
+      IncomeStatement(date(2021, 1, 1), date(2021, 12, 31), date(2022, 1, 1), date(2022, 12, 31)).build().to_dict(),
+      IncomeStatement(date(2021, 7, 1), date(2022, 6, 30)).build().to_dict(),
+    ]
+
+  def test_moves_vouchers_and_carries_balances_forward(self):
+    """archived rows leave the live tables, statements read the same"""
+    before = self.figures()
+    archive = archive_before(date(2022, 1, 1), self.vtype)
+    self.assertEqual((archive.vouchers, archive.ledgers), (3, 6))
+    self.assertEqual(ArchivedVoucher.objects.count(), 3)
+    self.assertEqual(ArchivedLedger.objects.count(), 6)
+    self.assertEqual(Voucher.objects.filter(voucher_date__lt=date(2021, 12, 31)).count(), 0)
+    self.assertEqual(archive.voucher.voucher_date, date(2021, 12, 31))
+    carried = {ledger.account_id: ledger.amount for ledger in archive.voucher.ledgers.all()}
+    self.assertEqual(carried, {self.cash.pk: Decimal(1100), self.equity.pk: Decimal(500), self.sales.pk: Decimal(1000), self.rent.pk: Decimal(400)})
+    self.assertEqual(self.figures(), before)
+
+  def test_refuses_pending_vouchers_and_repeated_cutoffs(self):
+    """pending vouchers must be settled and cutoffs only move forward"""
+    Voucher(voucher_date="2021-05-01", voucher_type=self.vtype).save()
+    with self.assertRaises(ValidationError):
+      archive_before(date(2022, 1, 1), self.vtype)
+    Voucher.objects.filter(status=Voucher.Status.PENDING).update(status=Voucher.Status.REJECTED, __v=2)
+    archive_before(date(2022, 1, 1), self.vtype)
+    self.assertRaises(ValidationError, archive_before, date(2021, 6, 1), self.vtype)
+    self.assertEqual(Archive.objects.count(), 1)
+
+  def test_reversal_pairs_leave_in_one_batch(self):
+    """an original and its reversal a batch apart are deleted together, unlinked first"""
+    voucher = self.post("2021-04-01", (self.sales, 70), (self.cash, 70))
+    self.post("2021-04-02", (self.sales, 5), (self.cash, 5))
+    reversal, = reverse_vouchers([voucher], voucher_date=date(2021, 4, 3))
+    table = Voucher._meta.db_table
+    with CaptureQueriesContext(connection) as queries:
+      archive = archive_before(date(2022, 1, 1), self.vtype, batch_size=1)
+    self.assertEqual(archive.vouchers, 6)
+    deleted = [
+      {int(pk) for pk in re.search(r'IN \(([\d, ]+)\)', query['sql']).group(1).split(',')}
+      for query in queries.captured_queries if query['sql'].startswith(f'DELETE FROM "{table}"')
+    ]
+    self.assertIn({voucher.pk, reversal.pk}, deleted)
+    self.assertEqual(ArchivedVoucher.objects.get(pk=reversal.pk).reversal_of_id, voucher.pk)
+
+  def test_reversals_across_the_cutoff_stay_live(self):
+    """a voucher reversed after the cutoff is kept next to its reversal"""
+    voucher = self.post("2021-11-01", (self.sales, 70), (self.cash, 70))
+    reverse_vouchers([voucher], voucher_date=date(2022, 1, 15))
+    before = self.figures()
+    archive = archive_before(date(2022, 1, 1), self.vtype)
+    self.assertEqual(archive.vouchers, 3)
+    self.assertTrue(Voucher.objects.filter(pk=voucher.pk).exists())
+    self.assertEqual(self.figures(), before)
+
+  def test_cube_snapshot_and_api_span_the_archive(self):
+    """archived months keep their cube cells, snapshot records and API listing"""
+    center = Dimension.objects.create(code='cost_center', name='Cost Center')
+    north = DimensionValue.objects.create(dimension=center, code='N', name='North')
+    LedgerDimension.tag(Ledger.objects.get(account=self.sales, voucher__voucher_date="2021-03-01"), north)
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    path = os.path.join(directory.name, 'ledger.snapshot')
+    def snapshot():
+      write_snapshot(path)
+      with LedgerSnapshot(path) as snapshot:
+        return snapshot.count, snapshot.balances(end=date(2021, 6, 30)), snapshot.by_period(self.cash.pk)
+    refresh(full=True)
+    before = pivot('cost_center'), snapshot()
+    archive_before(date(2022, 1, 1), self.vtype)
+    refresh(full=True)
+    self.assertEqual((pivot('cost_center'), snapshot()), before)
+    self.assertEqual(ArchivedLedgerDimension.objects.count(), 1)
+    self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+    data = self.client.get('/api/archived-vouchers/').json()
+    self.assertEqual([item['voucher_date'] for item in data['results']], ['2021-01-05', '2021-03-01', '2021-09-01'])
+    self.assertEqual(data['results'][1]['amount'], '1000.000000')
+
+  def test_command(self):
+    """the management command reports what it archived"""
+    out = StringIO()
+    call_command('archive_ledger', '2022-01-01', '--voucher-type', 'JV', stdout=out)
+    self.assertIn('archived 3 vouchers and 6 ledgers', out.getvalue())
@@ -0,0 +1,112 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import connection, transaction
+from accounting.fields import from_minor, AMOUNT_DECIMAL_PLACES
+
+def _timed(func, repeat=5) -> float:
+  best = float('inf')
+  for _ in range(repeat):
+    start = time.perf_counter()
+    func()
+    best = min(best, time.perf_counter() - start)
+  return best
+
+def _table_bytes(table: str):
+  if connection.vendor != 'mysql':
+    return None
+  with connection.cursor() as cursor:
+    cursor.execute(
+      'SELECT data_length FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+      [table],
+    )
+    row = cursor.fetchone()
+  return row[0] if row else None
+
+def amounts(rows: int = 100000) -> dict:
+  """
+  DECIMAL(30,6) against scaled BIGINT amounts: storage per value, database
+  SUM, and reading every row into Python values and adding them up.
+  """
+  rng = random.Random(0)
+  minor = [rng.randint(-10 ** 12, 10 ** 12) for _ in range(rows)]
+  decimals = [str(from_minor(value)) for value in minor]
+  results = {'rows': rows}
+  with connection.cursor() as cursor:
+    cursor.execute('CREATE TEMPORARY TABLE bench_decimal_amount (amount DECIMAL(30,6) NOT NULL)')
+    cursor.execute('CREATE TEMPORARY TABLE bench_minor_amount (amount BIGINT NOT NULL)')
+    try:
+      cursor.executemany('INSERT INTO bench_decimal_amount (amount) VALUES (%s)', [(value,) for value in decimals])
+      cursor.executemany('INSERT INTO bench_minor_amount (amount) VALUES (%s)', [(value,) for value in minor])
+      def db_sum(table):
+        cursor.execute(f'SELECT SUM(amount) FROM {table}')
+        cursor.fetchone()
+      results['db_sum_decimal'] = _timed(lambda: db_sum('bench_decimal_amount'))
+      results['db_sum_minor'] = _timed(lambda: db_sum('bench_minor_amount'))
+      results['bytes_decimal'] = _table_bytes('bench_decimal_amount')
+      results['bytes_minor'] = _table_bytes('bench_minor_amount')
+    finally:
+      cursor.execute('DROP TABLE bench_decimal_amount')
+      cursor.execute('DROP TABLE bench_minor_amount')
+  # DECIMAL(30,6) packs 9 digits per 4 bytes: 24 integer digits in 11 bytes, 6 fraction digits in 3
+  results['value_bytes_decimal'] = 14
+  results['value_bytes_minor'] = 8
+  results['python_sum_decimal'] = _timed(lambda: sum(Decimal(value) for value in decimals))
+  results['python_sum_minor'] = _timed(lambda: from_minor(sum(minor), AMOUNT_DECIMAL_PLACES))
+  return results
+
+def bulk_load(rows: int = 100000) -> dict:
+  """
+  Posting ledgers with post_vouchers (bulk_create) against load_vouchers
+  (COPY, LOAD DATA or chunked executemany into staging tables, then INSERT
+  ... SELECT), two ledgers per voucher. Nothing is kept: every run is rolled
+  back.
+  """
+  from accounting.account.models import Account
+  from accounting.voucher.models import VoucherType, Voucher, Ledger
+  from accounting.voucher.posting import post_vouchers
+  from accounting.voucher.loader import LedgerRow, load_vouchers, native_method
+  rng = random.Random(0)
+  lines = [
+    (date(2000, 1, 1) + timedelta(days=rng.randrange(3650)), from_minor(rng.randint(1, 10 ** 9), 2))
+    for _ in range(max(rows // 2, 1))
+  ]
+  results = {'rows': len(lines) * 2}
+  with transaction.atomic():
+    # inside the transaction a load stays on default
+    results['method'] = native_method() or 'executemany'
+    cash = Account(name='Benchmark Cash', account_number='BENCH.1', account_type=Account.AccountTypes.ASSET)
+    sales = Account(name='Benchmark Sales', account_number='BENCH.2', account_type=Account.AccountTypes.REVENUE)
+    cash.save()
+    sales.save()
+    vtype = VoucherType(name='Benchmark Voucher', prefix='BNCH')
+    vtype.save()
+
+    def posted():
+      with transaction.atomic():
+        post_vouchers([
+          (Voucher(voucher_date=on, voucher_type=vtype, status=Voucher.Status.APPROVED), [Ledger(account=cash, amount=amount), Ledger(account=sales, amount=amount)])
+          for on, amount in lines
+        ], check_duplicates=False)
+        transaction.set_rollback(True)
+
+    def loaded():
+      with transaction.atomic():
+        load_vouchers(
+          LedgerRow(str(number), on, 'BNCH', account, amount)
+          for number, (on, amount) in enumerate(lines) for account in ('BENCH.1', 'BENCH.2')
+        )
+        transaction.set_rollback(True)
+
+    results['bulk_create'] = _timed(posted, repeat=1)
+    results['native_load'] = _timed(loaded, repeat=1)
+    transaction.set_rollback(True)
+  results['bulk_create_rows_per_second'] = int(results['rows'] / results['bulk_create'])
+  results['native_load_rows_per_second'] = int(results['rows'] / results['native_load'])
+  return results
+
+BENCHMARKS = {
+  'amounts': amounts,
+  'bulk_load': bulk_load,
+}
@@ -0,0 +1,48 @@
+from django.db import models
+from django.utils import timezone
+from datetime import datetime
+from accounting.utils import keyset_after
+
+class Checkpoint(models.Model):
+  """High-water mark of an incremental job, as the last processed (timestamp, id)"""
+
+  name: str = models.CharField(max_length=64, unique=True)
+  position_at: datetime = models.DateTimeField(null=True, blank=True)
+  position_id: int = models.BigIntegerField(default=0)
+  updated_at: datetime = models.DateTimeField(auto_now=True)
+
+  @classmethod
+  def load(cls, name: str) -> "Checkpoint":
+    checkpoint, _ = cls.objects.get_or_create(name=name)
+    return checkpoint
+
+  @classmethod
+  def bump(cls, name: str):
+    """moves a version counter on in the current transaction, so it commits or rolls back with the change"""
+    bump = lambda: cls.objects.filter(name=name).update(position_id=models.F('position_id') + 1, updated_at=timezone.now())
+    if not bump():
+      cls.load(name)
+      bump()
+
+  @classmethod
+  def version(cls, name: str) -> str:
+    """
+    Current value of a version counter, shared by every process. The time
+    of the bump tells apart a number reused after a rollback.
+    """
+    row = cls.objects.filter(name=name).values_list('position_id', 'updated_at').first()
+    return f'{row[0]}.{row[1].timestamp()}' if row else '0'
+
+  def pending(self, queryset, field='updated_at'):
+    return keyset_after(queryset, field, self.position_at, self.position_id)
+
+  def advance(self, position_at: datetime, position_id: int):
+    self.position_at = position_at
+    self.position_id = position_id
+    self.save(update_fields=['position_at', 'position_id', 'updated_at'])
+
+  def reset(self):
+    self.advance(None, 0)
+
+  def __str__(self):
+    return f'{self.name} @ {self.position_at} #{self.position_id}'
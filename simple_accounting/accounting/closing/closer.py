@@ -0,0 +1,81 @@
+from datetime import date
+from typing import Dict
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+from accounting.account.models import Account
+from accounting.voucher.models import VoucherType, Voucher, Ledger
+from accounting.voucher.posting import post_vouchers, reverse_vouchers
+from .models import YearClosing
+
+def retained_earnings_account() -> Account:
+  number = getattr(settings, 'ACCOUNTING_RETAINED_EARNINGS_ACCOUNT', None)
+  if not number:
+    raise ValidationError('ACCOUNTING_RETAINED_EARNINGS_ACCOUNT is not set')
+  return Account.objects.get(account_number=number)
+
+def closing_balances(start: date, end: date, entity_id: int = None) -> Dict[int, object]:
+  """natural balance of every revenue and expense account of an entity (None for the default books) over the year, from one grouped query"""
+  rows = (
+    Ledger.objects
+      .filter(
+        entity_id=entity_id,
+        voucher__status=Voucher.Status.APPROVED,
+        voucher__voucher_date__gte=start,
+        voucher__voucher_date__lte=end,
+        account__account_type__in=(Account.AccountTypes.REVENUE, Account.AccountTypes.EXPENSE),
+      )
+      .values('account_id', 'account__account_type')
+      .annotate(balance=models.Sum('amount'))
+      .exclude(balance=0)
+      .order_by('account_id')
+  )
+  return {row['account_id']: (row['account__account_type'], row['balance']) for row in rows}
+
+def close_year(start: date, end: date, voucher_type: VoucherType, retained_earnings: Account = None) -> YearClosing:
+  """
+  Posts one approved voucher dated `end` that zeroes every revenue and expense
+  account of the year, balanced by the net income booked to retained earnings.
+  Only the ledgers of the voucher type's entity are closed.
+  """
+  retained_earnings = retained_earnings or retained_earnings_account()
+  if retained_earnings.account_type != Account.AccountTypes.EQUITY:
+    raise ValidationError(f'{retained_earnings} is not an equity account')
+  entity_id = voucher_type.entity_id
+  if retained_earnings.entity_id != entity_id:
+    raise ValidationError(f'{retained_earnings} belongs to another entity than {voucher_type}')
+  with transaction.atomic():
+    # serializes closings of the same year
+    list(Account.objects.select_for_update().filter(pk=retained_earnings.pk))
+    if YearClosing.objects.filter(entity_id=entity_id, start_date__lte=end, end_date__gte=start, reopened_at__isnull=True).exists():
+      raise ValidationError(f'{start} - {end} overlaps a closed year')
+    balances = closing_balances(start, end, entity_id)
+    ledgers = [Ledger(account_id=account_id, amount=-balance) for account_id, (_, balance) in balances.items()]
+    net_income = (
+      sum(balance for account_type, balance in balances.values() if account_type == Account.AccountTypes.REVENUE) -
+      sum(balance for account_type, balance in balances.values() if account_type == Account.AccountTypes.EXPENSE)
+    )
+    if net_income:
+      ledgers.append(Ledger(account=retained_earnings, amount=net_income))
+    voucher = Voucher(
+      voucher_date=end,
+      voucher_type=voucher_type,
+      description=f'Closing {start} - {end}',
+      status=Voucher.Status.APPROVED,
+    )
+    post_vouchers([(voucher, ledgers)], check_duplicates=False)
+    return YearClosing.objects.create(start_date=start, end_date=end, retained_earnings=retained_earnings, entity_id=entity_id, voucher=voucher)
+
+def reopen_year(closing: YearClosing, voucher_type: VoucherType = None) -> YearClosing:
+  """undoes a closing with a reversal voucher dated like the closing one"""
+  with transaction.atomic():
+    closing = YearClosing.objects.select_for_update().get(pk=closing.pk)
+    if closing.reopened_at is not None:
+      raise ValidationError(f'{closing} is not closed')
+    if voucher_type is not None and voucher_type.entity_id != closing.entity_id:
+      raise ValidationError(f'{voucher_type} belongs to another entity than {closing}')
+    closing.reversal, = reverse_vouchers([closing.voucher], voucher_type=voucher_type)
+    closing.reopened_at = timezone.now()
+    closing.save(update_fields=['reversal', 'reopened_at'])
+  return closing
@@ -0,0 +1,35 @@
+from django.db import models
+from datetime import date, datetime
+from accounting.account.models import Account
+from accounting.entity.models import Entity
+from accounting.voucher.models import Voucher
+
+class YearClosing(models.Model):
+  """Revenue and expense balances of an entity's year moved into retained earnings by one closing voucher"""
+
+  start_date: date = models.DateField()
+  end_date: date = models.DateField()
+  retained_earnings: Account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name='+')
+  # the closing voucher type's entity, whose ledgers alone are closed
+  entity: Entity = models.ForeignKey(Entity, null=True, blank=True, on_delete=models.PROTECT, related_name='+')
+  voucher: Voucher = models.OneToOneField(Voucher, on_delete=models.PROTECT, related_name='+')
+  # set when the year is reopened, the reversal voucher undoes the closing voucher
+  reversal: Voucher = models.OneToOneField(Voucher, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+  closed_at: datetime = models.DateTimeField(auto_now_add=True)
+  reopened_at: datetime = models.DateTimeField(null=True, blank=True)
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['end_date', 'reopened_at']),
+    ]
+
+  @classmethod
+  def voucher_ids(cls):
+    """closing and reversal vouchers, which periodic reports leave out"""
+    return Voucher.objects.filter(
+      models.Q(pk__in=cls.objects.values('voucher_id')) |
+      models.Q(pk__in=cls.objects.filter(reversal__isnull=False).values('reversal_id'))
+    ).values('pk')
+
+  def __str__(self):
+    return f'{self.start_date} - {self.end_date}'
@@ -0,0 +1,69 @@
+from datetime import date
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.test import override_settings
+from accounting.models import Entity, Account, VoucherType, Voucher, Ledger, YearClosing
+from accounting.statements.builders import IncomeStatement
+from accounting.testing import LedgerTestCase
+from .closer import close_year, reopen_year
+
+@override_settings(ACCOUNTING_RETAINED_EARNINGS_ACCOUNT='3.1')
+class YearClosingTest(LedgerTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.retained = self.account("Retained Earnings", "3.1", Account.AccountTypes.EQUITY)
+    self.rent = self.account("Rent", "5.1", Account.AccountTypes.EXPENSE)
+    self.post("2022-03-01", (self.sales, 1000), (self.cash, 1000))
+    self.post("2022-06-01", (self.rent, 400), (self.cash, -400))
+    self.post("2023-01-10", (self.sales, 50), (self.cash, 50))
+
+  def balance(self, account, end=date(2022, 12, 31)):
+    return Ledger.objects.filter(account=account, voucher__voucher_date__lte=end).aggregate(total=models.Sum('amount'))['total']
+
+  def test_closes_revenue_and_expenses_into_retained_earnings(self):
+    """the closing voucher zeroes the year and books net income to equity"""
+    closing = close_year(date(2022, 1, 1), date(2022, 12, 31), self.vtype)
+    self.assertEqual(closing.voucher.voucher_date, date(2022, 12, 31))
+    self.assertEqual((self.balance(self.sales), self.balance(self.rent)), (0, 0))
+    self.assertEqual(self.balance(self.retained), Decimal(600))
+    self.assertEqual(self.balance(self.sales, date(2023, 12, 31)), Decimal(50))
+    statement = IncomeStatement(date(2022, 1, 1), date(2022, 12, 31)).build()
+    self.assertEqual(statement.summary[0].amounts, (Decimal(600),))
+    with self.assertRaises(ValidationError):
+      close_year(date(2022, 1, 1), date(2022, 12, 31), self.vtype)
+
+  def test_reopening_reverses_the_closing(self):
+    """a reopened year has its balances back and can be closed again"""
+    closing = close_year(date(2022, 1, 1), date(2022, 12, 31), self.vtype)
+    reopen_year(closing)
+    self.assertEqual((self.balance(self.sales), self.balance(self.rent), self.balance(self.retained)), (Decimal(1000), Decimal(400), 0))
+    self.assertEqual(IncomeStatement(date(2022, 1, 1), date(2022, 12, 31)).build().summary[0].amounts, (Decimal(600),))
+    self.assertRaises(ValidationError, reopen_year, closing)
+    self.post("2022-07-01", (self.sales, 100), (self.cash, 100))
+    close_year(date(2022, 1, 1), date(2022, 12, 31), self.vtype)
+    self.assertEqual(self.balance(self.retained), Decimal(700))
+    self.assertEqual(YearClosing.objects.filter(reopened_at__isnull=True).count(), 1)
+
+  def test_closes_one_entity(self):
+    """only the voucher type's entity is closed, into retained earnings of its own"""
+    branch = Entity.objects.create(code="B", name="Branch")
+    sales = Account(name="Branch Sales", account_number="B4.1", account_type=Account.AccountTypes.REVENUE, entity=branch)
+    bank = Account(name="Branch Bank", account_number="B1.1", account_type=Account.AccountTypes.ASSET, entity=branch)
+    retained = Account(name="Branch Retained Earnings", account_number="B3.1", account_type=Account.AccountTypes.EQUITY, entity=branch)
+    for account in (sales, bank, retained):
+      account.save()
+    vtype = VoucherType(name="Branch Journal", prefix="BJ", entity=branch)
+    vtype.save()
+    voucher = Voucher(voucher_date="2022-05-01", voucher_type=vtype, status=Voucher.Status.APPROVED)
+    voucher.save()
+    Ledger(voucher=voucher, account=sales, amount=100).save()
+    Ledger(voucher=voucher, account=bank, amount=100).save()
+    close_year(date(2022, 1, 1), date(2022, 12, 31), self.vtype)
+    self.assertEqual((self.balance(sales), self.balance(self.retained)), (Decimal(100), Decimal(600)))
+    self.assertRaises(ValidationError, close_year, date(2022, 1, 1), date(2022, 12, 31), vtype)
+    closing = close_year(date(2022, 1, 1), date(2022, 12, 31), vtype, retained)
+    self.assertEqual((self.balance(sales), self.balance(retained)), (0, Decimal(100)))
+    self.assertEqual(set(Ledger.objects.filter(voucher=closing.voucher).values_list('entity', flat=True)), {branch.pk})
+    self.assertRaises(ValidationError, reopen_year, closing, self.vtype)
@@ -0,0 +1,7 @@
+from django.contrib import admin
+
+class GroupMappingAdmin(admin.ModelAdmin):
+  list_display = ('account', 'group_account', 'counterparty')
+  list_filter = ('account__entity', 'counterparty')
+  autocomplete_fields = ('account', 'group_account')
+  list_select_related = ('account', 'group_account', 'counterparty')
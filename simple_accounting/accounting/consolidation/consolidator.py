@@ -0,0 +1,109 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections, models
+from accounting.routers import reporting_reads
+from accounting.account.models import Account
+from accounting.entity.models import Entity
+from accounting.archive.models import Archive, ArchivedLedger
+from accounting.voucher.models import Voucher, Ledger, DEBIT_ACCOUNT_TYPES
+from .models import GroupMapping
+
+INCOME_ACCOUNT_TYPES = (Account.AccountTypes.REVENUE, Account.AccountTypes.EXPENSE)
+
+class Consolidation(NamedTuple):
+  # group account -> balance after eliminations
+  balances: Dict[int, Decimal]
+  # entity -> group account -> balance before eliminations
+  entities: Dict[int, Dict[int, Decimal]]
+  # (entity, counterparty, income statement) -> intercompany balance eliminated, debit positive
+  eliminations: Dict[Tuple[int, int, bool], Decimal]
+
+  def differences(self) -> Dict[Tuple[int, int, bool], Decimal]:
+    """
+    (entity, counterparty, income statement) -> amount by which the two
+    sides of intercompany balances or transactions don't cancel out
+    """
+    differences = {}
+    for (entity, counterparty, income), amount in self.eliminations.items():
+      key = (min(entity, counterparty), max(entity, counterparty), income)
+      differences[key] = differences.get(key, 0) + amount
+    return {key: amount for key, amount in differences.items() if amount}
+
+def _sums(ledgers, entity_id: int, end: date, start: Optional[date]):
+  ledgers = ledgers.filter(entity_id=entity_id, voucher__status=Voucher.Status.APPROVED, voucher__voucher_date__lte=end)
+  if start is not None:
+    ledgers = ledgers.filter(voucher__voucher_date__gte=start)
+  return ledgers.values('account_id').annotate(total=models.Sum('amount')).order_by().values_list('account_id', 'total')
+
+def trial_balance(entity_id: int, end: date, start: Optional[date] = None) -> Dict[int, Decimal]:
+  """
+  account -> balance of an entity's approved ledgers dated up to end (and
+  from start). Ranges reaching before the archive cutoff read archived
+  ledgers instead of carry-forward vouchers, like the statements.
+  """
+  ledgers = Ledger.objects.all()
+  if not Archive.spans(start, end, Archive.latest_cutoff()):
+    return dict(_sums(ledgers, entity_id, end, start))
+  balances = dict(_sums(ledgers.exclude(voucher__in=Archive.voucher_ids()), entity_id, end, start))
+  for account_id, total in _sums(ArchivedLedger.objects.all(), entity_id, end, start):
+    balances[account_id] = balances.get(account_id, 0) + total
+  return balances
+
+def _entity_balance(entity_id: int, end: date, start: Optional[date]) -> Dict[int, Decimal]:
+  # runs on a pool thread, with a connection of its own
+  try:
+    with reporting_reads():
+      return trial_balance(entity_id, end, start)
+  finally:
+    connections.close_all()
+
+def trial_balances(entity_ids: Sequence[int], end: date, start: Optional[date] = None, workers: int = None) -> List[Dict[int, Decimal]]:
+  """trial balances of several entities, computed in parallel by up to ACCOUNTING_CONSOLIDATION_WORKERS threads"""
+  workers = min(len(entity_ids), workers or getattr(settings, 'ACCOUNTING_CONSOLIDATION_WORKERS', 4))
+  if workers <= 1:
+    with reporting_reads():
+      return [trial_balance(entity_id, end, start) for entity_id in entity_ids]
+  with ThreadPoolExecutor(max_workers=workers) as pool:
+    # each task gets the caller's context, so replica routing and pinning carry over
+    futures = [pool.submit(copy_context().run, _entity_balance, entity_id, end, start) for entity_id in entity_ids]
+    return [future.result() for future in futures]
+
+def consolidate(entities: Sequence[Entity], end: date, start: Optional[date] = None, workers: int = None) -> Consolidation:
+  """
+  Group trial balance of entities: their trial balances mapped onto the
+  group chart by GroupMapping and summed, less the intercompany balances
+  between consolidated entities.
+  """
+  entity_ids = [entity.pk for entity in entities]
+  mappings = {
+    account_id: (group_account_id, counterparty_id, account_type)
+    for account_id, group_account_id, counterparty_id, account_type in GroupMapping.objects
+      .filter(account__entity__in=entity_ids)
+      .values_list('account_id', 'group_account_id', 'counterparty_id', 'account__account_type')
+  }
+  result = Consolidation({}, {}, {})
+  unmapped = []
+  for entity_id, balances in zip(entity_ids, trial_balances(entity_ids, end, start, workers)):
+    grouped = result.entities[entity_id] = {}
+    for account_id, amount in balances.items():
+      if not amount:
+        continue
+      if account_id not in mappings:
+        unmapped.append(account_id)
+        continue
+      group_account_id, counterparty_id, account_type = mappings[account_id]
+      grouped[group_account_id] = grouped.get(group_account_id, 0) + amount
+      if counterparty_id in entity_ids:
+        key = (entity_id, counterparty_id, account_type in INCOME_ACCOUNT_TYPES)
+        result.eliminations[key] = result.eliminations.get(key, 0) + (amount if account_type in DEBIT_ACCOUNT_TYPES else -amount)
+      else:
+        result.balances[group_account_id] = result.balances.get(group_account_id, 0) + amount
+  if unmapped:
+    names = Account.objects.filter(pk__in=unmapped[:5]).order_by('account_number')
+    raise ValidationError(f'accounts without a group account: {", ".join(map(str, names))}')
+  return result
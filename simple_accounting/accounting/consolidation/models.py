@@ -0,0 +1,23 @@
+from django.core.exceptions import ValidationError
+from django.db import models
+from accounting.account.models import Account
+from accounting.entity.models import Entity
+
+class GroupMapping(models.Model):
+  """
+  Maps an entity's account onto the group chart. Balances of accounts with a
+  counterparty are intercompany, eliminated when both entities are consolidated.
+  """
+
+  account: Account = models.OneToOneField(Account, on_delete=models.CASCADE, related_name='group_mapping')
+  group_account: Account = models.ForeignKey(Account, on_delete=models.PROTECT, related_name='+')
+  counterparty: Entity = models.ForeignKey(Entity, null=True, blank=True, on_delete=models.PROTECT, related_name='+')
+
+  def clean(self):
+    if self.account.account_type != self.group_account.account_type:
+      raise ValidationError('The group account must have the same account type')
+    if self.counterparty_id is not None and self.counterparty_id == self.account.entity_id:
+      raise ValidationError("An entity can't be its own counterparty")
+
+  def __str__(self):
+    return f'{self.account} -> {self.group_account}'
@@ -0,0 +1,124 @@
+from datetime import date
+from io import StringIO
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from accounting.models import Entity, Account, VoucherType, Voucher, Ledger, GroupMapping
+from accounting.archive.archiver import archive_before
+from .consolidator import consolidate
+
+class ConsolidationSetup:
+
+  def setUp(self):
+    self.parent = Entity.objects.create(code="P", name="Parent")
+    self.subsidiary = Entity.objects.create(code="S", name="Subsidiary")
+    self.group = {}
+    for number, name, account_type in (
+      ("1.1", "Group Cash", Account.AccountTypes.ASSET),
+      ("1.2", "Group Intercompany Receivables", Account.AccountTypes.ASSET),
+      ("2.1", "Group Intercompany Payables", Account.AccountTypes.LIABILITY),
+      ("4.1", "Group Sales", Account.AccountTypes.REVENUE),
+      ("5.1", "Group Purchases", Account.AccountTypes.EXPENSE),
+    ):
+      self.group[number] = self.account(name=name, account_number=number, account_type=account_type)
+    self.accounts = {}
+    for entity, number, group, counterparty in (
+      (self.parent, "P1.1", "1.1", None),
+      (self.parent, "P1.2", "1.2", self.subsidiary),
+      (self.parent, "P4.1", "4.1", None),
+      (self.parent, "P4.2", "4.1", self.subsidiary),
+      (self.subsidiary, "S1.1", "1.1", None),
+      (self.subsidiary, "S2.1", "2.1", self.parent),
+      (self.subsidiary, "S5.1", "5.1", self.parent),
+    ):
+      account = self.account(
+        name=f"{entity.code} {self.group[group].name}", account_number=number,
+        account_type=self.group[group].account_type, entity=entity,
+      )
+      GroupMapping.objects.create(account=account, group_account=self.group[group], counterparty=counterparty)
+      self.accounts[number] = account
+    self.types = {
+      entity.pk: VoucherType.objects.create(name=f"{entity.code} Journal", prefix=f"{entity.code}JV", entity=entity)
+      for entity in (self.parent, self.subsidiary)
+    }
+    # the parent sells 100 to the subsidiary on credit and 50 to outsiders for cash
+    self.post(self.parent, ("P1.2", 100), ("P4.2", 100))
+    self.post(self.parent, ("P1.1", 50), ("P4.1", 50))
+    self.post(self.subsidiary, ("S5.1", 100), ("S2.1", 100))
+
+  def account(self, **fields):
+    account = Account(**fields)
+    account.save()
+    return account
+
+  def post(self, entity, *lines, on="2022-03-01"):
+    with transaction.atomic():
+      voucher = Voucher(voucher_date=on, voucher_type=self.types[entity.pk], status=Voucher.Status.APPROVED)
+      voucher.save()
+      for number, amount in lines:
+        Ledger(voucher=voucher, account=self.accounts[number], amount=amount).save()
+    return voucher
+
+  def balances(self, result):
+    return {Account.objects.get(pk=pk).account_number: amount for pk, amount in result.balances.items() if amount}
+
+class ConsolidationTest(ConsolidationSetup, TestCase):
+
+  def test_eliminates_intercompany_balances(self):
+    """balances between consolidated entities cancel out, the rest is summed per group account"""
+    result = consolidate([self.parent, self.subsidiary], date(2022, 12, 31), workers=1)
+    self.assertEqual(self.balances(result), {"1.1": 50, "4.1": 50})
+    self.assertEqual(result.entities[self.parent.pk][self.group["4.1"].pk], 150)
+    self.assertEqual(result.differences(), {})
+
+  def test_reports_intercompany_differences(self):
+    """unmatched intercompany balances are reported per pair of entities"""
+    self.post(self.subsidiary, ("S2.1", -10), ("S5.1", -10))
+    result = consolidate([self.parent, self.subsidiary], date(2022, 12, 31), workers=1)
+    self.assertEqual(result.differences(), {(self.parent.pk, self.subsidiary.pk, False): 10, (self.parent.pk, self.subsidiary.pk, True): -10})
+
+  def test_keeps_balances_with_entities_left_out(self):
+    """a counterparty outside the consolidation is an outsider"""
+    result = consolidate([self.parent], date(2022, 12, 31), workers=1)
+    self.assertEqual(self.balances(result), {"1.1": 50, "1.2": 100, "4.1": 150})
+
+  def test_dates_and_unmapped_accounts(self):
+    """only ledgers in the range count, accounts without a group account are refused"""
+    self.assertEqual(self.balances(consolidate([self.parent], date(2022, 2, 28), workers=1)), {})
+    unmapped = self.account(name="P Bank", account_number="P1.3", account_type=Account.AccountTypes.ASSET, entity=self.parent)
+    self.accounts["P1.3"] = unmapped
+    self.post(self.parent, ("P1.3", 5), ("P4.1", 5), on="2022-04-01")
+    with self.assertRaises(ValidationError):
+      consolidate([self.parent], date(2022, 12, 31), workers=1)
+    self.assertEqual(self.balances(consolidate([self.parent], date(2022, 3, 31), start=date(2022, 3, 1), workers=1))["4.1"], 150)
+
+  def test_reads_archived_ledgers(self):
+    """balances before the archive cutoff come from the archive tables"""
+    self.post(self.parent, ("P1.1", 30), ("P4.1", 30), on="2021-06-01")
+    archive_before(date(2022, 1, 1), self.types[self.parent.pk])
+    self.assertFalse(Ledger.objects.filter(voucher__voucher_date="2021-06-01").exists())
+    for end in (date(2021, 6, 30), date(2021, 12, 31)):
+      self.assertEqual(self.balances(consolidate([self.parent], end, workers=1)), {"1.1": 30, "4.1": 30})
+    self.assertEqual(self.balances(consolidate([self.parent], date(2021, 6, 30), start=date(2021, 6, 1), workers=1)), {"1.1": 30, "4.1": 30})
+    self.assertEqual(self.balances(consolidate([self.parent], date(2022, 12, 31), workers=1)), {"1.1": 80, "1.2": 100, "4.1": 180})
+
+  def test_entity_scoping(self):
+    """ledgers take the entity of their voucher type, which accounts of other entities can't be posted with"""
+    self.assertEqual(set(Ledger.objects.filter(entity=self.subsidiary).values_list('account__account_number', flat=True)), {"S2.1", "S5.1"})
+    mapping = GroupMapping(account=self.accounts["S5.1"], group_account=self.group["4.1"])
+    with self.assertRaises(ValidationError):
+      mapping.clean()
+
+  def test_command(self):
+    """prints the group trial balance"""
+    out = StringIO()
+    call_command('consolidate', '--as-of', '2022-12-31', '--workers', '1', stdout=out)
+    self.assertEqual(out.getvalue().splitlines(), ["1.1 - Group Cash\t50.00", "4.1 - Group Sales\t50.00"])
+
+class ParallelConsolidationTest(ConsolidationSetup, TransactionTestCase):
+
+  def test_threads_match_inline(self):
+    """entity trial balances computed on worker threads give the same result"""
+    entities = [self.parent, self.subsidiary]
+    self.assertEqual(consolidate(entities, date(2022, 12, 31), workers=2), consolidate(entities, date(2022, 12, 31), workers=1))
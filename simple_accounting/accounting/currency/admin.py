@@ -0,0 +1,7 @@
+from django.contrib import admin
+
+class ExchangeRateAdmin(admin.ModelAdmin):
+  list_display = ('currency', 'date', 'rate')
+  list_filter = ('currency',)
+  ordering = ('currency', '-date')
+  date_hierarchy = 'date'
@@ -0,0 +1,53 @@
+from django.db import models, transaction
+from datetime import date
+from decimal import Decimal
+from accounting.checkpoint.models import Checkpoint
+
+RATES_VERSION = 'rates.version'
+
+def rates_version() -> str:
+  return Checkpoint.version(RATES_VERSION)
+
+def rates_changed():
+  Checkpoint.bump(RATES_VERSION)
+
+class ExchangeRateQuerySet(models.QuerySet):
+
+  def update(self, **kwargs) -> int:
+    updated = super().update(**kwargs)
+    rates_changed()
+    return updated
+
+  def delete(self):
+    result = super().delete()
+    rates_changed()
+    return result
+
+class ExchangeRate(models.Model):
+  """Base currency value of one unit of `currency`, effective from `date` until the next rate"""
+
+  objects = ExchangeRateQuerySet.as_manager()
+
+  currency: str = models.CharField(max_length=3)
+  date: date = models.DateField()
+  rate: Decimal = models.DecimalField(max_digits=24, decimal_places=10)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=['currency', 'date'], name='unique_exchange_rate_per_day'),
+    ]
+
+  def save(self, **kwargs):
+    self.currency = self.currency.upper()
+    with transaction.atomic():
+      super(ExchangeRate, self).save(**kwargs)
+      rates_changed()
+
+  def delete(self, **kwargs):
+    with transaction.atomic():
+      result = super(ExchangeRate, self).delete(**kwargs)
+      rates_changed()
+    return result
+
+  def __str__(self):
+    return f'{self.currency} {self.date}: {self.rate}'
@@ -0,0 +1,72 @@
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from accounting.fields import AMOUNT_DECIMAL_PLACES
+from .models import ExchangeRate, rates_version
+
+QUANTUM = Decimal(1).scaleb(-AMOUNT_DECIMAL_PLACES)
+
+class MissingRate(Exception):
+  def __init__(self, currency, on):
+    super().__init__(f'no exchange rate for {currency} on or before {on}')
+
+def base_currency() -> str:
+  return getattr(settings, 'ACCOUNTING_BASE_CURRENCY', 'USD')
+
+def is_foreign(currency: str) -> bool:
+  return bool(currency) and currency.upper() != base_currency()
+
+class RateTable:
+  """
+  Every exchange rate loaded by one query, per currency as parallel lists of
+  sorted dates and rates. The rate on a day is the latest one on or before
+  it, found by bisecting the dates.
+  """
+
+  _current: Optional["RateTable"] = None
+
+  def __init__(self, rows, version: str = None):
+    self.version = version
+    self.dates: Dict[str, List[date]] = {}
+    self.rates: Dict[str, List[Decimal]] = {}
+    for currency, on, rate in sorted(rows):
+      self.dates.setdefault(currency, []).append(on)
+      self.rates.setdefault(currency, []).append(rate)
+
+  @classmethod
+  def build(cls, version: str = None) -> "RateTable":
+    return cls(ExchangeRate.objects.values_list('currency', 'date', 'rate'), version)
+
+  @classmethod
+  def current(cls) -> "RateTable":
+    version = rates_version()
+    table = cls._current
+    if table is None or table.version != version:
+      table = cls._current = cls.build(version)
+    return table
+
+  def rate(self, currency: str, on: date) -> Decimal:
+    currency = currency.upper()
+    if not is_foreign(currency):
+      return Decimal(1)
+    dates = self.dates.get(currency, ())
+    index = bisect_right(dates, on) - 1
+    if index < 0:
+      raise MissingRate(currency, on)
+    return self.rates[currency][index]
+
+  def convert(self, amount: Decimal, currency: str, on: date) -> Decimal:
+    return (amount * self.rate(currency, on)).quantize(QUANTUM)
+
+  def convert_many(self, amounts: Dict[Tuple, Decimal], currency_of, on: date) -> Dict[Tuple, Decimal]:
+    """converts a whole set at once, looking each currency's rate up only once"""
+    rates = {}
+    converted = {}
+    for key, amount in amounts.items():
+      currency = currency_of(key)
+      if currency not in rates:
+        rates[currency] = self.rate(currency, on)
+      converted[key] = (amount * rates[currency]).quantize(QUANTUM)
+    return converted
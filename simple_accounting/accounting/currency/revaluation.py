@@ -0,0 +1,87 @@
+from datetime import date
+from decimal import Decimal
+from typing import List, NamedTuple, Optional
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from accounting.account.models import Account
+from accounting.voucher.models import Voucher, VoucherType, Ledger, DEBIT_ACCOUNT_TYPES
+from accounting.voucher.posting import post_ledgers
+from .rates import RateTable, base_currency
+
+# balances held in money: revenue, expense and equity stay at their historical rate
+MONETARY_ACCOUNT_TYPES = (Account.AccountTypes.ASSET, Account.AccountTypes.LIABILITY)
+
+class Revaluation(NamedTuple):
+  account_id: int
+  account_type: int
+  currency: str
+  entity_id: Optional[int]
+  foreign_balance: Decimal
+  booked: Decimal
+  revalued: Decimal
+
+  @property
+  def difference(self) -> Decimal:
+    return self.revalued - self.booked
+
+def revalue(as_of: date, accounts=None, rates: RateTable = None) -> List[Revaluation]:
+  """
+  Open foreign currency balances per (account, currency, entity) up to as_of,
+  from one grouped query, each converted at the as_of rate of its currency.
+  Without accounts, the asset and liability accounts are revalued.
+  """
+  rates = rates or RateTable.current()
+  ledgers = (
+    Ledger.objects
+      .filter(voucher__voucher_date__lte=as_of, voucher__status=Voucher.Status.APPROVED)
+      .exclude(currency='')
+      .exclude(currency=base_currency())
+  )
+  if accounts is not None:
+    ledgers = ledgers.filter(account__in=accounts)
+  else:
+    ledgers = ledgers.filter(account__account_type__in=MONETARY_ACCOUNT_TYPES)
+  balances = {
+    (row['account_id'], row['account__account_type'], row['currency'], row['entity_id']): (row['foreign'] or 0, row['booked'] or 0)
+    for row in ledgers
+      .values('account_id', 'account__account_type', 'currency', 'entity_id')
+      .annotate(foreign=models.Sum('currency_amount'), booked=models.Sum('amount'))
+      .order_by('account_id', 'currency', 'entity_id')
+  }
+  revalued = rates.convert_many({key: foreign for key, (foreign, _) in balances.items()}, lambda key: key[2], as_of)
+  return [Revaluation(*key, foreign, booked, revalued[key]) for key, (foreign, booked) in balances.items()]
+
+def post_revaluation(as_of: date, voucher_type: VoucherType, gain_loss_account: Account, accounts=None, description: str = None) -> Optional[Voucher]:
+  """
+  Books revaluation differences of the voucher type's entity as one approved
+  voucher: a base currency only line per revalued account and the balancing
+  line on gain_loss_account.
+  """
+  if gain_loss_account.entity_id != voucher_type.entity_id:
+    raise ValidationError(f'{gain_loss_account} belongs to another entity than {voucher_type}')
+  with transaction.atomic():
+    revaluations = [item for item in revalue(as_of, accounts) if item.difference and item.entity_id == voucher_type.entity_id]
+    if not revaluations:
+      return None
+    voucher = Voucher(
+      voucher_date=as_of,
+      voucher_type=voucher_type,
+      description=description or f'Exchange revaluation as of {as_of}',
+      status=Voucher.Status.APPROVED,
+    )
+    voucher.save()
+    ledgers = [
+      Ledger(voucher=voucher, account_id=item.account_id, amount=item.difference, currency=item.currency, currency_amount=0, entity_id=voucher.entity_id)
+      for item in revaluations
+    ]
+    # a debit side increase is offset by a credit side increase and the other way around
+    signed = sum(
+      item.difference if item.account_type in DEBIT_ACCOUNT_TYPES else -item.difference
+      for item in revaluations
+    )
+    offset = signed if gain_loss_account.account_type not in DEBIT_ACCOUNT_TYPES else -signed
+    if offset:
+      ledgers.append(Ledger(voucher=voucher, account=gain_loss_account, amount=offset, entity_id=voucher.entity_id))
+    post_ledgers(voucher, ledgers)
+    Voucher.objects.filter(pk=voucher.pk).refresh_fingerprints()
+    return voucher
@@ -0,0 +1,108 @@
+import datetime
+from decimal import Decimal
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+from accounting.models import Entity, Account, VoucherType, Voucher, Ledger, ExchangeRate, OutboxEvent
+from .rates import RateTable, MissingRate
+from .revaluation import revalue, post_revaluation
+
+@override_settings(ACCOUNTING_BASE_CURRENCY='USD')
+class RateTableTest(TestCase):
+
+  def setUp(self):
+    cache.clear()
+    ExchangeRate(currency='eur', date=datetime.date(2022, 1, 1), rate=Decimal('1.10')).save()
+    ExchangeRate(currency='EUR', date=datetime.date(2022, 2, 1), rate=Decimal('1.20')).save()
+
+  def test_uses_latest_rate_on_or_before_date(self):
+    """rates apply from their date until the next one"""
+    rates = RateTable.build()
+    self.assertEqual(rates.rate('EUR', datetime.date(2022, 1, 31)), Decimal('1.10'))
+    self.assertEqual(rates.rate('EUR', datetime.date(2022, 2, 1)), Decimal('1.20'))
+    self.assertEqual(rates.rate('USD', datetime.date(2000, 1, 1)), 1)
+    self.assertRaises(MissingRate, rates.rate, 'EUR', datetime.date(2021, 12, 31))
+
+  def test_current_table_is_cached_until_rates_change(self):
+    """the shared table is reloaded only after a rate changes"""
+    table = RateTable.current()
+    with self.assertNumQueries(1):
+      self.assertIs(RateTable.current(), table)
+    with self.captureOnCommitCallbacks(execute=True):
+      ExchangeRate(currency='GBP', date=datetime.date(2022, 1, 1), rate=Decimal('1.30')).save()
+    self.assertEqual(RateTable.current().rate('GBP', datetime.date(2022, 3, 1)), Decimal('1.30'))
+
+@override_settings(ACCOUNTING_BASE_CURRENCY='USD')
+class RevaluationTest(TestCase):
+
+  def setUp(self):
+    cache.clear()
+    ExchangeRate(currency='EUR', date=datetime.date(2022, 1, 1), rate=Decimal('1.10')).save()
+    ExchangeRate(currency='EUR', date=datetime.date(2022, 12, 31), rate=Decimal('1.20')).save()
+    self.bank = Account(name="Euro Bank", account_number="1.1", account_type=Account.AccountTypes.ASSET)
+    self.loan = Account(name="Euro Loan", account_number="2.1", account_type=Account.AccountTypes.LIABILITY)
+    self.equity = Account(name="Equity", account_number="3.1", account_type=Account.AccountTypes.EQUITY)
+    self.fx = Account(name="Exchange Gain", account_number="4.1", account_type=Account.AccountTypes.REVENUE)
+    for account in (self.bank, self.loan, self.equity, self.fx):
+      account.save()
+    self.vtype = VoucherType(name="Journal", prefix="JV")
+    self.vtype.save()
+    voucher = Voucher(voucher_date=datetime.date(2022, 3, 1), voucher_type=self.vtype, status=Voucher.Status.APPROVED)
+    voucher.save()
+    Ledger(voucher=voucher, account=self.bank, currency='eur', currency_amount=Decimal('1000')).save()
+    Ledger(voucher=voucher, account=self.loan, currency='EUR', currency_amount=Decimal('400')).save()
+    Ledger(voucher=voucher, account=self.equity, amount=Decimal('660')).save()
+
+  def test_ledgers_convert_transaction_amounts(self):
+    """base amount is converted from the transaction currency"""
+    bank = Ledger.objects.get(account=self.bank)
+    self.assertEqual((bank.currency, bank.currency_amount, bank.amount), ('EUR', Decimal('1000'), Decimal('1100')))
+    self.assertEqual(Ledger.objects.get(account=self.equity).currency, '')
+
+  def test_revalues_open_balances(self):
+    """balances are revalued per account and currency at the closing rate"""
+    result = {item.account_id: item for item in revalue(datetime.date(2022, 12, 31))}
+    self.assertEqual(result[self.bank.pk].difference, Decimal('100'))
+    self.assertEqual(result[self.loan.pk].difference, Decimal('40'))
+    self.assertEqual(revalue(datetime.date(2022, 12, 31), accounts=[self.loan])[0].account_id, self.loan.pk)
+
+  def test_revalues_monetary_accounts_by_default(self):
+    """foreign expenses keep their historical rate unless asked for"""
+    travel = Account(name="Travel", account_number="5.1", account_type=Account.AccountTypes.EXPENSE)
+    travel.save()
+    voucher = Voucher(voucher_date=datetime.date(2022, 3, 1), voucher_type=self.vtype, status=Voucher.Status.APPROVED)
+    voucher.save()
+    Ledger(voucher=voucher, account=travel, currency='EUR', currency_amount=Decimal('50')).save()
+    self.assertEqual({item.account_id for item in revalue(datetime.date(2022, 12, 31))}, {self.bank.pk, self.loan.pk})
+    self.assertEqual(revalue(datetime.date(2022, 12, 31), accounts=[travel])[0].difference, Decimal('5'))
+
+  def test_posts_balanced_revaluation_voucher(self):
+    """the revaluation voucher balances against the gain/loss account"""
+    voucher = post_revaluation(datetime.date(2022, 12, 31), self.vtype, self.fx)
+    self.assertEqual(Ledger.objects.get(voucher=voucher, account=self.fx).amount, Decimal('60'))
+    self.assertEqual(voucher.amount, Decimal('100'))
+    self.assertEqual(revalue(datetime.date(2022, 12, 31))[0].difference, 0)
+    ledger_ids = set(Ledger.objects.filter(voucher=voucher).values_list('pk', flat=True))
+    self.assertEqual(set(OutboxEvent.objects.filter(model='accounting.ledger', action='create', object_id__in=ledger_ids).values_list('object_id', flat=True)), ledger_ids)
+    self.assertIsNone(post_revaluation(datetime.date(2022, 12, 31), self.vtype, self.fx))
+
+  def test_posts_one_entity(self):
+    """the voucher type's entity is revalued alone, against a gain/loss account of its own"""
+    branch = Entity.objects.create(code="B", name="Branch")
+    bank = Account(name="Branch Euro Bank", account_number="B1.1", account_type=Account.AccountTypes.ASSET, entity=branch)
+    equity = Account(name="Branch Equity", account_number="B3.1", account_type=Account.AccountTypes.EQUITY, entity=branch)
+    fx = Account(name="Branch Exchange Gain", account_number="B4.1", account_type=Account.AccountTypes.REVENUE, entity=branch)
+    for account in (bank, equity, fx):
+      account.save()
+    vtype = VoucherType(name="Branch Journal", prefix="BJ", entity=branch)
+    vtype.save()
+    voucher = Voucher(voucher_date=datetime.date(2022, 3, 1), voucher_type=vtype, status=Voucher.Status.APPROVED)
+    voucher.save()
+    Ledger(voucher=voucher, account=bank, currency='EUR', currency_amount=Decimal('100')).save()
+    Ledger(voucher=voucher, account=equity, amount=Decimal('110')).save()
+    self.assertRaises(ValidationError, post_revaluation, datetime.date(2022, 12, 31), vtype, self.fx)
+    posted = post_revaluation(datetime.date(2022, 12, 31), self.vtype, self.fx)
+    self.assertFalse(Ledger.objects.filter(voucher=posted, account=bank).exists())
+    posted = post_revaluation(datetime.date(2022, 12, 31), vtype, fx)
+    self.assertEqual(Ledger.objects.get(voucher=posted, account=fx).amount, Decimal('10'))
+    self.assertEqual(set(Ledger.objects.filter(voucher=posted).values_list('entity', flat=True)), {branch.pk})
@@ -0,0 +1,6 @@
+from django.contrib import admin
+
+class EntityAdmin(admin.ModelAdmin):
+  list_display = ('code', 'name')
+  ordering = ('code',)
+  search_fields = ('code', 'name')
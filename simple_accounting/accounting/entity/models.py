@@ -0,0 +1,15 @@
+from django.db import models
+from datetime import datetime
+
+class Entity(models.Model):
+  """A company keeping its books in this ledger; accounts, voucher types, vouchers and ledgers without one belong to the default books"""
+
+  code: str = models.CharField(max_length=16, unique=True)
+  name: str = models.CharField(max_length=256)
+  created_at: datetime = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    verbose_name_plural = 'entities'
+
+  def __str__(self):
+    return f'{self.name} ({self.code})'
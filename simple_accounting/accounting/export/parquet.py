@@ -0,0 +1,244 @@
+import json
+import os
+from datetime import date
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Tuple
+from django.conf import settings
+from django.db import models
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from accounting.fields import AMOUNT_DECIMAL_PLACES
+from accounting.checkpoint.models import Checkpoint
+from accounting.account.models import Account
+from accounting.voucher.models import Voucher, Ledger
+from accounting.archive.models import Archive, ArchivedLedger
+from accounting.outbox import feed
+from accounting.outbox.models import OutboxEvent
+from accounting.routers import reporting_reads
+
+COLUMNS = (
+  ('ledger_id', 'id'),
+  ('voucher_id', 'voucher_id'),
+  ('voucher_number', 'voucher__voucher_number'),
+  ('voucher_date', 'voucher__voucher_date'),
+  ('voucher_type', 'voucher__voucher_type__prefix'),
+  ('status', 'voucher__status'),
+  ('account_id', 'account_id'),
+  ('account_number', 'account__account_number'),
+  ('account_name', 'account__name'),
+  ('account_type', 'account__account_type'),
+  ('amount_minor', 'amount__minor'),
+  ('currency', 'currency'),
+  ('currency_amount_minor', 'currency_amount__minor'),
+  ('updated_at', 'updated_at'),
+  ('voucher_updated_at', 'voucher__updated_at'),
+)
+
+LABELS = {
+  'status': dict(Voucher.Status.choices),
+  'account_type': dict(Account.AccountTypes.choices),
+}
+
+def schema(pa):
+  return pa.schema([
+    ('ledger_id', pa.int64()),
+    ('voucher_id', pa.int64()),
+    ('voucher_number', pa.string()),
+    ('voucher_date', pa.date32()),
+    ('voucher_type', pa.string()),
+    ('status', pa.string()),
+    ('account_id', pa.int64()),
+    ('account_number', pa.string()),
+    ('account_name', pa.string()),
+    ('account_type', pa.string()),
+    ('amount_minor', pa.int64()),
+    ('currency', pa.string()),
+    ('currency_amount_minor', pa.int64()),
+    ('updated_at', pa.timestamp('us', tz='UTC')),
+    ('voucher_updated_at', pa.timestamp('us', tz='UTC')),
+    ('deleted', pa.bool_()),
+  ], metadata={
+    'amount_decimal_places': str(AMOUNT_DECIMAL_PLACES),
+    'base_currency': getattr(settings, 'ACCOUNTING_BASE_CURRENCY', ''),
+  })
+
+def _month_range(first: date) -> Tuple[date, date]:
+  return first, date(first.year + first.month // 12, first.month % 12 + 1, 1)
+
+class ParquetExporter:
+  """
+  Writes ledgers joined with their voucher and account into
+  `year=YYYY/month=MM/part-<run>.parquet` files. One month is exported at a
+  time in record batches of `batch_size` rows read by ledger id, so memory
+  stays bounded whatever the ledger size.
+
+  Incremental runs export every ledger of the vouchers changed (directly or
+  through a ledger) since the previous run into new part files; a re-exported
+  ledger appears again with a later updated_at, readers keep the latest row
+  per ledger_id. Carry-forward vouchers of the archive are left out: a full
+  export reads the archived ledgers they summarize instead, and archived
+  ledgers keep the ids they were exported with before. Ledgers are read from
+  the reporting replica, the checkpoints move on on default.
+
+  Ledgers deleted since the previous run, alone or with their voucher, are
+  taken from the change feed and written as tombstones: a row with deleted
+  set, the ledger and voucher ids, the voucher date and the time of the
+  delete as updated_at.
+  """
+
+  voucher_checkpoint = 'export.parquet.vouchers'
+  ledger_checkpoint = 'export.parquet.ledgers'
+  feed_consumer = 'export.parquet'
+
+  def __init__(self, directory: str, batch_size: int = 50000):
+    # optional dependency, only needed by the export itself
+    import pyarrow
+    import pyarrow.parquet
+    self.pa = pyarrow
+    self.pq = pyarrow.parquet
+    self.schema = schema(pyarrow)
+    self.directory = directory
+    self.batch_size = batch_size
+    self.run = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+    self.rows = 0
+    self.files: List[str] = []
+
+  def reset(self):
+    Checkpoint.load(self.voucher_checkpoint).reset()
+    Checkpoint.load(self.ledger_checkpoint).reset()
+
+  def changed(self) -> Tuple[models.Q, Dict[str, tuple]]:
+    """ledger condition for vouchers changed since the checkpoints, and the positions to advance them to"""
+    sources = (
+      (self.voucher_checkpoint, Voucher, 'voucher__'),
+      (self.ledger_checkpoint, Ledger, ''),
+    )
+    checkpoints = {name: Checkpoint.load(name) for name, _, _ in sources}
+    positions = {
+      name: (
+        model.objects.order_by('-updated_at', '-pk').values_list('updated_at', 'pk').first() or
+        (checkpoints[name].position_at, checkpoints[name].position_id)
+      )
+      for name, model, _ in sources
+    }
+    if any(checkpoint.position_at is None for checkpoint in checkpoints.values()):
+      # never exported, everything is new
+      return models.Q(), positions
+    conditions = []
+    for name, _, prefix in sources:
+      checkpoint = checkpoints[name]
+      after = (
+        models.Q(**{f'{prefix}updated_at__gt': checkpoint.position_at}) |
+        models.Q(**{f'{prefix}updated_at': checkpoint.position_at, f'{prefix}pk__gt': checkpoint.position_id})
+      )
+      if not prefix:
+        # a changed ledger brings in every ledger of its voucher
+        after = models.Q(voucher__in=Ledger.objects.filter(after).values('voucher_id'))
+      conditions.append(after)
+    return conditions[0] | conditions[1], positions
+
+  def tombstones(self) -> Tuple[Dict[date, list], Optional[int]]:
+    """tombstone rows per month of the ledgers deleted since the last run, and the feed offset they reach"""
+    feed.sequence()
+    position = feed.consumer(self.feed_consumer).position_id
+    reached = None
+    deleted: Dict[int, tuple] = {}
+    voucher_dates: Dict[int, date] = {}
+    while True:
+      events = feed.read(position, self.batch_size)
+      if not events:
+        break
+      for event in events:
+        if event.action != OutboxEvent.Actions.DELETE:
+          continue
+        values = json.loads(event.payload)
+        if event.model == Ledger._meta.label_lower:
+          deleted[values['id']] = (values['voucher_id'], event.created_at)
+        elif event.model == Voucher._meta.label_lower:
+          voucher_dates[values['id']] = date.fromisoformat(values['voucher_date'])
+      position = reached = events[-1].offset
+    missing = {voucher_id for voucher_id, _ in deleted.values()} - set(voucher_dates)
+    voucher_dates.update(Voucher.objects.filter(pk__in=missing).values_list('pk', 'voucher_date'))
+    months: Dict[date, list] = {}
+    for ledger_id, (voucher_id, deleted_at) in sorted(deleted.items()):
+      voucher_date = voucher_dates.get(voucher_id)
+      if voucher_date is None:
+        # the voucher's delete was consumed before, so were the ledger's
+        continue
+      row = dict.fromkeys((name for name, _ in COLUMNS))
+      row.update(ledger_id=ledger_id, voucher_id=voucher_id, voucher_date=voucher_date, updated_at=deleted_at)
+      months.setdefault(voucher_date.replace(day=1), []).append(tuple(row.values()))
+    return months, reached
+
+  def export(self, full: bool = False) -> int:
+    if full:
+      self.reset()
+    tombstones, reached = self.tombstones()
+    with reporting_reads():
+      condition, positions = self.changed()
+      sources = [Ledger.objects.filter(condition).exclude(voucher__in=Archive.voucher_ids())]
+      if not condition:
+        sources.append(ArchivedLedger.objects.all())
+      months = set(tombstones)
+      for ledgers in sources:
+        months.update(
+          ledgers
+            .annotate(month=TruncMonth('voucher__voucher_date'))
+            .values_list('month', flat=True)
+            .distinct()
+            .order_by()
+        )
+      for month in sorted(months):
+        start, end = _month_range(month)
+        self.write_month(
+          month, *(ledgers.filter(voucher__voucher_date__gte=start, voucher__voucher_date__lt=end) for ledgers in sources),
+          deleted=tombstones.get(month, ()),
+        )
+    for name, position in positions.items():
+      Checkpoint.load(name).advance(*position)
+    if reached is not None:
+      feed.acknowledge(self.feed_consumer, reached)
+    return self.rows
+
+  def batches(self, ledgers) -> Iterator[list]:
+    fields = [lookup for _, lookup in COLUMNS]
+    last = 0
+    while True:
+      rows = list(ledgers.filter(pk__gt=last).order_by('pk').values_list(*fields)[:self.batch_size])
+      if not rows:
+        return
+      yield rows
+      last = rows[-1][0]
+
+  def record_batch(self, rows: list, deleted: bool = False):
+    arrays = []
+    for i, (name, _) in enumerate(COLUMNS):
+      values = [row[i] for row in rows]
+      if name in LABELS:
+        values = [None if value is None else LABELS[name][value] for value in values]
+      elif name == 'currency':
+        values = [value or None for value in values]
+      arrays.append(self.pa.array(values, type=self.schema.field(name).type))
+    arrays.append(self.pa.array([deleted] * len(rows), type=self.pa.bool_()))
+    return self.pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+  def write_month(self, month: date, *sources, deleted: list = ()) -> Optional[str]:
+    """one part file of the month, from live and archived ledgers and the month's tombstones"""
+    writer, path = None, None
+    batches = ((rows, False) for ledgers in sources for rows in self.batches(ledgers))
+    try:
+      for rows, tombstones in chain(batches, [(list(deleted), True)] if deleted else []):
+        if writer is None:
+          directory = os.path.join(self.directory, f'year={month.year}', f'month={month.month:02d}')
+          os.makedirs(directory, exist_ok=True)
+          path = os.path.join(directory, f'part-{self.run}.parquet')
+          writer = self.pq.ParquetWriter(path, self.schema)
+        writer.write_batch(self.record_batch(rows, tombstones))
+        if not tombstones:
+          self.rows += len(rows)
+    finally:
+      if writer is not None:
+        writer.close()
+    if path:
+      self.files.append(path)
+    return path
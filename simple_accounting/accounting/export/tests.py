@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from io import StringIO
+from django.test import override_settings
+from django.core.management import call_command
+from accounting.archive.archiver import archive_before
+from accounting.testing import LedgerTestCase
+
+try:
+  import pyarrow.parquet as pq
+except ImportError:
+  pq = None
+
+@unittest.skipIf(pq is None, 'pyarrow is not installed')
+class ParquetExportTest(LedgerTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+
+  def export(self, *args):
+    call_command('export_parquet', self.directory.name, '--batch-size', '1', *args, stdout=StringIO())
+    return pq.read_table(self.directory.name).to_pylist()
+
+  def test_partitions_by_year_and_month(self):
+    """ledgers land in year/month partitions with voucher and account columns"""
+    self.post("2022-01-05", (self.cash, "12.5"), (self.sales, "12.5"))
+    self.post("2022-02-01", (self.cash, 7), (self.sales, 7))
+    self.export()
+    self.assertEqual(sorted(os.listdir(os.path.join(self.directory.name, 'year=2022'))), ['month=01', 'month=02'])
+    table = pq.read_table(os.path.join(self.directory.name, 'year=2022', 'month=01'))
+    self.assertEqual(table.num_rows, 2)
+    self.assertEqual(table.schema.metadata[b'amount_decimal_places'], b'6')
+    row = min(table.to_pylist(), key=lambda row: row['ledger_id'])
+    self.assertEqual((row['account_number'], row['account_type'], row['status']), ('1.1', 'Asset', 'Approved'))
+    self.assertEqual(row['amount_minor'], 12500000)
+
+  def test_full_exports_read_the_archive(self):
+    """archived ledgers are exported in place of the carry-forward voucher"""
+    self.post("2021-06-01", (self.cash, 10), (self.sales, 10))
+    self.post("2022-02-01", (self.cash, 7), (self.sales, 7))
+    before = sorted((row['ledger_id'], row['amount_minor']) for row in self.export())
+    archive = archive_before(date(2022, 1, 1), self.vtype)
+    self.assertEqual(len(self.export()), 4)
+    rows = self.export('--full')
+    self.assertEqual(len(rows), 8)
+    self.assertEqual(sorted(set((row['ledger_id'], row['amount_minor']) for row in rows)), before)
+    self.assertNotIn(archive.voucher_id, {row['voucher_id'] for row in rows})
+
+  @override_settings(ACCOUNTING_IMMUTABLE_APPROVED_VOUCHERS=False)
+  def test_incremental_exports_only_changed_vouchers(self):
+    """a later run appends the ledgers of vouchers changed since the previous one"""
+    self.post("2022-01-05", (self.cash, 10), (self.sales, 10))
+    changed = self.post("2022-01-06", (self.cash, 20), (self.sales, 20))
+    self.assertEqual(len(self.export()), 4)
+    ledger = changed.ledgers.get(account=self.cash)
+    ledger.amount = 25
+    ledger.save()
+    rows = self.export()
+    self.assertEqual(len(rows), 6)
+    self.assertEqual(sorted(row['voucher_id'] for row in rows[4:]), [changed.pk, changed.pk])
+    self.assertEqual(len(self.export()), 6)
+
+  @override_settings(ACCOUNTING_IMMUTABLE_APPROVED_VOUCHERS=False)
+  def test_deletes_are_exported_as_tombstones(self):
+    """deleted ledgers and the ledgers of deleted vouchers get a tombstone row"""
+    kept = self.post("2022-01-05", (self.cash, 10), (self.sales, 10))
+    gone = self.post("2022-02-06", (self.cash, 20), (self.sales, 20))
+    self.assertEqual(len(self.export()), 4)
+    ledger = kept.ledgers.get(account=self.cash)
+    deleted = {ledger.pk, *gone.ledgers.values_list('pk', flat=True)}
+    ledger.delete()
+    gone.delete()
+    tombstones = [row for row in self.export() if row['deleted']]
+    self.assertEqual({row['ledger_id'] for row in tombstones}, deleted)
+    tombstone = min(tombstones, key=lambda row: row['ledger_id'])
+    self.assertEqual((tombstone['voucher_id'], tombstone['voucher_date'], tombstone['amount_minor']), (kept.pk, date(2022, 1, 5), None))
+    self.assertEqual(len([row for row in self.export() if row['deleted']]), 3)
@@ -0,0 +1,94 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+from django import forms
+from django.core import validators
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils.functional import cached_property
+
+AMOUNT_DECIMAL_PLACES = 6
+
+def to_minor(value, decimal_places: int = AMOUNT_DECIMAL_PLACES) -> int:
+  """amount as an integer count of 10 ** -decimal_places units"""
+  if isinstance(value, int):
+    return value * 10 ** decimal_places
+  value = value if isinstance(value, Decimal) else Decimal(str(value))
+  return int(value.scaleb(decimal_places).to_integral_value(ROUND_HALF_EVEN))
+
+def from_minor(value: int, decimal_places: int = AMOUNT_DECIMAL_PLACES) -> Decimal:
+  return Decimal(int(value)).scaleb(-decimal_places)
+
+class MinorUnitAmountField(models.BigIntegerField):
+  """
+  Decimal amount stored as a BIGINT of minor units (value * 10 ** decimal_places).
+  Python code sees Decimal, the database adds plain integers. `amount__minor`
+  reads the raw integer without building a Decimal per row.
+  """
+
+  description = 'Decimal amount stored as scaled integer minor units'
+
+  def __init__(self, *args, decimal_places: int = AMOUNT_DECIMAL_PLACES, **kwargs):
+    self.decimal_places = decimal_places
+    super().__init__(*args, **kwargs)
+
+  def deconstruct(self):
+    name, path, args, kwargs = super().deconstruct()
+    kwargs['decimal_places'] = self.decimal_places
+    return name, path, args, kwargs
+
+  @cached_property
+  def max_digits(self) -> int:
+    # whatever fits a signed 64 bit integer
+    return 18
+
+  @cached_property
+  def validators(self):
+    limit = from_minor(2 ** 63 - 1, self.decimal_places)
+    return [
+      *self._validators,
+      validators.DecimalValidator(self.max_digits, self.decimal_places),
+      validators.MinValueValidator(-limit),
+      validators.MaxValueValidator(limit),
+    ]
+
+  def get_internal_type(self):
+    return 'BigIntegerField'
+
+  def to_python(self, value):
+    if value is None or isinstance(value, Decimal):
+      return value
+    try:
+      return Decimal(str(value)) if isinstance(value, float) else Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+      raise ValidationError(
+        self.error_messages['invalid'],
+        code='invalid',
+        params={'value': value},
+      )
+
+  def from_db_value(self, value, expression, connection):
+    if value is None:
+      return value
+    return from_minor(value, self.decimal_places)
+
+  def get_prep_value(self, value):
+    if value is None or hasattr(value, 'resolve_expression'):
+      return value
+    return to_minor(self.to_python(value), self.decimal_places)
+
+  def formfield(self, **kwargs):
+    return super(models.IntegerField, self).formfield(**{
+      'form_class': forms.DecimalField,
+      'max_digits': self.max_digits,
+      'decimal_places': self.decimal_places,
+      **kwargs,
+    })
+
+@MinorUnitAmountField.register_lookup
+class Minor(models.Transform):
+  """the stored integer behind a MinorUnitAmountField"""
+
+  lookup_name = 'minor'
+  output_field = models.BigIntegerField()
+
+  def as_sql(self, compiler, connection):
+    return compiler.compile(self.lhs)
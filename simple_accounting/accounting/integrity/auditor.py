@@ -0,0 +1,121 @@
+import json
+from typing import Iterable, Iterator, List, NamedTuple
+from django.db import models
+from accounting.checkpoint.models import Checkpoint
+from accounting.outbox import feed
+from accounting.voucher.models import Voucher, Ledger, signed_amount
+
+class Finding(NamedTuple):
+  voucher_id: int
+  voucher_number: str
+  balance: object
+  zero_amount_ledgers: int
+  inactive_account_ledgers: int
+
+  @property
+  def problems(self) -> List[str]:
+    problems = []
+    if self.balance:
+      problems.append(f'debit and credit differ by {self.balance}')
+    if self.zero_amount_ledgers:
+      problems.append(f'{self.zero_amount_ledgers} zero amount ledger(s)')
+    if self.inactive_account_ledgers:
+      problems.append(f'{self.inactive_account_ledgers} ledger(s) on inactive accounts')
+    return problems
+
+class IntegrityAuditor:
+  """
+  Checks vouchers with one grouped query per chunk of voucher ids. Vouchers
+  and ledgers are walked in (updated_at, id) order from their checkpoints,
+  so a later run only looks at what changed since the previous one. Deleted
+  ledgers and deactivated accounts leave no row to walk: they are read from
+  the change feed as its `integrity` consumer.
+  """
+
+  voucher_checkpoint = 'integrity.vouchers'
+  ledger_checkpoint = 'integrity.ledgers'
+  consumer = 'integrity'
+
+  def __init__(self, chunk_size: int = 1000):
+    self.chunk_size = chunk_size
+    self.examined = 0
+
+  def reset(self):
+    Checkpoint.load(self.voucher_checkpoint).reset()
+    Checkpoint.load(self.ledger_checkpoint).reset()
+
+  def run(self) -> Iterator[Finding]:
+    covered_after = Checkpoint.load(self.voucher_checkpoint).position_at
+    for rows in self._changed(Voucher, self.voucher_checkpoint, 'id'):
+      yield from self.check(voucher_id for voucher_id, _ in rows)
+    for rows in self._changed(Ledger, self.ledger_checkpoint, 'voucher_id', 'voucher__updated_at'):
+      # vouchers touched after the old voucher mark were just checked above
+      yield from self.check(
+        voucher_id for voucher_id, voucher_updated_at in rows
+        if covered_after is not None and voucher_updated_at <= covered_after
+      )
+    for voucher_ids, account_ids in self._removed():
+      yield from self.check(voucher_ids)
+      for start in range(0, len(account_ids), self.chunk_size):
+        ledgers = Ledger.objects.filter(account_id__in=account_ids[start:start + self.chunk_size])
+        yield from self._check_all(ledgers.values_list('voucher_id', flat=True).distinct().order_by('voucher_id'))
+
+  def _check_all(self, voucher_ids) -> Iterator[Finding]:
+    chunk = []
+    for voucher_id in voucher_ids.iterator(chunk_size=self.chunk_size):
+      chunk.append(voucher_id)
+      if len(chunk) == self.chunk_size:
+        yield from self.check(chunk)
+        chunk = []
+    yield from self.check(chunk)
+
+  def check(self, voucher_ids: Iterable[int]) -> List[Finding]:
+    voucher_ids = set(voucher_ids)
+    if not voucher_ids:
+      return []
+    self.examined += len(voucher_ids)
+    rows = (
+      Ledger.objects
+        .filter(voucher_id__in=voucher_ids)
+        .values('voucher_id', 'voucher__voucher_number')
+        .annotate(
+          balance=models.Sum(signed_amount()),
+          zero=models.Count('id', filter=models.Q(amount=0)),
+          inactive=models.Count('id', filter=models.Q(account__inactive=True)),
+        )
+        .exclude(balance=0, zero=0, inactive=0)
+        .order_by('voucher_id')
+    )
+    return [
+      Finding(row['voucher_id'], row['voucher__voucher_number'], row['balance'], row['zero'], row['inactive'])
+      for row in rows
+    ]
+
+  def _removed(self) -> Iterator[tuple]:
+    """(voucher ids of deleted ledgers, deactivated account ids) per page of the change feed"""
+    feed.sequence()
+    position = feed.consumer(self.consumer).position_id
+    while True:
+      events = feed.read(position, self.chunk_size)
+      if not events:
+        return
+      voucher_ids, account_ids = set(), set()
+      for event in events:
+        if event.model == 'accounting.ledger' and event.action == 'delete':
+          voucher_ids.add(json.loads(event.payload)['voucher_id'])
+        elif event.model == 'accounting.account' and event.action == 'update' and json.loads(event.payload).get('inactive'):
+          account_ids.add(event.object_id)
+      yield voucher_ids, sorted(account_ids)
+      position = feed.acknowledge(self.consumer, events[-1].offset)
+
+  def _changed(self, model, checkpoint_name: str, voucher_field: str, voucher_updated_field: str = 'updated_at') -> Iterator[List[tuple]]:
+    checkpoint = Checkpoint.load(checkpoint_name)
+    while True:
+      chunk = list(
+        checkpoint.pending(model.objects.all())
+          .values_list('updated_at', 'id', voucher_field, voucher_updated_field)[:self.chunk_size]
+      )
+      if not chunk:
+        return
+      yield [(row[2], row[3]) for row in chunk]
+      checkpoint.advance(chunk[-1][0], chunk[-1][1])
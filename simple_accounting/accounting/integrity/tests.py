@@ -0,0 +1,67 @@
+from django.core.management import call_command
+from io import StringIO
+from accounting.models import Account, Voucher
+from accounting.testing import LedgerTestCase
+from .auditor import IntegrityAuditor
+
+class IntegrityAuditorTest(LedgerTestCase):
+
+  def make_voucher(self, *lines):
+    return self.post("2022-01-01", *lines, status=Voucher.Status.PENDING)
+
+  def test_finds_unbalanced_vouchers(self):
+    """unbalanced vouchers are reported"""
+    self.make_voucher((self.cash, 100), (self.sales, 100))
+    bad = self.make_voucher((self.cash, 100), (self.sales, 90))
+    findings = list(IntegrityAuditor().run())
+    self.assertEqual([finding.voucher_id for finding in findings], [bad.pk])
+    self.assertEqual(findings[0].balance, 10)
+
+  def test_finds_zero_amounts_and_inactive_accounts(self):
+    """zero amount ledgers and ledgers on inactive accounts are reported"""
+    zero = self.make_voucher((self.cash, 0), (self.sales, 0))
+    inactive = Account(name="Old Cash", account_number="1.2", account_type=Account.AccountTypes.ASSET, inactive=True)
+    inactive.save()
+    stale = self.make_voucher((inactive, 50), (self.sales, 50))
+    findings = {finding.voucher_id: finding for finding in IntegrityAuditor().run()}
+    self.assertEqual(findings[zero.pk].zero_amount_ledgers, 2)
+    self.assertEqual(findings[stale.pk].inactive_account_ledgers, 1)
+    self.assertFalse(findings[stale.pk].balance)
+
+  def test_later_runs_only_examine_changes(self):
+    """later runs start from the high-water mark"""
+    voucher = self.make_voucher((self.cash, 100), (self.sales, 100))
+    self.make_voucher((self.cash, 100), (self.sales, 100))
+    self.assertEqual(list(IntegrityAuditor(chunk_size=1).run()), [])
+    auditor = IntegrityAuditor()
+    self.assertEqual(list(auditor.run()), [])
+    self.assertEqual(auditor.examined, 0)
+    ledger = voucher.ledgers.get(account=self.cash)
+    ledger.amount = 120
+    ledger.save()
+    auditor = IntegrityAuditor()
+    self.assertEqual([finding.voucher_id for finding in auditor.run()], [voucher.pk])
+    self.assertEqual(auditor.examined, 1)
+
+  def test_later_runs_see_updates_deletes_and_deactivations(self):
+    """queryset updates, deleted ledgers and deactivated accounts are examined too"""
+    first = self.make_voucher((self.cash, 100), (self.sales, 100))
+    second = self.make_voucher((self.cash, 50), (self.sales, 50))
+    self.assertEqual(list(IntegrityAuditor().run()), [])
+    auditor = IntegrityAuditor()
+    Voucher.objects.filter(pk=first.pk).update(description="edited", __v=2)
+    self.assertEqual(list(auditor.run()), [])
+    self.assertEqual(auditor.examined, 1)
+    first.ledgers.get(account=self.sales).delete()
+    self.assertEqual([finding.voucher_id for finding in IntegrityAuditor().run()], [first.pk])
+    self.cash.inactive = True
+    self.cash.save()
+    findings = {finding.voucher_id: finding for finding in IntegrityAuditor().run()}
+    self.assertEqual(findings[second.pk].inactive_account_ledgers, 1)
+
+  def test_command_reports_findings(self):
+    """the command lists problem vouchers"""
+    bad = self.make_voucher((self.cash, 100))
+    out = StringIO()
+    call_command('audit_integrity', '--full', stdout=out)
+    self.assertIn(bad.voucher_number, out.getvalue())
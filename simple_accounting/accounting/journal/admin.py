@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+class JournalEntryAdmin(admin.ModelAdmin):
+  list_display = ('sequence', 'recorded_at', 'action', 'model', 'object_id')
+  list_filter = ('model', 'action')
+  search_fields = ('=object_id',)
+  ordering = ('-sequence',)
+
+  def has_add_permission(self, request):
+    return False
+
+  def has_change_permission(self, request, obj=None):
+    return False
+
+  def has_delete_permission(self, request, obj=None):
+    return False
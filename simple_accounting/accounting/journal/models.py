@@ -0,0 +1,66 @@
+import hashlib
+from django.db import models
+from datetime import datetime
+
+GENESIS_HASH = '0' * 64
+
+class ImmutableJournal(Exception):
+  pass
+
+class JournalEntryQuerySet(models.QuerySet):
+
+  def update(self, **kwargs):
+    raise ImmutableJournal('journal entries cannot be changed')
+
+  def delete(self):
+    raise ImmutableJournal('journal entries cannot be deleted')
+
+class JournalEntry(models.Model):
+  """
+  One change of an audited row. Entries are numbered without gaps and each
+  hash covers the previous one, so editing or removing an entry breaks the
+  chain from there on.
+  """
+
+  objects = JournalEntryQuerySet.as_manager()
+
+  class Actions(models.TextChoices):
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+  sequence: int = models.BigIntegerField(unique=True)
+  model: str = models.CharField(max_length=64)
+  # empty for rows bulk created on backends that do not return primary keys
+  object_id: int = models.BigIntegerField(null=True, blank=True)
+  action: str = models.CharField(max_length=6, choices=Actions.choices)
+  # canonical JSON of the audited fields, exactly as hashed
+  before: str = models.TextField(null=True, blank=True)
+  after: str = models.TextField(null=True, blank=True)
+  recorded_at: datetime = models.DateTimeField()
+  previous_hash: str = models.CharField(max_length=64)
+  hash: str = models.CharField(max_length=64)
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['model', 'object_id']),
+    ]
+
+  @staticmethod
+  def digest(sequence, previous_hash, model, object_id, action, before, after, recorded_at) -> str:
+    parts = (
+      str(sequence), previous_hash, model, '' if object_id is None else str(object_id),
+      action, before or '', after or '', recorded_at.isoformat(),
+    )
+    return hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
+
+  def save(self, **kwargs):
+    if not self._state.adding:
+      raise ImmutableJournal('journal entries cannot be changed')
+    super(JournalEntry, self).save(**kwargs)
+
+  def delete(self, **kwargs):
+    raise ImmutableJournal('journal entries cannot be deleted')
+
+  def __str__(self):
+    return f'#{self.sequence} {self.action} {self.model} {self.object_id}'
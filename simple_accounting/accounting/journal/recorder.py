@@ -0,0 +1,180 @@
+import json
+import threading
+from typing import Dict, Iterable, List, Optional
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+# changes on every save, recording it would only add noise
+IGNORED_FIELDS = ('updated_at',)
+HEAD_CHECKPOINT = 'journal.head'
+
+# sent by record_update with changes=[(pk, before, after)] of the rows a queryset update changed
+rows_updated = Signal()
+
+def canonical(values: Optional[Dict]) -> Optional[str]:
+  if values is None:
+    return None
+  return json.dumps(values, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+
+def snapshot(instance, fields: Iterable[str] = None) -> Dict:
+  names = None if fields is None else set(fields)
+  return {
+    field.attname: field.to_python(field.value_from_object(instance))
+    for field in instance._meta.concrete_fields
+    if field.attname not in IGNORED_FIELDS and (names is None or field.attname in names or field.name in names)
+  }
+
+def snapshots(queryset) -> Iterable[Dict]:
+  """snapshot() of every row, read with values() instead of building instances"""
+  names = [field.attname for field in queryset.model._meta.concrete_fields if field.attname not in IGNORED_FIELDS]
+  return queryset.values(*names)
+
+class Journaled:
+  """
+  Mixin for audited models: remembers the values an instance was loaded with,
+  the before side of its next journal entry.
+  """
+
+  @classmethod
+  def from_db(cls, db, field_names, values):
+    instance = super().from_db(db, field_names, values)
+    instance._journal_before = None if instance.get_deferred_fields() else snapshot(instance)
+    return instance
+
+class _Buffer(threading.local):
+
+  def __init__(self):
+    self.committed: List[dict] = []
+    # the flush hook registered last, the one that writes at commit
+    self.last_flush = None
+
+_buffer = _Buffer()
+
+def entry(model, object_id, action: str, before: Optional[Dict], after: Optional[Dict]) -> dict:
+  return {
+    'model': model._meta.label_lower,
+    'object_id': object_id,
+    'action': action,
+    'before': canonical(before),
+    'after': canonical(after),
+    'recorded_at': timezone.now(),
+  }
+
+def record(model, object_id, action: str, before: Optional[Dict], after: Optional[Dict]):
+  queue([entry(model, object_id, action, before, after)])
+
+def queue(entries: List[dict]):
+  """
+  Queues journal entries. Inside a transaction they are kept only if the
+  transaction (and every savepoint they were queued in) commits; everything
+  the transaction kept is then written with one bulk insert.
+  """
+  if not entries:
+    return
+  connection = transaction.get_connection()
+  if not connection.in_atomic_block:
+    write(entries)
+    return
+  # dropped with the savepoint it was queued in
+  connection.on_commit(lambda: _buffer.committed.extend(entries))
+
+  def _flush():
+    if _buffer.last_flush is _flush:
+      flush()
+
+  # registered outside every savepoint, so no rollback drops it, and after
+  # every batch kept so far: the last one writes all of them at once. The
+  # public on_commit() ties hooks to the open savepoints, so this appends in
+  # Django 3.2's (savepoint ids, func) format; the Pipfile pins Django to it.
+  _buffer.last_flush = _flush
+  connection.run_on_commit.append((set(), _flush))
+
+def flush():
+  entries, _buffer.committed = _buffer.committed, []
+  if entries:
+    write(entries)
+
+def write(entries: List[dict]):
+  """appends entries to the chain, holding the head checkpoint row lock"""
+  from accounting.checkpoint.models import Checkpoint
+  from .models import JournalEntry, GENESIS_HASH
+  with transaction.atomic():
+    Checkpoint.load(HEAD_CHECKPOINT)
+    head = Checkpoint.objects.select_for_update().get(name=HEAD_CHECKPOINT)
+    previous = JournalEntry.objects.filter(sequence=head.position_id).values_list('hash', flat=True).first() or GENESIS_HASH
+    rows = []
+    for sequence, entry in enumerate(entries, head.position_id + 1):
+      digest = JournalEntry.digest(sequence, previous, **entry)
+      rows.append(JournalEntry(sequence=sequence, previous_hash=previous, hash=digest, **entry))
+      previous = digest
+    JournalEntry.objects.bulk_create(rows)
+    head.advance(rows[-1].recorded_at, rows[-1].sequence)
+
+def record_update(queryset, kwargs: Dict, update) -> int:
+  """runs update() on queryset, journaling the changed fields of every row it touches"""
+  model = queryset.model
+  fields = [model._meta.get_field(name).attname for name in kwargs if name not in IGNORED_FIELDS]
+  before = {row['pk']: row for row in queryset.values('pk', *fields)} if fields else {}
+  updated = update(**kwargs)
+  if before:
+    changes = []
+    for row in model._default_manager.filter(pk__in=list(before)).values('pk', *fields):
+      old = before[row.pop('pk')]
+      pk = old.pop('pk')
+      if old != row:
+        record(model, pk, 'update', old, row)
+        changes.append((pk, old, row))
+    if changes:
+      rows_updated.send(sender=model, changes=changes)
+  return updated
+
+def record_saved(instances: Iterable[models.Model]):
+  """journals instances written with bulk_update against the values they were loaded with"""
+  instances = list(instances)
+  if not instances:
+    return
+  model = type(instances[0])
+  changes = []
+  for instance in instances:
+    before, after = getattr(instance, '_journal_before', None) or {}, snapshot(instance)
+    old = {name: value for name, value in before.items() if after.get(name) != value}
+    row = {name: value for name, value in after.items() if before.get(name) != value}
+    if row:
+      changes.append((instance.pk, old, row))
+      queue([entry(model, instance.pk, 'update', before or None, after)])
+    instance._journal_before = after
+  if changes:
+    rows_updated.send(sender=model, changes=changes)
+
+def record_created(instances: Iterable[models.Model]):
+  queue([entry(type(instance), instance.pk, 'create', None, snapshot(instance)) for instance in instances])
+
+def record_posted(vouchers: Iterable[models.Model], ledgers: Dict[int, List[models.Model]]):
+  """one entry per bulk posted voucher, its ledgers nested in the after values"""
+  queue([
+    entry(type(voucher), voucher.pk, 'create', None, {
+      **snapshot(voucher),
+      'ledgers': [snapshot(ledger) for ledger in ledgers.get(voucher.pk, ())],
+    })
+    for voucher in vouchers
+  ])
+
+def saved(sender, instance, created, raw=False, **kwargs):
+  if raw:
+    return
+  after = snapshot(instance)
+  record(sender, instance.pk, 'create' if created else 'update', None if created else getattr(instance, '_journal_before', None), after)
+  instance._journal_before = after
+
+def deleted(sender, instance, **kwargs):
+  record(sender, instance.pk, 'delete', snapshot(instance), None)
+
+def connect():
+  from django.db.models.signals import post_save, post_delete
+  from accounting.account.models import Account
+  from accounting.voucher.models import Voucher, Ledger
+  for model in (Account, Voucher, Ledger):
+    post_save.connect(saved, sender=model, dispatch_uid=f'journal-save-{model._meta.label_lower}')
+    post_delete.connect(deleted, sender=model, dispatch_uid=f'journal-delete-{model._meta.label_lower}')
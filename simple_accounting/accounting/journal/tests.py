@@ -0,0 +1,89 @@
+import json
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import TestCase
+from accounting.models import Account, VoucherType, Voucher, Ledger, JournalEntry
+from .models import ImmutableJournal
+from .recorder import flush
+
+class AuditJournalTest(TestCase):
+
+  def setUp(self):
+    flush()
+    self.vtype = VoucherType(name="Journal", prefix="JV")
+    self.vtype.save()
+
+  def entries(self, model):
+    return list(JournalEntry.objects.filter(model=model).order_by('sequence'))
+
+  def test_records_changes_on_commit(self):
+    """saves and deletes are journaled with before and after values once the transaction commits"""
+    with self.captureOnCommitCallbacks(execute=True):
+      with transaction.atomic():
+        cash = Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET)
+        cash.save()
+        voucher = Voucher(voucher_date="2022-01-01", voucher_type=self.vtype)
+        voucher.save()
+        Ledger(voucher=voucher, account=cash, amount="12.50").save()
+      self.assertFalse(JournalEntry.objects.exists())
+    self.assertEqual([entry.sequence for entry in JournalEntry.objects.order_by('sequence')], [1, 2, 3, 4])
+    ledger = Ledger.objects.get()
+    with self.captureOnCommitCallbacks(execute=True):
+      ledger.amount = 20
+      ledger.save()
+      voucher.delete()
+    update, delete = self.entries('accounting.ledger')[1:]
+    self.assertEqual((json.loads(update.before)['amount'], json.loads(update.after)['amount']), ('12.500000', '20'))
+    self.assertEqual((delete.action, delete.after), ('delete', None))
+    self.assertEqual(self.entries('accounting.voucher')[-1].action, 'delete')
+    call_command('verify_journal', stdout=StringIO())
+
+  def test_records_queryset_updates(self):
+    """inactive cascades through AccountQuerySet.update are journaled per account"""
+    parent = Account(name="Assets", account_number="1", account_type=Account.AccountTypes.ASSET)
+    parent.save()
+    child = Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET, parent=parent)
+    child.save()
+    parent = Account.objects.get(pk=parent.pk)
+    with self.captureOnCommitCallbacks(execute=True):
+      parent.inactive = True
+      parent.save()
+    updates = [entry for entry in self.entries('accounting.account') if entry.object_id == child.pk]
+    self.assertEqual(len(updates), 1)
+    self.assertEqual((json.loads(updates[0].before), json.loads(updates[0].after)), ({'inactive': False}, {'inactive': True}))
+
+  def test_rolled_back_changes_are_dropped(self):
+    """entries of a rolled back savepoint never reach the journal"""
+    with self.captureOnCommitCallbacks(execute=True):
+      Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET).save()
+      try:
+        with transaction.atomic():
+          Account(name="Bank", account_number="1.2", account_type=Account.AccountTypes.ASSET).save()
+          raise ValueError
+      except ValueError:
+        pass
+    self.assertEqual([json.loads(entry.after)['name'] for entry in self.entries('accounting.account')], ['Cash'])
+    with self.captureOnCommitCallbacks(execute=True):
+      with transaction.atomic():
+        Account(name="Bank", account_number="1.2", account_type=Account.AccountTypes.ASSET).save()
+      try:
+        with transaction.atomic():
+          Account(name="Till", account_number="1.3", account_type=Account.AccountTypes.ASSET).save()
+          raise ValueError
+      except ValueError:
+        pass
+    self.assertEqual([json.loads(entry.after)['name'] for entry in self.entries('accounting.account')], ['Cash', 'Bank'])
+
+  def test_detects_tampering(self):
+    """entries cannot be changed through the ORM and edits behind its back break the chain"""
+    with self.captureOnCommitCallbacks(execute=True):
+      Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET).save()
+      Account(name="Bank", account_number="1.2", account_type=Account.AccountTypes.ASSET).save()
+    with self.assertRaises(ImmutableJournal):
+      JournalEntry.objects.update(after='{}')
+    with connection.cursor() as cursor:
+      cursor.execute(f"UPDATE {JournalEntry._meta.db_table} SET after = '{{}}' WHERE sequence = 1")
+    with self.assertRaises(CommandError):
+      call_command('verify_journal', stdout=StringIO())
@@ -0,0 +1,21 @@
+from typing import Iterator, NamedTuple
+from .models import JournalEntry, GENESIS_HASH
+
+class Break(NamedTuple):
+  sequence: int
+  problem: str
+
+FIELDS = ('sequence', 'previous_hash', 'hash', 'model', 'object_id', 'action', 'before', 'after', 'recorded_at')
+
+def verify(chunk_size: int = 5000) -> Iterator[Break]:
+  """streams the journal in sequence order and yields every place the chain does not hold"""
+  expected_sequence, expected_previous = 1, GENESIS_HASH
+  rows = JournalEntry.objects.order_by('sequence').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+  for sequence, previous_hash, stored_hash, model, object_id, action, before, after, recorded_at in rows:
+    if sequence != expected_sequence:
+      yield Break(sequence, f'expected entry {expected_sequence}')
+    if previous_hash != expected_previous:
+      yield Break(sequence, 'previous hash does not match the preceding entry')
+    if JournalEntry.digest(sequence, previous_hash, model, object_id, action, before, after, recorded_at) != stored_hash:
+      yield Break(sequence, 'contents do not match the hash')
+    expected_sequence, expected_previous = sequence + 1, stored_hash
@@ -0,0 +1,24 @@
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from accounting.voucher.models import VoucherType
+from accounting.archive.archiver import archive_before
+
+class Command(BaseCommand):
+  help = 'Moves vouchers and ledgers dated before a cutoff into the archive tables, carrying their balances forward'
+
+  def add_arguments(self, parser):
+    parser.add_argument('cutoff', type=date.fromisoformat, help='first day kept live, YYYY-MM-DD')
+    parser.add_argument('--voucher-type', required=True, help='prefix of the voucher type of the carry-forward voucher')
+    parser.add_argument('--batch-size', type=int, default=500)
+
+  def handle(self, *args, cutoff, voucher_type, batch_size=500, **options):
+    try:
+      archive = archive_before(cutoff, VoucherType.objects.get(prefix=voucher_type), batch_size)
+    except VoucherType.DoesNotExist as error:
+      raise CommandError(str(error))
+    except ValidationError as error:
+      raise CommandError('; '.join(error.messages))
+    self.stdout.write(self.style.SUCCESS(
+      f'archived {archive.vouchers} vouchers and {archive.ledgers} ledgers, carried forward by {archive.voucher}'
+    ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from accounting.integrity.auditor import IntegrityAuditor
+
+class Command(BaseCommand):
+  help = 'Reports unbalanced vouchers, zero amount ledgers and ledgers on inactive accounts changed since the last run'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--full', action='store_true', help='forget the checkpoints and audit every voucher')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+
+  def handle(self, *args, full=False, chunk_size=1000, **options):
+    auditor = IntegrityAuditor(chunk_size=chunk_size)
+    if full:
+      auditor.reset()
+    failed = 0
+    for finding in auditor.run():
+      failed += 1
+      self.stdout.write(self.style.ERROR(f'{finding.voucher_number}: {"; ".join(finding.problems)}'))
+    summary = f'examined {auditor.examined} vouchers, {failed} with problems'
+    self.stdout.write(self.style.ERROR(summary) if failed else self.style.SUCCESS(summary))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounting.benchmarks import BENCHMARKS
+
+class Command(BaseCommand):
+  help = 'Runs storage and throughput benchmarks against the configured database'
+
+  def add_arguments(self, parser):
+    parser.add_argument('names', nargs='*', help=f'benchmarks to run: {", ".join(BENCHMARKS)} (default all)')
+    parser.add_argument('--rows', type=int, default=100000)
+
+  def handle(self, *args, names=(), rows=100000, **options):
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+      raise CommandError(f'unknown benchmarks: {", ".join(unknown)}')
+    for name in names or BENCHMARKS:
+      self.stdout.write(self.style.MIGRATE_HEADING(name))
+      for key, value in BENCHMARKS[name](rows=rows).items():
+        if isinstance(value, float):
+          value = f'{value * 1000:.2f} ms'
+        self.stdout.write(f'  {key}: {value}')
@@ -0,0 +1,37 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from accounting.api.views import event_data
+from accounting.outbox import feed
+
+class Command(BaseCommand):
+  help = 'Gives committed events their offsets, reads the change feed as JSON lines, acknowledges consumer offsets and prunes consumed events'
+
+  def add_arguments(self, parser):
+    parser.add_argument('action', choices=['sequence', 'read', 'ack', 'prune'])
+    parser.add_argument('--consumer', help='consumer name; read starts after its acknowledged offset')
+    parser.add_argument('--after', type=int, help='read after this offset instead')
+    parser.add_argument('--limit', type=int, default=10000)
+    parser.add_argument('--position', type=int, help='offset to acknowledge')
+    parser.add_argument('--ack', action='store_true', help='acknowledge what was read')
+    parser.add_argument('--batch-size', type=int, default=10000)
+
+  def handle(self, *args, action, consumer=None, after=None, limit=10000, position=None, ack=False, batch_size=10000, **options):
+    if action == 'sequence':
+      self.stderr.write(f'sequenced {feed.sequence(batch_size)} events')
+      return
+    if action == 'prune':
+      self.stderr.write(f'pruned {feed.prune(batch_size)} events')
+      return
+    if not consumer and (action == 'ack' or ack or after is None):
+      raise CommandError('--consumer is required')
+    if action == 'ack':
+      if position is None:
+        raise CommandError('--position is required')
+      self.stderr.write(f'{consumer} at {feed.acknowledge(consumer, position)}')
+      return
+    feed.sequence(batch_size)
+    events = feed.read(after, limit) if after is not None else feed.pending(consumer, limit)
+    for event in events:
+      self.stdout.write(json.dumps(event_data(event), default=str, separators=(',', ':')))
+    if ack and events:
+      feed.acknowledge(consumer, events[-1].offset)
@@ -0,0 +1,34 @@
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from accounting.account.models import Account
+from accounting.voucher.models import VoucherType
+from accounting.closing.models import YearClosing
+from accounting.closing.closer import close_year, reopen_year
+
+class Command(BaseCommand):
+  help = 'Closes revenue and expense accounts of a year into retained earnings, or reopens a closed year'
+
+  def add_arguments(self, parser):
+    parser.add_argument('start', type=date.fromisoformat, help='first day of the year, YYYY-MM-DD')
+    parser.add_argument('end', type=date.fromisoformat, help='last day of the year, YYYY-MM-DD')
+    parser.add_argument('--voucher-type', required=True, help='prefix of the voucher type to post with')
+    parser.add_argument('--retained-earnings', help='equity account number (default ACCOUNTING_RETAINED_EARNINGS_ACCOUNT)')
+    parser.add_argument('--reopen', action='store_true', help='reverse the closing of the year instead')
+
+  def handle(self, *args, start, end, voucher_type, retained_earnings=None, reopen=False, **options):
+    try:
+      voucher_type = VoucherType.objects.get(prefix=voucher_type)
+      if reopen:
+        closing = YearClosing.objects.get(start_date=start, end_date=end, entity_id=voucher_type.entity_id, reopened_at__isnull=True)
+        closing = reopen_year(closing, voucher_type)
+        self.stdout.write(self.style.SUCCESS(f'reopened {closing} with {closing.reversal}'))
+        return
+      if retained_earnings:
+        retained_earnings = Account.objects.get(account_number=retained_earnings)
+      closing = close_year(start, end, voucher_type, retained_earnings)
+    except (VoucherType.DoesNotExist, Account.DoesNotExist, YearClosing.DoesNotExist) as error:
+      raise CommandError(str(error))
+    except ValidationError as error:
+      raise CommandError('; '.join(error.messages))
+    self.stdout.write(self.style.SUCCESS(f'closed {closing} with {closing.voucher}'))
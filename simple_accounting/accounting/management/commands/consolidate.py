@@ -0,0 +1,36 @@
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from accounting.account.models import Account
+from accounting.entity.models import Entity
+from accounting.consolidation.consolidator import consolidate
+
+class Command(BaseCommand):
+  help = 'Prints the group trial balance of entities, intercompany balances eliminated'
+
+  def add_arguments(self, parser):
+    parser.add_argument('entities', nargs='*', help='entity codes, all entities by default')
+    parser.add_argument('--as-of', type=date.fromisoformat, default=date.today(), help='last day included, YYYY-MM-DD')
+    parser.add_argument('--start', type=date.fromisoformat, help='first day included, YYYY-MM-DD, everything before as-of by default')
+    parser.add_argument('--workers', type=int, help='threads computing entity trial balances, ACCOUNTING_CONSOLIDATION_WORKERS by default')
+
+  def handle(self, *args, entities, as_of, start=None, workers=None, **options):
+    selected = Entity.objects.order_by('code')
+    if entities:
+      selected = selected.filter(code__in=entities)
+      missing = set(entities) - {entity.code for entity in selected}
+      if missing:
+        raise CommandError(f'unknown entities: {", ".join(sorted(missing))}')
+    selected = list(selected)
+    try:
+      result = consolidate(selected, as_of, start, workers)
+    except ValidationError as error:
+      raise CommandError('; '.join(error.messages))
+    accounts = Account.objects.in_bulk(result.balances)
+    for account_id, amount in sorted(result.balances.items(), key=lambda item: accounts[item[0]].account_number):
+      if amount:
+        self.stdout.write(f'{accounts[account_id]}\t{amount:.2f}')
+    codes = {entity.pk: entity.code for entity in selected}
+    for (first, second, income), amount in sorted(result.differences().items()):
+      statement = 'income statement' if income else 'balance sheet'
+      self.stdout.write(self.style.WARNING(f'intercompany {statement} difference between {codes[first]} and {codes[second]}: {amount:.2f}'))
@@ -0,0 +1,8 @@
+from django.core.management.base import BaseCommand
+from accounting.metrics.registry import render
+
+class Command(BaseCommand):
+  help = 'Prints the hot path metrics of all workers in Prometheus text format'
+
+  def handle(self, *args, **options):
+    self.stdout.write(render(), ending='')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+  help = 'Exports ledgers changed since the last export to Parquet files partitioned by year and month'
+
+  def add_arguments(self, parser):
+    parser.add_argument('directory')
+    parser.add_argument('--full', action='store_true', help='forget the checkpoints and export every ledger')
+    parser.add_argument('--batch-size', type=int, default=50000)
+
+  def handle(self, *args, directory, full=False, batch_size=50000, **options):
+    try:
+      from accounting.export.parquet import ParquetExporter
+      exporter = ParquetExporter(directory, batch_size=batch_size)
+    except ImportError:
+      raise CommandError('the Parquet export needs pyarrow, install it with `pip install pyarrow`')
+    rows = exporter.export(full=full)
+    self.stdout.write(self.style.SUCCESS(f'exported {rows} ledgers into {len(exporter.files)} files'))
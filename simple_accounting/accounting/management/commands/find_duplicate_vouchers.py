@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from accounting.voucher.models import Voucher
+from accounting.voucher.duplicates import duplicate_groups, live
+
+class Command(BaseCommand):
+  help = 'Lists groups of live vouchers sharing a content fingerprint'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--refresh', action='store_true', help='recompute every fingerprint from the ledgers first')
+    parser.add_argument('--batch-size', type=int, default=1000)
+
+  def handle(self, *args, refresh=False, batch_size=1000, **options):
+    if refresh:
+      refreshed = Voucher.objects.all().refresh_fingerprints(batch_size)
+      self.stdout.write(f'refreshed {refreshed} fingerprints')
+    groups = duplicate_groups()
+    numbers = {}
+    for start in range(0, len(groups), batch_size):
+      chunk = [value for value, _ in groups[start:start + batch_size]]
+      for value, number in live().filter(fingerprint__in=chunk).order_by('pk').values_list('fingerprint', 'voucher_number'):
+        numbers.setdefault(value, []).append(number)
+    for value, count in groups:
+      self.stdout.write(f'{count} vouchers {value[:12]}: {", ".join(numbers.get(value, ()))}')
+    self.stdout.write(self.style.SUCCESS(f'{len(groups)} duplicate groups'))
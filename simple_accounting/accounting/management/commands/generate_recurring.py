@@ -0,0 +1,14 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from accounting.recurring.scheduler import generate
+
+class Command(BaseCommand):
+  help = 'Posts the vouchers of recurring templates due up to a date (today by default)'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--up-to', type=date.fromisoformat, help='last due date to post, YYYY-MM-DD')
+    parser.add_argument('--batch-size', type=int, default=1000)
+
+  def handle(self, *args, up_to=None, batch_size=1000, **options):
+    posted = generate(up_to or date.today(), batch_size=batch_size)
+    self.stdout.write(self.style.SUCCESS(f'posted {sum(posted.values())} vouchers from {len(posted)} templates'))
@@ -0,0 +1,37 @@
+import csv
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from accounting.voucher.models import Voucher
+from accounting.voucher.loader import LedgerRow, load_vouchers
+
+def _rows(file):
+  for row in csv.DictReader(file):
+    yield LedgerRow(
+      reference=row['reference'],
+      voucher_date=row['voucher_date'],
+      voucher_type=row['voucher_type'],
+      account=row['account'],
+      amount=row.get('amount') or None,
+      currency=row.get('currency') or '',
+      currency_amount=row.get('currency_amount') or None,
+      description=row.get('description') or '',
+    )
+
+class Command(BaseCommand):
+  help = 'Loads historical vouchers from a CSV of ledgers through the native bulk path of the database'
+
+  def add_arguments(self, parser):
+    parser.add_argument('path', help='CSV with reference, voucher_date, voucher_type (prefix), account (number), amount and optionally currency, currency_amount and description')
+    parser.add_argument('--pending', action='store_true', help='load the vouchers as pending instead of approved')
+    parser.add_argument('--batch-size', type=int, default=1000)
+
+  def handle(self, *args, path, pending=False, batch_size=1000, **options):
+    status = Voucher.Status.PENDING if pending else Voucher.Status.APPROVED
+    try:
+      with open(path, newline='', encoding='utf-8') as file:
+        load = load_vouchers(_rows(file), status, batch_size)
+    except (OSError, KeyError) as error:
+      raise CommandError(f'{path}: {error}')
+    except ValidationError as error:
+      raise CommandError('; '.join(error.messages))
+    self.stdout.write(self.style.SUCCESS(f'loaded {load.vouchers} vouchers and {load.ledgers} ledgers'))
@@ -0,0 +1,23 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from accounting.account.models import Account
+from accounting.account.restructure import move_subtree
+
+class Command(BaseCommand):
+  help = 'Moves an account and its sub accounts under another parent and renumbers them'
+
+  def add_arguments(self, parser):
+    parser.add_argument('account_number')
+    parser.add_argument('--parent', help='new parent account number; leave out to make it a root account')
+    parser.add_argument('--number', help='new account number (default parent number plus the last segment)')
+
+  def handle(self, *args, account_number, parent=None, number=None, **options):
+    try:
+      account = Account.objects.get(account_number=account_number)
+      parent = Account.objects.get(account_number=parent) if parent else None
+      renumbered = move_subtree(account, parent, number)
+    except Account.DoesNotExist as error:
+      raise CommandError(str(error))
+    except ValidationError as error:
+      raise CommandError('; '.join(error.messages))
+    self.stdout.write(self.style.SUCCESS(f'renumbered {renumbered} accounts'))
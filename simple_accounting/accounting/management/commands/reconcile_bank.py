@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounting.account.models import Account
+from accounting.reconciliation.matcher import import_statement, reconcile
+
+class Command(BaseCommand):
+  help = 'Imports a bank statement CSV and matches unreconciled statement lines against ledgers of the bank account'
+
+  def add_arguments(self, parser):
+    parser.add_argument('account_number')
+    parser.add_argument('--import', dest='statement', help='CSV file with date, amount, description, reference columns')
+    parser.add_argument('--tolerance-days', type=int, default=3)
+    parser.add_argument('--dry-run', action='store_true')
+
+  def handle(self, *args, account_number, statement=None, tolerance_days=3, dry_run=False, **options):
+    try:
+      account = Account.objects.get(account_number=account_number)
+    except Account.DoesNotExist:
+      raise CommandError(f'no account {account_number}')
+    if statement:
+      with open(statement, newline='') as file:
+        imported = import_statement(account, file, statement)
+      self.stdout.write(f'imported {imported.lines.count()} lines')
+    matches = reconcile(account, tolerance_days, commit=not dry_run)
+    exact = sum(1 for match in matches if match.exact)
+    self.stdout.write(self.style.SUCCESS(f'matched {len(matches)} lines ({exact} exact, {len(matches) - exact} within {tolerance_days} days)'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from accounting.analytics.cube import refresh
+
+class Command(BaseCommand):
+  help = 'Rebuilds the analytic cube for the months changed since the last run'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--full', action='store_true', help='rebuild every month')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+
+  def handle(self, *args, full=False, chunk_size=1000, **options):
+    created = refresh(full=full, chunk_size=chunk_size)
+    self.stdout.write(self.style.SUCCESS(f'wrote {created} cube cells'))
@@ -0,0 +1,33 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from accounting.account.models import Account
+from accounting.voucher.models import VoucherType
+from accounting.currency.rates import MissingRate
+from accounting.currency.revaluation import revalue, post_revaluation
+
+class Command(BaseCommand):
+  help = 'Revalues open foreign currency balances at the exchange rates of a date'
+
+  def add_arguments(self, parser):
+    parser.add_argument('as_of', type=date.fromisoformat, help='revaluation date, YYYY-MM-DD')
+    parser.add_argument('--post', action='store_true', help='book the differences as a voucher')
+    parser.add_argument('--voucher-type', help='prefix of the voucher type to post with')
+    parser.add_argument('--gain-loss-account', help='account number receiving the exchange differences')
+
+  def handle(self, *args, as_of, post=False, voucher_type=None, gain_loss_account=None, **options):
+    try:
+      if not post:
+        for item in revalue(as_of):
+          self.stdout.write(f'{item.account_id} {item.currency} {item.foreign_balance}: {item.booked} -> {item.revalued} ({item.difference:+})')
+        return
+      if not voucher_type or not gain_loss_account:
+        raise CommandError('--post needs --voucher-type and --gain-loss-account')
+      try:
+        voucher_type = VoucherType.objects.get(prefix=voucher_type)
+        gain_loss_account = Account.objects.get(account_number=gain_loss_account)
+      except (VoucherType.DoesNotExist, Account.DoesNotExist) as error:
+        raise CommandError(str(error))
+      voucher = post_revaluation(as_of, voucher_type, gain_loss_account)
+    except MissingRate as error:
+      raise CommandError(str(error))
+    self.stdout.write(self.style.SUCCESS(f'posted {voucher}' if voucher else 'nothing to revalue'))
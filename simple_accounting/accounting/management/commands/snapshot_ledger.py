@@ -0,0 +1,19 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from accounting.voucher.models import Voucher
+from accounting.snapshot.ledger import write_snapshot
+
+class Command(BaseCommand):
+  help = 'Writes approved ledgers to a memory mappable binary snapshot for offline analysis'
+
+  def add_arguments(self, parser):
+    parser.add_argument('path')
+    parser.add_argument('--as-of', type=date.fromisoformat, help='last voucher date to include, YYYY-MM-DD')
+    parser.add_argument('--include-pending', action='store_true')
+
+  def handle(self, *args, path, as_of=None, include_pending=False, **options):
+    statuses = [Voucher.Status.APPROVED]
+    if include_pending:
+      statuses.append(Voucher.Status.PENDING)
+    count = write_snapshot(path, as_of=as_of, statuses=statuses)
+    self.stdout.write(self.style.SUCCESS(f'wrote {count} ledgers to {path}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounting.journal.verify import verify
+
+class Command(BaseCommand):
+  help = 'Streams the audit journal and checks its hash chain'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--chunk-size', type=int, default=5000)
+
+  def handle(self, *args, chunk_size=5000, **options):
+    breaks = 0
+    for item in verify(chunk_size=chunk_size):
+      breaks += 1
+      self.stdout.write(self.style.ERROR(f'#{item.sequence}: {item.problem}'))
+    if breaks:
+      raise CommandError(f'journal chain broken in {breaks} place(s)')
+    self.stdout.write(self.style.SUCCESS('journal chain intact'))
@@ -0,0 +1,142 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Dict, Optional
+from django.conf import settings
+
+# upper bounds in seconds, the last bucket is +Inf
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def metrics_dir() -> Optional[str]:
+  return getattr(settings, 'ACCOUNTING_METRICS_DIR', None)
+
+class Registry:
+  """
+  Latency histograms and error counts per operation of this process. With
+  ACCOUNTING_METRICS_DIR set, every worker process writes its totals to
+  <dir>/<pid>.json at most every ACCOUNTING_METRICS_FLUSH_SECONDS, and
+  `collect()` sums the files of all workers.
+  """
+
+  def __init__(self):
+    self.reset()
+
+  def reset(self):
+    self.lock = threading.Lock()
+    self.operations: Dict[str, list] = {}
+    self.flushed_at = time.monotonic()
+
+  def observe(self, operation: str, seconds: float, failed: bool = False):
+    with self.lock:
+      # bucket counts, then sum, count and errors
+      values = self.operations.get(operation)
+      if values is None:
+        values = self.operations[operation] = [0] * (len(BUCKETS) + 1) + [0.0, 0, 0]
+      values[bisect_left(BUCKETS, seconds)] += 1
+      values[-3] += seconds
+      values[-2] += 1
+      values[-1] += failed
+    if time.monotonic() - self.flushed_at > getattr(settings, 'ACCOUNTING_METRICS_FLUSH_SECONDS', 5):
+      self.flush()
+
+  def snapshot(self) -> Dict[str, list]:
+    with self.lock:
+      return {operation: list(values) for operation, values in self.operations.items()}
+
+  def flush(self):
+    self.flushed_at = time.monotonic()
+    directory = metrics_dir()
+    if not directory:
+      return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    temporary = f'{path}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as file:
+      json.dump(self.snapshot(), file)
+    os.replace(temporary, path)
+
+  def collect(self) -> Dict[str, list]:
+    """totals of every worker, or of this process without a metrics directory"""
+    directory = metrics_dir()
+    if not directory:
+      return self.snapshot()
+    self.flush()
+    totals: Dict[str, list] = {}
+    for name in os.listdir(directory):
+      if not name.endswith('.json'):
+        continue
+      try:
+        with open(os.path.join(directory, name)) as file:
+          snapshot = json.load(file)
+      except (OSError, ValueError):
+        continue
+      for operation, values in snapshot.items():
+        if len(values) != len(BUCKETS) + 4:
+          continue
+        current = totals.setdefault(operation, [0] * len(values))
+        totals[operation] = [a + b for a, b in zip(current, values)]
+    return totals
+
+registry = Registry()
+atexit.register(registry.flush)
+if hasattr(os, 'register_at_fork'):
+  # forked workers start from zero instead of counting the parent's totals again
+  os.register_at_fork(after_in_child=registry.reset)
+
+class timed:
+  """records the latency of a block or function under an operation name"""
+
+  def __init__(self, operation: str):
+    self.operation = operation
+
+  def __enter__(self):
+    self.started = time.perf_counter()
+    return self
+
+  def __exit__(self, exc_type, exc, traceback):
+    registry.observe(self.operation, time.perf_counter() - self.started, exc_type is not None)
+
+  def __call__(self, func):
+    operation = self.operation
+
+    @wraps(func)
+    def _func(*args, **kwargs):
+      started = time.perf_counter()
+      failed = True
+      try:
+        result = func(*args, **kwargs)
+        failed = False
+        return result
+      finally:
+        registry.observe(operation, time.perf_counter() - started, failed)
+    return _func
+
+def _label(value: str) -> str:
+  return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render(totals: Dict[str, list] = None) -> str:
+  """Prometheus text exposition format"""
+  totals = registry.collect() if totals is None else totals
+  lines = [
+    '# HELP accounting_operation_seconds Latency of accounting hot paths.',
+    '# TYPE accounting_operation_seconds histogram',
+  ]
+  for operation, values in sorted(totals.items()):
+    label = f'operation="{_label(operation)}"'
+    cumulative = 0
+    for bound, count in zip((*map(repr, BUCKETS), '+Inf'), values):
+      cumulative += count
+      lines.append(f'accounting_operation_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+    lines.append(f'accounting_operation_seconds_sum{{{label}}} {values[-3]!r}')
+    lines.append(f'accounting_operation_seconds_count{{{label}}} {values[-2]}')
+  lines += [
+    '# HELP accounting_operation_errors_total Calls of accounting hot paths that raised.',
+    '# TYPE accounting_operation_errors_total counter',
+  ]
+  for operation, values in sorted(totals.items()):
+    lines.append(f'accounting_operation_errors_total{{operation="{_label(operation)}"}} {values[-1]}')
+  return '\n'.join(lines) + '\n'
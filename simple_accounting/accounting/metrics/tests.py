@@ -0,0 +1,67 @@
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from accounting.models import Account, VoucherType, Voucher
+from .registry import Registry, registry, render, timed
+
+class MetricsTest(TestCase):
+
+  def setUp(self):
+    registry.reset()
+
+  def test_hot_paths_are_measured(self):
+    """voucher saves, numbering, cascades and queryset methods are timed"""
+    cash = Account(name="Cash", account_number="1", account_type=Account.AccountTypes.ASSET)
+    cash.save()
+    Account(name="Petty Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET, parent=cash).save()
+    cash.inactive = True
+    cash.save()
+    vtype = VoucherType(name="Sale Voucher", prefix="SV")
+    vtype.save()
+    Voucher(voucher_date="2022-01-01", voucher_type=vtype).save()
+    totals = registry.snapshot()
+    self.assertEqual(totals['Voucher.save'][-2], 1)
+    self.assertEqual(totals['VoucherType.generate_number'][-2], 1)
+    self.assertEqual(totals['Account.save.inactive_cascade'][-2], 1)
+    self.assertEqual(totals['AccountQuerySet.update'][-2], 1)
+
+  def test_renders_cumulative_histograms(self):
+    """buckets are cumulative and errors are counted"""
+    with timed('sample'):
+      pass
+    with self.assertRaises(ValueError):
+      with timed('sample'):
+        raise ValueError
+    registry.observe('sample', 20)
+    text = render()
+    self.assertIn('accounting_operation_seconds_bucket{operation="sample",le="10.0"} 2', text)
+    self.assertIn('accounting_operation_seconds_bucket{operation="sample",le="+Inf"} 3', text)
+    self.assertIn('accounting_operation_seconds_count{operation="sample"} 3', text)
+    self.assertIn('accounting_operation_errors_total{operation="sample"} 1', text)
+
+  def test_workers_are_summed(self):
+    """with a shared directory every process's totals are added up"""
+    with tempfile.TemporaryDirectory() as directory, self.settings(ACCOUNTING_METRICS_DIR=directory):
+      other = Registry()
+      other.observe('sample', 0.001)
+      other.flush()
+      os.rename(os.path.join(directory, f'{os.getpid()}.json'), os.path.join(directory, '1.json'))
+      registry.observe('sample', 0.001)
+      self.assertEqual(registry.collect()['sample'][-2], 2)
+      out = StringIO()
+      call_command('dump_metrics', stdout=out)
+      self.assertIn('accounting_operation_seconds_count{operation="sample"} 2', out.getvalue())
+
+  @override_settings(ACCOUNTING_METRICS_TOKEN='secret')
+  def test_endpoint_requires_staff_or_token(self):
+    """scrapers use the bearer token, staff may browse"""
+    self.assertEqual(self.client.get('/metrics').status_code, 401)
+    response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+    self.assertEqual(response.status_code, 200)
+    self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+    self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+    self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+    self.assertEqual(self.client.get('/metrics').status_code, 200)
@@ -0,0 +1,15 @@
+import hmac
+from django.conf import settings
+from django.http import HttpResponse
+from .registry import render
+
+def metrics(request):
+  """Prometheus scrape endpoint, for staff users or a bearer ACCOUNTING_METRICS_TOKEN"""
+  token = getattr(settings, 'ACCOUNTING_METRICS_TOKEN', None)
+  authorization = request.headers.get('Authorization', '')
+  allowed = request.user.is_authenticated and request.user.is_staff
+  if token and not allowed:
+    allowed = hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode())
+  if not allowed:
+    return HttpResponse('authentication required\n', status=401, content_type='text/plain')
+  return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,26 @@
+import time
+from django.conf import settings
+from .routers import replica_state
+
+class ReplicaStickinessMiddleware:
+  """
+  Keeps reads on the primary for ACCOUNTING_REPLICA_STICKY_SECONDS after a
+  session has written, so a user sees their own postings in reports even
+  while the replica catches up.
+  """
+
+  session_key = '_accounting_last_write'
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+
+  def __call__(self, request):
+    session = getattr(request, 'session', None)
+    last_write = session.get(self.session_key) if session is not None else None
+    sticky = getattr(settings, 'ACCOUNTING_REPLICA_STICKY_SECONDS', 10)
+    pinned = last_write is not None and time.time() - last_write < sticky
+    with replica_state(pinned) as state:
+      response = self.get_response(request)
+    if state.wrote and session is not None:
+      session[self.session_key] = time.time()
+    return response
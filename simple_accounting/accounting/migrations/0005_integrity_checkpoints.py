@@ -0,0 +1,31 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_auto_20230123_0803'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('position_at', models.DateTimeField(blank=True, null=True)),
+                ('position_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ledger',
+            index=models.Index(fields=['updated_at', 'id'], name='accounting__updated_b3b827_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voucher',
+            index=models.Index(fields=['updated_at', 'id'], name='accounting__updated_121cca_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+from accounting.utils import tokenize
+
+
+def index_account_names(apps, schema_editor):
+    Account = apps.get_model('accounting', 'Account')
+    AccountNameToken = apps.get_model('accounting', 'AccountNameToken')
+    AccountNameToken.objects.bulk_create(
+        (
+            AccountNameToken(account_id=pk, token=token)
+            for pk, name in Account.objects.values_list('pk', 'name').iterator()
+            for token in tokenize(name)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0005_integrity_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountNameToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_tokens', to='accounting.account')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='accountnametoken',
+            index=models.Index(fields=['token', 'account'], name='accounting__token_46245c_idx'),
+        ),
+        migrations.RunPython(index_account_names, migrations.RunPython.noop),
+    ]
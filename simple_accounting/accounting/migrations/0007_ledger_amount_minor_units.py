@@ -0,0 +1,64 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:08
+
+import accounting.fields
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models.functions import Abs, Round
+
+SCALE = 10 ** 6
+# the largest amount a signed 64 bit integer holds at six decimal places
+LIMIT = Decimal(2 ** 63 - 1) / SCALE
+
+
+def to_minor_units(apps, schema_editor):
+    Ledger = apps.get_model('accounting', 'Ledger')
+    largest = Ledger.objects.aggregate(largest=models.Max(Abs('amount')))['largest']
+    if largest is not None and largest > LIMIT:
+        raise ValueError(
+            f'ledger amounts up to {largest} do not fit minor units of 10 ** -6 in a BIGINT '
+            f'(at most {LIMIT:.6f}); lower AMOUNT_DECIMAL_PLACES in accounting/fields.py and SCALE here'
+        )
+    Ledger.objects.update(amount_minor=Round(models.F('amount') * SCALE))
+
+
+def to_decimal(apps, schema_editor):
+    Ledger = apps.get_model('accounting', 'Ledger')
+    Ledger.objects.update(amount=models.ExpressionWrapper(
+        models.F('amount_minor') * models.Value(Decimal(1) / SCALE),
+        output_field=models.DecimalField(max_digits=30, decimal_places=6),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0006_account_name_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ledger',
+            name='amount_minor',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='ledger',
+            name='amount',
+            field=models.DecimalField(decimal_places=6, max_digits=30, null=True),
+        ),
+        migrations.RunPython(to_minor_units, to_decimal),
+        migrations.RemoveField(
+            model_name='ledger',
+            name='amount',
+        ),
+        migrations.RenameField(
+            model_name='ledger',
+            old_name='amount_minor',
+            new_name='amount',
+        ),
+        migrations.AlterField(
+            model_name='ledger',
+            name='amount',
+            field=accounting.fields.MinorUnitAmountField(decimal_places=6),
+        ),
+    ]
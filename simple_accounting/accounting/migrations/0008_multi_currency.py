@@ -0,0 +1,41 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:10
+
+import accounting.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0007_ledger_amount_minor_units'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=10, max_digits=24)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ledger',
+            name='currency',
+            field=models.CharField(blank=True, default='', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='ledger',
+            name='currency_amount',
+            field=accounting.fields.MinorUnitAmountField(blank=True, decimal_places=6, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ledger',
+            index=models.Index(fields=['account', 'currency'], name='accounting__account_40a390_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='exchangerate',
+            constraint=models.UniqueConstraint(fields=('currency', 'date'), name='unique_exchange_rate_per_day'),
+        ),
+    ]
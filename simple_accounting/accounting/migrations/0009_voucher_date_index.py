@@ -0,0 +1,17 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0008_multi_currency'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='voucher',
+            index=models.Index(fields=['voucher_date', 'status'], name='accounting__voucher_702738_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:12
+
+import accounting.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0009_voucher_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankStatement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('imported_at', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bank_statements', to='accounting.account')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StatementLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('amount', accounting.fields.MinorUnitAmountField(decimal_places=6)),
+                ('description', models.CharField(blank=True, max_length=256)),
+                ('reference', models.CharField(blank=True, max_length=64)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+                ('ledger', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='statement_line', to='accounting.ledger')),
+                ('statement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='accounting.bankstatement')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='statementline',
+            index=models.Index(fields=['statement', 'ledger'], name='accounting__stateme_5f5ee9_idx'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:14
+
+import accounting.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0010_bank_reconciliation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Dimension',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.SlugField(max_length=32, unique=True)),
+                ('name', models.CharField(max_length=128)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DimensionValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=32)),
+                ('name', models.CharField(max_length=128)),
+                ('dimension', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='accounting.dimension')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LedgerDimension',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('dimension', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounting.dimension')),
+                ('ledger', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dimensions', to='accounting.ledger')),
+                ('value', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounting.dimensionvalue')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CubeCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField()),
+                ('amount', accounting.fields.MinorUnitAmountField(decimal_places=6)),
+                ('ledgers', models.IntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounting.account')),
+                ('dimension_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounting.dimension')),
+                ('dimension_b', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounting.dimension')),
+                ('value_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounting.dimensionvalue')),
+                ('value_b', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounting.dimensionvalue')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ledgerdimension',
+            index=models.Index(fields=['dimension', 'value', 'ledger'], name='accounting__dimensi_19d868_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerdimension',
+            index=models.Index(fields=['updated_at', 'id'], name='accounting__updated_a8bdce_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ledgerdimension',
+            constraint=models.UniqueConstraint(fields=('ledger', 'dimension'), name='unique_ledger_dimension'),
+        ),
+        migrations.AddConstraint(
+            model_name='dimensionvalue',
+            constraint=models.UniqueConstraint(fields=('dimension', 'code'), name='unique_dimension_value_code'),
+        ),
+        migrations.AddIndex(
+            model_name='cubecell',
+            index=models.Index(fields=['dimension_a', 'dimension_b', 'period'], name='accounting__dimensi_44b27d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cubecell',
+            index=models.Index(fields=['period'], name='accounting__period_4fd318_idx'),
+        ),
+    ]
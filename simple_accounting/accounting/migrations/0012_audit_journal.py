@@ -0,0 +1,32 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0011_analytic_dimensions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.BigIntegerField(unique=True)),
+                ('model', models.CharField(max_length=64)),
+                ('object_id', models.BigIntegerField(blank=True, null=True)),
+                ('action', models.CharField(choices=[('create', 'Create'), ('update', 'Update'), ('delete', 'Delete')], max_length=6)),
+                ('before', models.TextField(blank=True, null=True)),
+                ('after', models.TextField(blank=True, null=True)),
+                ('recorded_at', models.DateTimeField()),
+                ('previous_hash', models.CharField(max_length=64)),
+                ('hash', models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['model', 'object_id'], name='accounting__model_2a30eb_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:20
+
+import accounting.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0012_audit_journal'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='voucher',
+            name='voucher_number',
+            field=models.CharField(db_index=True, editable=False, max_length=12),
+        ),
+        migrations.CreateModel(
+            name='RecurringTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('description', models.TextField(blank=True)),
+                ('frequency', models.IntegerField(choices=[(1, 'Weekly'), (2, 'Monthly'), (3, 'Quarterly'), (4, 'Yearly')], default=2)),
+                ('interval', models.PositiveIntegerField(default=1)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('status', models.IntegerField(choices=[(1, 'Pending'), (2, 'Approved'), (3, 'Rejected')], default=2)),
+                ('generated', models.PositiveIntegerField(default=0, editable=False)),
+                ('next_date', models.DateField(blank=True, editable=False, null=True)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('voucher_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounting.vouchertype')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecurringOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='accounting.recurringtemplate')),
+                ('voucher', models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recurring_occurrence', to='accounting.voucher')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecurringLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', accounting.fields.MinorUnitAmountField(decimal_places=6)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounting.account')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='accounting.recurringtemplate')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recurringtemplate',
+            index=models.Index(fields=['active', 'next_date'], name='accounting__active_deeaae_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recurringoccurrence',
+            constraint=models.UniqueConstraint(fields=('template', 'date'), name='unique_recurring_occurrence'),
+        ),
+    ]
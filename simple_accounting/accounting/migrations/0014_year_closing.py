@@ -0,0 +1,31 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0013_recurring_templates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YearClosing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('reopened_at', models.DateTimeField(blank=True, null=True)),
+                ('retained_earnings', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.account')),
+                ('reversal', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.voucher')),
+                ('voucher', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.voucher')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='yearclosing',
+            index=models.Index(fields=['end_date', 'reopened_at'], name='accounting__end_dat_76e61e_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0015_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voucher',
+            name='reversal_of',
+            field=models.OneToOneField(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='reversal', to='accounting.voucher'),
+        ),
+    ]
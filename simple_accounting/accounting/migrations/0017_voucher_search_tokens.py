@@ -0,0 +1,59 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:34
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from accounting.utils import tokenize
+
+
+def fulltext(schema_editor):
+    return schema_editor.connection.vendor == 'mysql' and getattr(settings, 'ACCOUNTING_VOUCHER_FULLTEXT', True)
+
+
+def index_vouchers(apps, schema_editor):
+    if fulltext(schema_editor):
+        return
+    Voucher = apps.get_model('accounting', 'Voucher')
+    VoucherSearchToken = apps.get_model('accounting', 'VoucherSearchToken')
+    VoucherSearchToken.objects.bulk_create(
+        (
+            VoucherSearchToken(voucher_id=pk, token=token)
+            for pk, number, description in Voucher.objects.values_list('pk', 'voucher_number', 'description').iterator()
+            for token in dict.fromkeys(tokenize(number.rsplit('-', 1)[-1]) + tokenize(description))
+        ),
+        batch_size=1000,
+    )
+
+
+def add_fulltext_index(apps, schema_editor):
+    if fulltext(schema_editor):
+        schema_editor.execute('ALTER TABLE accounting_voucher ADD FULLTEXT INDEX accounting_voucher_search (voucher_number, description)')
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if fulltext(schema_editor):
+        schema_editor.execute('ALTER TABLE accounting_voucher DROP INDEX accounting_voucher_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0016_voucher_reversal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoucherSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('voucher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='accounting.voucher')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='vouchersearchtoken',
+            index=models.Index(fields=['token', 'voucher'], name='accounting__token_3d3aab_idx'),
+        ),
+        migrations.RunPython(index_vouchers, migrations.RunPython.noop),
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+    ]
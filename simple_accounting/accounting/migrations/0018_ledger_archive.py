@@ -0,0 +1,57 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:43
+
+import accounting.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0017_voucher_search_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedVoucher',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('voucher_number', models.CharField(db_index=True, max_length=12)),
+                ('voucher_date', models.DateField()),
+                ('description', models.TextField(blank=True, null=True)),
+                ('status', models.IntegerField(choices=[(1, 'Pending'), (2, 'Approved'), (3, 'Rejected')])),
+                ('reversal_of_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('voucher_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.vouchertype')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedLedger',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount', accounting.fields.MinorUnitAmountField(decimal_places=6)),
+                ('currency', models.CharField(blank=True, default='', max_length=3)),
+                ('currency_amount', accounting.fields.MinorUnitAmountField(blank=True, decimal_places=6, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.account')),
+                ('voucher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledgers', to='accounting.archivedvoucher')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Archive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff', models.DateField(unique=True)),
+                ('vouchers', models.IntegerField(default=0)),
+                ('ledgers', models.IntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('voucher', models.OneToOneField(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.voucher')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedvoucher',
+            index=models.Index(fields=['voucher_date', 'status'], name='accounting__voucher_204fce_idx'),
+        ),
+    ]
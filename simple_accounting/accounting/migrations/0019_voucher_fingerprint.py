@@ -0,0 +1,41 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:52
+
+from django.db import migrations, models
+from accounting.utils import fingerprint
+
+
+def fingerprint_vouchers(apps, schema_editor):
+    Voucher = apps.get_model('accounting', 'Voucher')
+    Ledger = apps.get_model('accounting', 'Ledger')
+    last = 0
+    while True:
+        vouchers = list(Voucher.objects.filter(pk__gt=last).order_by('pk').only('pk', 'voucher_date', 'voucher_type_id')[:1000])
+        if not vouchers:
+            return
+        last = vouchers[-1].pk
+        lines = {}
+        for voucher_id, account_id, amount in Ledger.objects.filter(voucher_id__in=[voucher.pk for voucher in vouchers]).values_list('voucher_id', 'account_id', 'amount'):
+            lines.setdefault(voucher_id, []).append((account_id, amount))
+        for voucher in vouchers:
+            voucher.fingerprint = fingerprint(voucher.voucher_date, voucher.voucher_type_id, lines.get(voucher.pk, ()))
+        Voucher.objects.bulk_update(vouchers, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0018_ledger_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voucher',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='voucher',
+            index=models.Index(fields=['fingerprint', 'created_at'], name='accounting__fingerp_03d844_idx'),
+        ),
+        migrations.RunPython(fingerprint_vouchers, migrations.RunPython.noop),
+    ]
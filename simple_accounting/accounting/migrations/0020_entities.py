@@ -0,0 +1,81 @@
+# Generated by Django 3.2.16 on 2026-10-19 07:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0019_voucher_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Entity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=16, unique=True)),
+                ('name', models.CharField(max_length=256)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'entities',
+            },
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='entity',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='accounts', to='accounting.entity'),
+        ),
+        migrations.AddField(
+            model_name='archivedledger',
+            name='entity',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.entity'),
+        ),
+        migrations.AddField(
+            model_name='archivedvoucher',
+            name='entity',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.entity'),
+        ),
+        migrations.AddField(
+            model_name='ledger',
+            name='entity',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.entity'),
+        ),
+        migrations.AddField(
+            model_name='voucher',
+            name='entity',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.entity'),
+        ),
+        migrations.AddField(
+            model_name='vouchertype',
+            name='entity',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='voucher_types', to='accounting.entity'),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['entity', 'account_number'], name='accounting__entity__2ecfa0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ledger',
+            index=models.Index(fields=['entity', 'account'], name='accounting__entity__43331a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voucher',
+            index=models.Index(fields=['entity', 'voucher_date', 'status'], name='accounting__entity__a9409a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vouchertype',
+            index=models.Index(fields=['entity', 'prefix'], name='accounting__entity__67eecb_idx'),
+        ),
+        migrations.CreateModel(
+            name='GroupMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='group_mapping', to='accounting.account')),
+                ('counterparty', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.entity')),
+                ('group_account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.account')),
+            ],
+        ),
+    ]
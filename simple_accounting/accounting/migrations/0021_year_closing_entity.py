@@ -0,0 +1,19 @@
+# Generated by Django 3.2.16 on 2026-10-19 08:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0020_entities'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='yearclosing',
+            name='entity',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.entity'),
+        ),
+    ]
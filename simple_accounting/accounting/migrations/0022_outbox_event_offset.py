@@ -0,0 +1,30 @@
+# Generated by Django 3.2.16 on 2026-10-19 08:20
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def offsets_from_ids(apps, schema_editor):
+    # consumers acknowledged ids so far, so existing events keep them as offsets
+    OutboxEvent = apps.get_model('accounting', 'OutboxEvent')
+    Checkpoint = apps.get_model('accounting', 'Checkpoint')
+    OutboxEvent.objects.update(offset=models.F('id'))
+    last = OutboxEvent.objects.aggregate(last=models.Max('id'))['last']
+    if last:
+        Checkpoint.objects.update_or_create(name='feed.head', defaults={'position_at': timezone.now(), 'position_id': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0021_year_closing_entity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='offset',
+            field=models.BigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.RunPython(offsets_from_ids, migrations.RunPython.noop),
+    ]
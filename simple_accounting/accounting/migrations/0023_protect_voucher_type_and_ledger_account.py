@@ -0,0 +1,24 @@
+# Generated by Django 3.2.16 on 2026-10-19 08:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0022_outbox_event_offset'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ledger',
+            name='account',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounting.account'),
+        ),
+        migrations.AlterField(
+            model_name='voucher',
+            name='voucher_type',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='accounting.vouchertype'),
+        ),
+    ]
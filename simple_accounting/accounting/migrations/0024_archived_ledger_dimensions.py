@@ -0,0 +1,24 @@
+# Generated by Django 3.2.16 on 2026-10-19 08:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0023_protect_voucher_type_and_ledger_account'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedLedgerDimension',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField()),
+                ('dimension', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounting.dimension')),
+                ('ledger', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dimensions', to='accounting.archivedledger')),
+                ('value', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounting.dimensionvalue')),
+            ],
+        ),
+    ]
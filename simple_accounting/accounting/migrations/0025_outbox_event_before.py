@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-19 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0024_archived_ledger_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='before',
+            field=models.TextField(blank=True),
+        ),
+    ]
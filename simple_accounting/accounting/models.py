@@ -1,2 +1,13 @@
-from .account.models import Account
-from .voucher.models import VoucherType, Voucher, Ledger
\ No newline at end of file
+from .entity.models import Entity
+from .account.models import Account, AccountNameToken
+from .voucher.models import VoucherType, Voucher, Ledger, VoucherSearchToken
+from .checkpoint.models import Checkpoint
+from .currency.models import ExchangeRate
+from .reconciliation.models import BankStatement, StatementLine
+from .analytics.models import Dimension, DimensionValue, LedgerDimension, CubeCell
+from .journal.models import JournalEntry
+from .outbox.models import OutboxEvent
+from .recurring.models import RecurringTemplate, RecurringLine, RecurringOccurrence
+from .closing.models import YearClosing
+from .archive.models import Archive, ArchivedVoucher, ArchivedLedger, ArchivedLedgerDimension
+from .consolidation.models import GroupMapping
@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+class OutboxEventAdmin(admin.ModelAdmin):
+  list_display = ('id', 'offset', 'created_at', 'action', 'model', 'object_id')
+  list_filter = ('model', 'action')
+  search_fields = ('=object_id',)
+  ordering = ('-id',)
+
+  def has_add_permission(self, request):
+    return False
+
+  def has_change_permission(self, request, obj=None):
+    return False
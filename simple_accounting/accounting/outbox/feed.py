@@ -0,0 +1,72 @@
+from typing import List, Optional
+from django.db import models, transaction
+from django.utils import timezone
+from accounting.checkpoint.models import Checkpoint
+from .models import OutboxEvent
+
+CONSUMER_PREFIX = 'outbox.'
+HEAD_CHECKPOINT = 'feed.head'
+
+def consumer(name: str) -> Checkpoint:
+  """a consumer's acknowledged offset is kept as a checkpoint"""
+  return Checkpoint.load(f'{CONSUMER_PREFIX}{name}')
+
+def position(name: str) -> int:
+  """a consumer's acknowledged offset, read without creating its checkpoint"""
+  return Checkpoint.objects.filter(name=f'{CONSUMER_PREFIX}{name}').values_list('position_id', flat=True).first() or 0
+
+def sequence(batch_size: int = 10000) -> int:
+  """
+  Gives committed events without an offset the next offsets in id order,
+  holding the head checkpoint row lock. An event committed late by a long
+  transaction gets an offset above every one handed out before, so readers
+  never skip it. Run by background jobs (`change_feed sequence`, the
+  integrity auditor), not by readers; the lock is only taken while events
+  are waiting. Returns how many events were given one.
+  """
+  sequenced = 0
+  while True:
+    if not OutboxEvent.objects.filter(offset=None).exists():
+      return sequenced
+    with transaction.atomic():
+      head, _ = Checkpoint.objects.select_for_update().get_or_create(name=HEAD_CHECKPOINT)
+      ids = list(OutboxEvent.objects.filter(offset=None).order_by('pk').values_list('pk', flat=True)[:batch_size])
+      if not ids:
+        return sequenced
+      events = [OutboxEvent(pk=pk, offset=offset) for offset, pk in enumerate(ids, head.position_id + 1)]
+      OutboxEvent.objects.bulk_update(events, ['offset'])
+      head.advance(timezone.now(), events[-1].offset)
+    sequenced += len(ids)
+
+def read(after: int = 0, limit: int = 1000) -> List[OutboxEvent]:
+  """sequenced events after an offset, in offset order: one range scan of the offset index"""
+  return list(OutboxEvent.objects.filter(offset__gt=after).order_by('offset')[:limit])
+
+def acknowledge(name: str, position: int) -> int:
+  """moves a consumer forward to position, never back; returns its offset"""
+  with transaction.atomic():
+    checkpoint = consumer(name)
+    Checkpoint.objects.filter(pk=checkpoint.pk, position_id__lt=position).update(
+      position_id=position, position_at=timezone.now(), updated_at=timezone.now(),
+    )
+    return max(checkpoint.position_id, position)
+
+def pending(name: str, limit: int = 1000) -> List[OutboxEvent]:
+  return read(position(name), limit)
+
+def low_water_mark() -> Optional[int]:
+  """offset every consumer has acknowledged, None without consumers"""
+  return Checkpoint.objects.filter(name__startswith=CONSUMER_PREFIX).aggregate(low=models.Min('position_id'))['low']
+
+def prune(batch_size: int = 10000) -> int:
+  """deletes events every consumer acknowledged, one offset range per statement"""
+  upto = low_water_mark()
+  if not upto:
+    return 0
+  first = OutboxEvent.objects.filter(offset__lte=upto).aggregate(first=models.Min('offset'))['first']
+  deleted = 0
+  while first is not None and first <= upto:
+    last = min(first + batch_size - 1, upto)
+    deleted += OutboxEvent.objects.filter(offset__gte=first, offset__lte=last).delete()[0]
+    first = last + 1
+  return deleted
@@ -0,0 +1,30 @@
+from django.db import models
+from datetime import datetime
+
+class OutboxEvent(models.Model):
+  """
+  A change of an account, voucher or ledger, inserted in the transaction that
+  made it. Ids are taken at insert but commit in any order, so the feed
+  offset is given once the event is committed: consumers read offset ranges.
+  """
+
+  class Actions(models.TextChoices):
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+
+  id: int = models.BigAutoField(primary_key=True)
+  model: str = models.CharField(max_length=64)
+  # empty for rows bulk created on backends that do not return primary keys
+  object_id: int = models.BigIntegerField(null=True, blank=True)
+  action: str = models.CharField(max_length=6, choices=Actions.choices)
+  # compact JSON: every field on create and delete, the changed ones on update
+  payload: str = models.TextField(blank=True)
+  # compact JSON of the changed fields' previous values on update, empty otherwise
+  before: str = models.TextField(blank=True)
+  # empty until feed.sequence() sees the event committed
+  offset: int = models.BigIntegerField(null=True, blank=True, unique=True)
+  created_at: datetime = models.DateTimeField(auto_now_add=True)
+
+  def __str__(self):
+    return f'#{self.pk} {self.action} {self.model} {self.object_id}'
@@ -0,0 +1,56 @@
+import json
+from typing import Dict, Iterable, List, Optional
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from accounting.journal.recorder import snapshot
+from .models import OutboxEvent
+
+def _compact(values: Optional[Dict]) -> str:
+  return json.dumps(values, cls=DjangoJSONEncoder, separators=(',', ':')) if values else ''
+
+def event(model, object_id, action: str, values: Optional[Dict], before: Optional[Dict] = None) -> OutboxEvent:
+  return OutboxEvent(model=model._meta.label_lower, object_id=object_id, action=action, payload=_compact(values), before=_compact(before))
+
+def publish(events: List[OutboxEvent]):
+  """inserts events right away, so they commit or roll back with the change itself"""
+  if events:
+    OutboxEvent.objects.bulk_create(events)
+
+def publish_posted(vouchers: Iterable[models.Model], ledgers: Dict[int, List[models.Model]]):
+  """one event per bulk posted voucher, its ledgers nested in the payload"""
+  publish([
+    event(type(voucher), voucher.pk, 'create', {
+      **snapshot(voucher),
+      'ledgers': [snapshot(ledger) for ledger in ledgers.get(voucher.pk, ())],
+    })
+    for voucher in vouchers
+  ])
+
+def saved(sender, instance, created, raw=False, **kwargs):
+  if raw:
+    return
+  after = snapshot(instance)
+  if created:
+    publish([event(sender, instance.pk, 'create', after)])
+    return
+  before = getattr(instance, '_journal_before', None)
+  changed = after if before is None else {name: value for name, value in after.items() if before.get(name) != value}
+  if changed:
+    publish([event(sender, instance.pk, 'update', changed, before and {name: before.get(name) for name in changed})])
+
+def deleted(sender, instance, **kwargs):
+  publish([event(sender, instance.pk, 'delete', snapshot(instance))])
+
+def updated(sender, changes, **kwargs):
+  publish([event(sender, pk, 'update', after, before) for pk, before, after in changes])
+
+def connect():
+  """connected before the journal, which moves the remembered values on"""
+  from django.db.models.signals import post_save, post_delete
+  from accounting.journal.recorder import rows_updated
+  from accounting.account.models import Account
+  from accounting.voucher.models import Voucher, Ledger
+  for model in (Account, Voucher, Ledger):
+    post_save.connect(saved, sender=model, dispatch_uid=f'outbox-save-{model._meta.label_lower}')
+    post_delete.connect(deleted, sender=model, dispatch_uid=f'outbox-delete-{model._meta.label_lower}')
+    rows_updated.connect(updated, sender=model, dispatch_uid=f'outbox-update-{model._meta.label_lower}')
@@ -0,0 +1,127 @@
+import json
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from accounting.models import Account, VoucherType, Voucher, Ledger, OutboxEvent
+from accounting.voucher.posting import post_vouchers
+from . import feed
+
+class OutboxTest(TestCase):
+
+  def setUp(self):
+    self.cash = Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET)
+    self.cash.save()
+    self.sales = Account(name="Sales", account_number="4.1", account_type=Account.AccountTypes.REVENUE)
+    self.sales.save()
+    self.vtype = VoucherType(name="Sale Voucher", prefix="SV")
+    self.vtype.save()
+
+  def events(self, after=0):
+    feed.sequence()
+    return [(event.model, event.action, event.object_id) for event in feed.read(after)]
+
+  def test_events_are_written_with_the_change(self):
+    """saves, updates and deletes add events in the same transaction"""
+    start = OutboxEvent.objects.latest('pk').pk
+    voucher = Voucher(voucher_date="2022-01-01", voucher_type=self.vtype)
+    voucher.save()
+    ledger = Ledger(voucher=voucher, account=self.cash, amount=10)
+    ledger.save()
+    ledger.amount = 12
+    ledger.save()
+    Ledger.objects.filter(pk=ledger.pk).update(amount=15)
+    Account.objects.filter(pk=self.cash.pk).update(name="Cash in Hand", __v=1)
+    self.assertEqual(self.events(start), [
+      ('accounting.voucher', 'create', voucher.pk),
+      ('accounting.ledger', 'create', ledger.pk),
+      ('accounting.voucher', 'update', voucher.pk),
+      ('accounting.ledger', 'update', ledger.pk),
+      ('accounting.voucher', 'update', voucher.pk),
+      ('accounting.ledger', 'update', ledger.pk),
+      ('accounting.voucher', 'update', voucher.pk),
+      ('accounting.account', 'update', self.cash.pk),
+    ])
+    updates = OutboxEvent.objects.filter(model='accounting.ledger', action='update').order_by('pk')
+    self.assertEqual([json.loads(update.payload) for update in updates], [{'amount': '12'}, {'amount': '15.000000'}])
+    self.assertEqual([json.loads(update.before) for update in updates], [{'amount': '10'}, {'amount': '12.000000'}])
+    fingerprint = json.loads(OutboxEvent.objects.filter(model='accounting.voucher', action='update').latest('pk').payload)['fingerprint']
+    self.assertEqual(Voucher.objects.get(pk=voucher.pk).fingerprint, fingerprint)
+    self.assertEqual(json.loads(OutboxEvent.objects.latest('pk').payload), {'name': 'Cash in Hand'})
+
+  def test_rolled_back_changes_leave_no_events(self):
+    """events roll back with the change"""
+    count = OutboxEvent.objects.count()
+    try:
+      with transaction.atomic():
+        Voucher(voucher_date="2022-01-01", voucher_type=self.vtype).save()
+        raise RuntimeError
+    except RuntimeError:
+      pass
+    self.assertEqual(OutboxEvent.objects.count(), count)
+
+  def test_bulk_posting_adds_one_event_per_voucher(self):
+    """posted vouchers carry their ledgers in the payload"""
+    start = OutboxEvent.objects.latest('pk').pk
+    post_vouchers([
+      (Voucher(voucher_date="2022-01-01", voucher_type=self.vtype), [
+        Ledger(account=self.cash, amount=5), Ledger(account=self.sales, amount=5),
+      ])
+      for _ in range(3)
+    ])
+    feed.sequence()
+    events = feed.read(start)
+    self.assertEqual([event.model for event in events], ['accounting.voucher'] * 3)
+    self.assertEqual(len(json.loads(events[0].payload)['ledgers']), 2)
+
+  def test_consumers_acknowledge_and_prune(self):
+    """events are pruned once every consumer acknowledged them"""
+    feed.sequence()
+    first, last = [event.offset for event in feed.read()]
+    self.assertEqual(len(feed.pending('warehouse')), 2)
+    self.assertEqual(feed.acknowledge('warehouse', last), last)
+    self.assertEqual(feed.acknowledge('warehouse', first), last)
+    self.assertEqual(feed.pending('warehouse'), [])
+    feed.acknowledge('billing', first)
+    self.assertEqual(feed.prune(batch_size=1), 1)
+    feed.acknowledge('billing', last)
+    self.assertEqual(feed.prune(), 1)
+    self.assertFalse(OutboxEvent.objects.exists())
+
+  def test_late_commits_get_later_offsets(self):
+    """an event committed after others were read is served after them, whatever its id"""
+    last = OutboxEvent.objects.latest('pk').pk
+    OutboxEvent.objects.create(pk=last + 10, model='accounting.account', action='update')
+    feed.sequence()
+    seen = feed.read()[-1].offset
+    OutboxEvent.objects.create(pk=last + 5, model='accounting.account', action='delete')
+    self.assertEqual(feed.read(seen), [])
+    self.assertEqual(feed.sequence(), 1)
+    self.assertEqual([(event.pk, event.offset) for event in feed.read(seen)], [(last + 5, seen + 1)])
+    with self.assertNumQueries(1):
+      self.assertEqual(feed.sequence(), 0)
+
+  def test_change_feed_api(self):
+    """the feed pages by offset and acknowledges consumer positions"""
+    user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+    self.client.force_login(user)
+    voucher = Voucher(voucher_date="2022-01-01", voucher_type=self.vtype)
+    voucher.save()
+    call_command('change_feed', 'sequence', stderr=StringIO())
+    data = self.client.get('/api/changes/', {'limit': 2}).json()
+    self.assertEqual([event['data']['name'] for event in data['events']], ['Cash', 'Sales'])
+    position = data['events'][1]['offset']
+    self.assertEqual(data['next_offset'], position)
+    self.assertEqual(self.client.post('/api/changes/', {'consumer': 'erp', 'position': position}).json()['position'], position)
+    data = self.client.get('/api/changes/', {'consumer': 'erp'}).json()
+    self.assertEqual([event['object_id'] for event in data['events']], [voucher.pk])
+    self.assertEqual(self.client.get('/api/changes/', {'after': 'x'}).status_code, 400)
+
+  def test_command_reads_and_acknowledges(self):
+    """change_feed prints JSON lines and moves the consumer on"""
+    out = StringIO()
+    call_command('change_feed', 'read', consumer='erp', ack=True, stdout=out, stderr=StringIO())
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    self.assertEqual([line['model'] for line in lines], ['accounting.account', 'accounting.account'])
+    self.assertEqual(feed.consumer('erp').position_id, lines[-1]['offset'])
@@ -0,0 +1,13 @@
+from django.contrib import admin
+from .models import StatementLine
+
+class StatementLineInline(admin.TabularInline):
+  model = StatementLine
+  fields = ('date', 'amount', 'description', 'reference', 'ledger', 'reconciled_at')
+  readonly_fields = ('ledger', 'reconciled_at')
+  extra = 0
+
+class BankStatementAdmin(admin.ModelAdmin):
+  list_display = ('__str__', 'imported_at')
+  list_filter = ('account',)
+  inlines = [StatementLineInline]
@@ -0,0 +1,107 @@
+import csv
+import io
+from bisect import bisect_left
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Tuple
+from django.db import transaction
+from django.utils import timezone
+from accounting.account.models import Account
+from accounting.voucher.models import Voucher, Ledger
+from .models import BankStatement, StatementLine
+
+class Match(NamedTuple):
+  line_id: int
+  ledger_id: int
+  exact: bool
+
+def import_statement(account: Account, file, name: str) -> BankStatement:
+  """statement lines from CSV with date (YYYY-MM-DD), amount, and optional description and reference columns"""
+  if isinstance(file, (bytes, bytearray)):
+    file = io.StringIO(file.decode())
+  with transaction.atomic():
+    statement = BankStatement(account=account, name=name)
+    statement.save()
+    StatementLine.objects.bulk_create(
+      (
+        StatementLine(
+          statement=statement,
+          date=date.fromisoformat(row['date'].strip()),
+          amount=Decimal(row['amount'].strip()),
+          description=(row.get('description') or '').strip()[:256],
+          reference=(row.get('reference') or '').strip()[:64],
+        )
+        for row in csv.DictReader(file)
+      ),
+      batch_size=1000,
+    )
+  return statement
+
+def unreconciled(account: Account):
+  lines = StatementLine.objects.filter(statement__account=account, ledger__isnull=True)
+  ledgers = (
+    Ledger.objects
+      .filter(account=account, statement_line__isnull=True)
+      .exclude(voucher__status=Voucher.Status.REJECTED)
+  )
+  return lines, ledgers
+
+def find_matches(lines: List[Tuple[int, date, int]], ledgers: List[Tuple[int, date, int]], tolerance_days: int = 3) -> List[Match]:
+  """
+  Pairs (id, date, amount) statement lines with ledgers of the same amount.
+  Exact (amount, date) pairs come from a hash map first; what is left is
+  swept in date order, each line taking the unmatched ledger of its amount
+  closest in date within tolerance_days.
+  """
+  by_key: Dict[Tuple[int, date], List[int]] = {}
+  for ledger_id, on, amount in sorted(ledgers, key=lambda ledger: ledger[0], reverse=True):
+    by_key.setdefault((amount, on), []).append(ledger_id)
+  matches = []
+  remaining = []
+  for line in sorted(lines, key=lambda line: (line[1], line[0])):
+    candidates = by_key.get((line[2], line[1]))
+    if candidates:
+      matches.append(Match(line[0], candidates.pop(), True))
+    else:
+      remaining.append(line)
+  if not remaining or tolerance_days <= 0:
+    return matches
+  # per amount, unmatched ledgers as parallel sorted dates and ids
+  by_amount: Dict[int, Tuple[List[date], List[int]]] = {}
+  for (amount, on), ids in sorted(by_key.items(), key=lambda item: item[0][1]):
+    dates, ledger_ids = by_amount.setdefault(amount, ([], []))
+    for ledger_id in reversed(ids):
+      dates.append(on)
+      ledger_ids.append(ledger_id)
+  for line_id, on, amount in remaining:
+    if amount not in by_amount:
+      continue
+    dates, ledger_ids = by_amount[amount]
+    index = bisect_left(dates, on)
+    best = None
+    for candidate in (index - 1, index):
+      if 0 <= candidate < len(dates) and abs((dates[candidate] - on).days) <= tolerance_days:
+        if best is None or abs((dates[candidate] - on).days) < abs((dates[best] - on).days):
+          best = candidate
+    if best is not None:
+      matches.append(Match(line_id, ledger_ids[best], False))
+      del dates[best], ledger_ids[best]
+  return matches
+
+def reconcile(account: Account, tolerance_days: int = 3, commit: bool = True) -> List[Match]:
+  """matches every unreconciled statement line of account and stores the pairs"""
+  with transaction.atomic():
+    lines, ledgers = unreconciled(account)
+    matches = find_matches(
+      list(lines.values_list('id', 'date', 'amount__minor')),
+      list(ledgers.values_list('id', 'voucher__voucher_date', 'amount__minor')),
+      tolerance_days,
+    )
+    if commit and matches:
+      now = timezone.now()
+      StatementLine.objects.bulk_update(
+        [StatementLine(id=match.line_id, ledger_id=match.ledger_id, reconciled_at=now) for match in matches],
+        ['ledger', 'reconciled_at'],
+        batch_size=1000,
+      )
+  return matches
@@ -0,0 +1,34 @@
+from django.db import models
+from datetime import datetime, date
+from decimal import Decimal
+from accounting.fields import MinorUnitAmountField
+from accounting.account.models import Account
+from accounting.voucher.models import Ledger
+
+class BankStatement(models.Model):
+
+  account: Account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='bank_statements')
+  name: str = models.CharField(max_length=128)
+  imported_at: datetime = models.DateTimeField(auto_now_add=True)
+
+  def __str__(self):
+    return f'{self.account.account_number} - {self.name}'
+
+class StatementLine(models.Model):
+  """An imported bank statement line, reconciled once `ledger` is set"""
+
+  statement: BankStatement = models.ForeignKey(BankStatement, on_delete=models.CASCADE, related_name='lines')
+  date: date = models.DateField()
+  amount: Decimal = MinorUnitAmountField()
+  description: str = models.CharField(max_length=256, blank=True)
+  reference: str = models.CharField(max_length=64, blank=True)
+  ledger: Ledger = models.OneToOneField(Ledger, on_delete=models.SET_NULL, null=True, blank=True, related_name='statement_line')
+  reconciled_at: datetime = models.DateTimeField(null=True, blank=True)
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['statement', 'ledger']),
+    ]
+
+  def __str__(self):
+    return f'{self.date} {self.amount} {self.description}'
@@ -0,0 +1,42 @@
+import datetime
+from decimal import Decimal
+from accounting.models import Account
+from accounting.testing import LedgerTestCase
+from .matcher import import_statement, reconcile, find_matches
+
+class ReconciliationTest(LedgerTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.bank = self.account("Bank", "1.2", Account.AccountTypes.ASSET, self.assets)
+    self.deposit = self.book("2022-03-01", 100)
+    self.late = self.book("2022-03-05", 250)
+    self.book("2022-03-20", 999)
+
+  def book(self, on, amount):
+    return self.post(on, (self.bank, amount), (self.sales, amount)).ledgers.get(account=self.bank)
+
+  def test_matches_exact_then_within_tolerance(self):
+    """exact matches first, then the closest date within the tolerance"""
+    statement = import_statement(self.bank, b"date,amount,description\n2022-03-01,100,deposit\n2022-03-07,250.00,transfer\n2022-03-07,42,fee\n", 'march')
+    matches = reconcile(self.bank, tolerance_days=3)
+    self.assertEqual(
+      {(match.ledger_id, match.exact) for match in matches},
+      {(self.deposit.pk, True), (self.late.pk, False)},
+    )
+    self.assertEqual(statement.lines.filter(ledger__isnull=True).get().description, 'fee')
+    self.assertEqual(self.late.statement_line.amount, Decimal(250))
+
+  def test_later_runs_skip_reconciled_lines(self):
+    """reconciled lines and ledgers are not considered again"""
+    import_statement(self.bank, b"date,amount\n2022-03-01,100\n", 'march')
+    self.assertEqual(len(reconcile(self.bank)), 1)
+    import_statement(self.bank, b"date,amount\n2022-03-01,100\n", 'duplicate')
+    self.assertEqual(reconcile(self.bank), [])
+
+  def test_picks_closest_date(self):
+    """the sweep prefers the nearest ledger date"""
+    day = datetime.date(2022, 1, 10)
+    ledgers = [(1, day - datetime.timedelta(days=2), 5), (2, day + datetime.timedelta(days=1), 5)]
+    self.assertEqual(find_matches([(7, day, 5)], ledgers, tolerance_days=3)[0].ledger_id, 2)
+    self.assertEqual(find_matches([(7, day, 5)], ledgers, tolerance_days=0), [])
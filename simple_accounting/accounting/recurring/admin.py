@@ -0,0 +1,30 @@
+from django import forms
+from django.contrib import admin
+from django.core.exceptions import ValidationError
+from accounting.voucher.models import DEBIT_ACCOUNT_TYPES
+from .models import RecurringLine
+
+class RecurringLineFormset(forms.BaseInlineFormSet):
+
+  def clean(self):
+    super().clean()
+    balance = 0
+    for form in self.forms:
+      cleaned_data = getattr(form, 'cleaned_data', None)
+      if not form.is_valid() or not cleaned_data or cleaned_data.get('DELETE'):
+        continue
+      account, amount = cleaned_data.get('account'), cleaned_data.get('amount') or 0
+      balance += amount if account and account.account_type in DEBIT_ACCOUNT_TYPES else -amount
+    if balance:
+      raise ValidationError('Debit Credit must be equal')
+
+class RecurringLineInline(admin.TabularInline):
+  model = RecurringLine
+  formset = RecurringLineFormset
+  autocomplete_fields = ('account',)
+
+class RecurringTemplateAdmin(admin.ModelAdmin):
+  list_display = ('name', 'voucher_type', 'frequency', 'next_date', 'end_date', 'active')
+  list_filter = ('active', 'frequency', 'voucher_type')
+  readonly_fields = ('generated', 'next_date')
+  inlines = [RecurringLineInline]
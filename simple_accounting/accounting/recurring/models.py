@@ -0,0 +1,80 @@
+import calendar
+from django.db import models
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from accounting.fields import MinorUnitAmountField
+from accounting.account.models import Account
+from accounting.voucher.models import VoucherType, Voucher
+
+def add_months(day: date, months: int) -> date:
+  """same day of month `months` later, clamped to the end of shorter months"""
+  month = day.month - 1 + months
+  year, month = day.year + month // 12, month % 12 + 1
+  return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+class RecurringTemplate(models.Model):
+  """A voucher to post every `interval` periods from start_date until end_date"""
+
+  class Frequencies(models.IntegerChoices):
+    WEEKLY = 1
+    MONTHLY = 2
+    QUARTERLY = 3
+    YEARLY = 4
+
+  name: str = models.CharField(max_length=128)
+  voucher_type: VoucherType = models.ForeignKey(VoucherType, on_delete=models.CASCADE, related_name='+')
+  description: str = models.TextField(blank=True)
+  frequency: int = models.IntegerField(choices=Frequencies.choices, default=Frequencies.MONTHLY)
+  interval: int = models.PositiveIntegerField(default=1)
+  start_date: date = models.DateField()
+  end_date: date = models.DateField(null=True, blank=True)
+  status: int = models.IntegerField(choices=Voucher.Status.choices, default=Voucher.Status.APPROVED)
+  # occurrences already posted, and the date of the next one (empty once finished)
+  generated: int = models.PositiveIntegerField(default=0, editable=False)
+  next_date: date = models.DateField(null=True, blank=True, editable=False)
+  active: bool = models.BooleanField(default=True)
+  created_at: datetime = models.DateTimeField(auto_now_add=True)
+  updated_at: datetime = models.DateTimeField(auto_now=True)
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['active', 'next_date']),
+    ]
+
+  def occurrence(self, index: int) -> date:
+    """date of the index-th occurrence, counted from start_date so month ends do not drift"""
+    step = index * self.interval
+    if self.frequency == self.Frequencies.WEEKLY:
+      return self.start_date + timedelta(weeks=step)
+    months = {self.Frequencies.MONTHLY: 1, self.Frequencies.QUARTERLY: 3, self.Frequencies.YEARLY: 12}[self.frequency]
+    return add_months(self.start_date, step * months)
+
+  def schedule(self):
+    """sets next_date from the occurrences generated so far"""
+    upcoming = self.occurrence(self.generated)
+    self.next_date = upcoming if self.end_date is None or upcoming <= self.end_date else None
+
+  def save(self, **kwargs):
+    self.schedule()
+    super(RecurringTemplate, self).save(**kwargs)
+
+  def __str__(self):
+    return self.name
+
+class RecurringLine(models.Model):
+
+  template: RecurringTemplate = models.ForeignKey(RecurringTemplate, on_delete=models.CASCADE, related_name='lines')
+  account: Account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='+')
+  amount: Decimal = MinorUnitAmountField()
+
+class RecurringOccurrence(models.Model):
+  """The voucher posted for one occurrence; unique per template and date so reruns never post twice"""
+
+  template: RecurringTemplate = models.ForeignKey(RecurringTemplate, on_delete=models.CASCADE, related_name='occurrences')
+  date: date = models.DateField()
+  voucher: Voucher = models.OneToOneField(Voucher, on_delete=models.SET_NULL, null=True, related_name='recurring_occurrence')
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=['template', 'date'], name='unique_recurring_occurrence'),
+    ]
@@ -0,0 +1,44 @@
+from collections import Counter
+from datetime import date
+from django.db import transaction
+from accounting.voucher.models import Voucher, Ledger
+from accounting.voucher.posting import post_vouchers
+from .models import RecurringTemplate, RecurringLine, RecurringOccurrence
+
+def generate(up_to: date, batch_size: int = 1000) -> Counter:
+  """
+  Posts every occurrence due on or before `up_to` in one transaction, with
+  bulk inserts and one voucher number block per voucher type. Templates are
+  locked while they are advanced, and the unique (template, date) occurrence
+  makes a concurrent or repeated run fail instead of posting twice.
+  Returns the number of vouchers posted per template id.
+  """
+  posted = Counter()
+  with transaction.atomic():
+    templates = list(
+      RecurringTemplate.objects
+        .select_for_update()
+        .filter(active=True, next_date__lte=up_to)
+        .order_by('pk')
+    )
+    lines = {template.pk: [] for template in templates}
+    for line in RecurringLine.objects.filter(template__in=templates).order_by('pk'):
+      lines[line.template_id].append(line)
+    entries, occurrences = [], []
+    for template in templates:
+      while template.next_date is not None and template.next_date <= up_to:
+        voucher = Voucher(
+          voucher_date=template.next_date,
+          voucher_type_id=template.voucher_type_id,
+          description=template.description or template.name,
+          status=template.status,
+        )
+        entries.append((voucher, [Ledger(account_id=line.account_id, amount=line.amount) for line in lines[template.pk]]))
+        occurrences.append(RecurringOccurrence(template=template, date=template.next_date, voucher=voucher))
+        posted[template.pk] += 1
+        template.generated += 1
+        template.schedule()
+    post_vouchers(entries, batch_size=batch_size, check_duplicates=False)
+    RecurringOccurrence.objects.bulk_create(occurrences, batch_size=batch_size)
+    RecurringTemplate.objects.bulk_update(templates, ['generated', 'next_date'], batch_size=batch_size)
+  return posted
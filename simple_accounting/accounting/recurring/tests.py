@@ -0,0 +1,65 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import TestCase
+from accounting.currency.rates import RateTable
+from accounting.models import Account, VoucherType, Voucher, Ledger, RecurringTemplate, RecurringLine
+from .scheduler import generate
+
+class RecurringTemplateTest(TestCase):
+
+  def setUp(self):
+    self.rent = Account(name="Rent", account_number="5.1", account_type=Account.AccountTypes.EXPENSE)
+    self.bank = Account(name="Bank", account_number="1.1", account_type=Account.AccountTypes.ASSET)
+    self.rent.save()
+    self.bank.save()
+    self.vtype = VoucherType(name="Journal", prefix="JV")
+    self.vtype.save()
+
+  def template(self, start, **kwargs):
+    template = RecurringTemplate(name="Rent", voucher_type=self.vtype, start_date=start, **kwargs)
+    template.save()
+    RecurringLine.objects.create(template=template, account=self.rent, amount=1500)
+    RecurringLine.objects.create(template=template, account=self.bank, amount=-1500)
+    return template
+
+  def test_posts_due_vouchers_once(self):
+    """due occurrences are posted with consecutive numbers and reruns post nothing"""
+    Voucher(voucher_date="2022-01-01", voucher_type=self.vtype).save()
+    template = self.template(date(2022, 1, 31))
+    call_command('generate_recurring', '--up-to', '2022-04-15', stdout=StringIO())
+    vouchers = Voucher.objects.filter(recurring_occurrence__template=template).order_by('voucher_date')
+    self.assertEqual(
+      [(voucher.voucher_number, voucher.voucher_date) for voucher in vouchers],
+      [('JV-0002', date(2022, 1, 31)), ('JV-0003', date(2022, 2, 28)), ('JV-0004', date(2022, 3, 31))],
+    )
+    self.assertEqual(Ledger.objects.filter(voucher__in=vouchers).count(), 6)
+    self.assertEqual(vouchers[0].amount, Decimal(1500))
+    self.assertEqual(generate(date(2022, 4, 15)), {})
+    template.refresh_from_db()
+    self.assertEqual((template.generated, template.next_date), (3, date(2022, 4, 30)))
+    voucher = Voucher(voucher_date="2022-05-01", voucher_type=self.vtype)
+    voucher.save()
+    self.assertEqual(voucher.voucher_number, 'JV-0005')
+
+  def test_stops_at_end_date(self):
+    """no occurrence is posted after the end date"""
+    template = self.template(date(2022, 1, 1), frequency=RecurringTemplate.Frequencies.QUARTERLY, end_date=date(2022, 6, 30))
+    self.assertEqual(generate(date(2023, 1, 1)), {template.pk: 2})
+    template.refresh_from_db()
+    self.assertIsNone(template.next_date)
+
+  def test_batches_many_templates(self):
+    """the number of queries does not grow with templates or occurrences"""
+    Voucher(voucher_date="2022-01-01", voucher_type=self.vtype).save()
+    cache.clear()
+    RateTable.current()
+    for _ in range(3):
+      self.template(date(2022, 1, 1))
+    with self.assertNumQueries(21):
+      generate(date(2022, 12, 31))
+    self.template(date(2022, 1, 1))
+    with self.assertNumQueries(21):
+      self.assertEqual(sum(generate(date(2023, 3, 31)).values()), 3 * 3 + 15)
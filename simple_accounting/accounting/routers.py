@@ -0,0 +1,170 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS, DatabaseError
+
+_reporting = ContextVar('accounting_reporting', default=False)
+_state = ContextVar('accounting_replica_state', default=None)
+_loading = ContextVar('accounting_bulk_load', default=None)
+
+class ReplicaState:
+
+  __slots__ = ('pinned', 'wrote')
+
+  def __init__(self, pinned: bool = False):
+    self.pinned = pinned
+    self.wrote = False
+
+def replica_alias() -> str:
+  return getattr(settings, 'ACCOUNTING_REPLICA_ALIAS', 'reporting')
+
+def bulk_load_alias() -> str:
+  """
+  The alias accounting.voucher.loader runs on: ACCOUNTING_BULK_LOAD_ALIAS
+  when it is configured, default when it isn't or when the caller's
+  transaction on default holds rows the load has to see. Inside
+  `bulk_loads()` it is the alias of the running load.
+  """
+  if _loading.get():
+    return _loading.get()
+  alias = getattr(settings, 'ACCOUNTING_BULK_LOAD_ALIAS', 'bulk_load')
+  if alias not in connections.databases or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+    return DEFAULT_DB_ALIAS
+  return alias
+
+def current_state() -> ReplicaState:
+  """
+  The state of the running request. Outside replica_state() a throwaway one,
+  so writes of commands and workers don't pin the process to default.
+  """
+  state = _state.get()
+  return ReplicaState() if state is None else state
+
+@contextmanager
+def replica_state(pinned: bool = False):
+  token = _state.set(ReplicaState(pinned))
+  try:
+    yield _state.get()
+  finally:
+    _state.reset(token)
+
+@contextmanager
+def reporting_reads():
+  token = _reporting.set(True)
+  try:
+    yield
+  finally:
+    _reporting.reset(token)
+
+@contextmanager
+def bulk_loads(alias: str):
+  """sends every accounting read and write to `alias` while loading"""
+  token = _loading.set(alias)
+  try:
+    yield
+  finally:
+    _loading.reset(token)
+
+def reporting(func):
+  @wraps(func)
+  def _func(*args, **kwargs):
+    with reporting_reads():
+      return func(*args, **kwargs)
+  return _func
+
+class ReportingRouter:
+  """
+  Sends reads made inside `reporting_reads()` to the replica alias.
+  Reads fall back to default once the current request (or session, see
+  ReplicaStickinessMiddleware) has written accounting data, or when the
+  replica lags more than ACCOUNTING_REPLICA_MAX_LAG seconds. Inside
+  `bulk_loads()` accounting reads and writes go to the bulk load alias.
+  """
+
+  _lag = None
+  _lag_checked_at = 0.0
+
+  def db_for_read(self, model, **hints):
+    if _loading.get() and model._meta.app_label == 'accounting':
+      return _loading.get()
+    if not _reporting.get():
+      return None
+    state = _state.get()
+    if state is not None and state.pinned:
+      return DEFAULT_DB_ALIAS
+    if not self.replica_usable():
+      return DEFAULT_DB_ALIAS
+    return replica_alias()
+
+  def db_for_write(self, model, **hints):
+    if model._meta.app_label == 'accounting':
+      state = current_state()
+      state.pinned = True
+      state.wrote = True
+      if _loading.get():
+        return _loading.get()
+    return DEFAULT_DB_ALIAS
+
+  def allow_relation(self, obj1, obj2, **hints):
+    aliases = {DEFAULT_DB_ALIAS, replica_alias(), getattr(settings, 'ACCOUNTING_BULK_LOAD_ALIAS', 'bulk_load')}
+    if obj1._state.db in aliases and obj2._state.db in aliases:
+      return True
+    return None
+
+  def replica_usable(self) -> bool:
+    alias = replica_alias()
+    if alias not in connections.databases or self.replica_is_primary():
+      return False
+    return self.replica_lag() <= getattr(settings, 'ACCOUNTING_REPLICA_MAX_LAG', 5)
+
+  def replica_is_primary(self) -> bool:
+    # a replica alias pointing at the primary (or mirroring it in tests) gains nothing
+    primary = connections.databases[DEFAULT_DB_ALIAS]
+    replica = connections.databases[replica_alias()]
+    keys = ('ENGINE', 'NAME', 'HOST', 'PORT')
+    return all(str(primary.get(key, '')) == str(replica.get(key, '')) for key in keys)
+
+  def replica_lag(self) -> float:
+    now = time.monotonic()
+    interval = getattr(settings, 'ACCOUNTING_REPLICA_LAG_CHECK_INTERVAL', 5)
+    if ReportingRouter._lag is None or now - ReportingRouter._lag_checked_at >= interval:
+      ReportingRouter._lag = self.measure_lag()
+      ReportingRouter._lag_checked_at = now
+    return ReportingRouter._lag
+
+  def measure_lag(self) -> float:
+    connection = connections[replica_alias()]
+    if connection.vendor != 'mysql':
+      return 0.0
+    try:
+      with connection.cursor() as cursor:
+        for statement, column in (('SHOW REPLICA STATUS', 'Seconds_Behind_Source'), ('SHOW SLAVE STATUS', 'Seconds_Behind_Master')):
+          try:
+            cursor.execute(statement)
+          except DatabaseError:
+            continue
+          row = cursor.fetchone()
+          if row is None:
+            # not configured as a replica, nothing to wait for
+            return 0.0
+          columns = [col[0] for col in cursor.description]
+          lag = row[columns.index(column)]
+          return float('inf') if lag is None else float(lag)
+    except DatabaseError:
+      pass
+    return float('inf')
+
+class ReplicaChangelistMixin:
+  """Serves GET changelists from the reporting replica."""
+
+  def changelist_view(self, request, extra_context=None):
+    if request.method != 'GET':
+      return super().changelist_view(request, extra_context)
+    with reporting_reads():
+      response = super().changelist_view(request, extra_context)
+      # render while still routed, list_display callables query lazily
+      if hasattr(response, 'render'):
+        response.render()
+      return response
@@ -0,0 +1,252 @@
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from decimal import Decimal
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional
+from django.db import connections, transaction
+from accounting.fields import AMOUNT_DECIMAL_PLACES, from_minor
+from accounting.routers import reporting
+from accounting.account.tree import AccountTree
+from accounting.voucher.models import Voucher, Ledger
+from accounting.archive.models import Archive, ArchivedLedger
+
+MAGIC = b'SALEDGER'
+VERSION = 1
+# magic, version, byte order, decimal places, records, dictionary length
+HEADER = struct.Struct('<8sHcBQQ')
+# column typecode, item size; the file holds one contiguous array per column
+COLUMNS = (('amounts', 'q'), ('vouchers', 'q'), ('dates', 'i'), ('accounts', 'I'))
+BYTE_ORDER = b'<' if sys.byteorder == 'little' else b'>'
+COPY_CHUNK = 1 << 20
+
+def _aligned(offset: int) -> int:
+  return offset + (-offset % 8)
+
+def _copy(source: mmap.mmap, start: int, end: int, target):
+  while start < end:
+    stop = min(start + COPY_CHUNK, end)
+    target.write(source[start:stop])
+    start = stop
+
+@contextmanager
+def _consistent_read(alias: str):
+  """one transaction whose reads all see the same snapshot of the database"""
+  connection = connections[alias]
+  outermost = not connection.in_atomic_block
+  with transaction.atomic(using=alias):
+    if outermost and connection.vendor in ('mysql', 'postgresql'):
+      with connection.cursor() as cursor:
+        cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+    yield
+
+def _rows(as_of: Optional[date], statuses: Iterable[int], batch_size: int) -> Iterator[tuple]:
+  """(account id, date, minor amount, voucher id) of live and archived ledgers, by account then date"""
+  sources = [Ledger.objects.exclude(voucher__in=Archive.voucher_ids())]
+  if Archive.latest_cutoff() is not None:
+    sources.append(ArchivedLedger.objects.all())
+  streams = []
+  for ledgers in sources:
+    ledgers = ledgers.filter(voucher__status__in=list(statuses))
+    if as_of is not None:
+      ledgers = ledgers.filter(voucher__voucher_date__lte=as_of)
+    streams.append(
+      ledgers
+        .order_by('account_id', 'voucher__voucher_date', 'id')
+        .values_list('account_id', 'voucher__voucher_date', 'amount__minor', 'voucher_id')
+        .iterator(chunk_size=batch_size)
+    )
+  return heapq.merge(*streams, key=lambda row: row[:2])
+
+@reporting
+def write_snapshot(path: str, as_of: date = None, statuses: Iterable[int] = (Voucher.Status.APPROVED,), batch_size: int = 100000) -> int:
+  """
+  Dumps ledger facts to `path`: a header, a JSON account dictionary, then the
+  amount (minor units), voucher id, date ordinal and account index columns.
+  Records are ordered by account in chart preorder, then date, so one account,
+  one subtree or one date range of an account is a contiguous slice. Archived
+  ledgers are read instead of carry-forward vouchers, so the history is whole.
+  The chart and the ledgers are read from the reporting replica in one
+  REPEATABLE READ transaction.
+  Returns the number of records.
+  """
+  counts: Dict[int, int] = {}
+  with tempfile.TemporaryDirectory() as scratch:
+    # first pass: columns in account id order, into scratch files
+    scratch_files = {name: open(os.path.join(scratch, name), 'w+b') for name, _ in COLUMNS[:3]}
+    try:
+      buffers = {name: array(typecode) for name, typecode in COLUMNS[:3]}
+      def flush():
+        for name, buffer in buffers.items():
+          buffer.tofile(scratch_files[name])
+          del buffer[:]
+      with _consistent_read(Ledger.objects.db):
+        tree = AccountTree.build()
+        for account_id, voucher_date, amount, voucher_id in _rows(as_of, statuses, batch_size):
+          # posted to an account created after the tree was read
+          if account_id not in tree.positions:
+            continue
+          counts[account_id] = counts.get(account_id, 0) + 1
+          buffers['amounts'].append(amount)
+          buffers['vouchers'].append(voucher_id)
+          buffers['dates'].append(voucher_date.toordinal())
+          if len(buffers['amounts']) >= batch_size:
+            flush()
+      flush()
+      # second pass: copy each account segment into its preorder place
+      scratch_starts, running = {}, 0
+      for account_id in sorted(counts):
+        scratch_starts[account_id] = running
+        running += counts[account_id]
+      total = running
+      offsets, running = [], 0
+      for account_id in tree.ids:
+        offsets.append(running)
+        running += counts.get(account_id, 0)
+      offsets.append(running)
+      dictionary = json.dumps({
+        'accounts': [
+          [account_id, tree.ids[tree.parents[position]] if tree.parents[position] >= 0 else None, tree.types[position], tree.numbers[position]]
+          for position, account_id in enumerate(tree.ids)
+        ],
+        'offsets': offsets,
+        'as_of': as_of.isoformat() if as_of else None,
+        'statuses': [int(status) for status in statuses],
+      }, separators=(',', ':')).encode()
+      with open(path, 'wb') as target:
+        target.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER, AMOUNT_DECIMAL_PLACES, total, len(dictionary)))
+        target.write(dictionary)
+        for name, typecode in COLUMNS:
+          target.write(b'\0' * (-target.tell() % 8))
+          size = array(typecode).itemsize
+          if name == 'accounts':
+            for position, account_id in enumerate(tree.ids):
+              remaining = counts.get(account_id, 0)
+              while remaining:
+                chunk = min(remaining, batch_size)
+                (array(typecode, [position]) * chunk).tofile(target)
+                remaining -= chunk
+            continue
+          if not total:
+            continue
+          scratch_file = scratch_files[name]
+          scratch_file.flush()
+          with mmap.mmap(scratch_file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            for account_id in tree.ids:
+              if account_id in counts:
+                start = scratch_starts[account_id] * size
+                _copy(source, start, start + counts[account_id] * size, target)
+    finally:
+      for scratch_file in scratch_files.values():
+        scratch_file.close()
+  return total
+
+class LedgerSnapshot:
+  """
+  Read side of write_snapshot. The file is memory mapped and its columns are
+  memoryviews over the map, so nothing is loaded up front and queries only
+  touch the pages of the slices they sum.
+  """
+
+  def __init__(self, path: str):
+    self.file = open(path, 'rb')
+    self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, byte_order, decimal_places, count, dictionary_length = HEADER.unpack_from(self.map, 0)
+    if magic != MAGIC or version != VERSION:
+      self.close()
+      raise ValueError(f'{path} is not a ledger snapshot')
+    if byte_order != BYTE_ORDER:
+      self.close()
+      raise ValueError(f'{path} was written with another byte order')
+    self.decimal_places = decimal_places
+    self.count = count
+    dictionary = json.loads(self.map[HEADER.size:HEADER.size + dictionary_length])
+    self.as_of = date.fromisoformat(dictionary['as_of']) if dictionary['as_of'] else None
+    self.tree = AccountTree(dictionary['accounts'])
+    if list(self.tree.ids) != [row[0] for row in dictionary['accounts']]:
+      self.close()
+      raise ValueError(f'{path} has an inconsistent account dictionary')
+    self.offsets = array('q', dictionary['offsets'])
+    self._views = []
+    offset = HEADER.size + dictionary_length
+    view = memoryview(self.map)
+    self._views.append(view)
+    for name, typecode in COLUMNS:
+      offset = _aligned(offset)
+      size = array(typecode).itemsize * count
+      column = view[offset:offset + size].cast(typecode)
+      self._views.append(column)
+      setattr(self, name, column)
+      offset += size
+
+  def close(self):
+    for view in getattr(self, '_views', ()):
+      view.release()
+    self._views = []
+    self.map.close()
+    self.file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def _slice(self, position: int, start: Optional[date], end: Optional[date]):
+    low, high = self.offsets[position], self.offsets[position + 1]
+    if start is not None and low < high:
+      low = bisect_left(self.dates, start.toordinal(), low, high)
+    if end is not None and low < high:
+      high = bisect_right(self.dates, end.toordinal(), low, high)
+    return low, high
+
+  def _positions(self, account_id: int, subtree: bool):
+    position = self.tree.positions[account_id]
+    return range(position, self.tree.ends[position] if subtree else position + 1)
+
+  def _decimal(self, minor: int) -> Decimal:
+    return from_minor(minor, self.decimal_places)
+
+  def balance(self, account_id: int, start: date = None, end: date = None, subtree: bool = False) -> Decimal:
+    """sum of the account (and its descendants with subtree) between start and end inclusive"""
+    positions = self._positions(account_id, subtree)
+    if start is None and end is None:
+      # the whole subtree is one slice
+      return self._decimal(sum(self.amounts[self.offsets[positions.start]:self.offsets[positions.stop]]))
+    total = 0
+    for position in positions:
+      low, high = self._slice(position, start, end)
+      total += sum(self.amounts[low:high])
+    return self._decimal(total)
+
+  def balances(self, start: date = None, end: date = None) -> Dict[int, Decimal]:
+    """non zero sums per account"""
+    result = {}
+    for position, account_id in enumerate(self.tree.ids):
+      low, high = self._slice(position, start, end)
+      if low < high:
+        total = sum(self.amounts[low:high])
+        if total:
+          result[account_id] = self._decimal(total)
+    return result
+
+  def by_period(self, account_id: int = None, start: date = None, end: date = None, subtree: bool = True) -> Dict[date, Decimal]:
+    """sums per month, of one account or subtree, or of everything"""
+    positions = range(len(self.tree)) if account_id is None else self._positions(account_id, subtree)
+    totals: Dict[date, int] = {}
+    for position in positions:
+      low, high = self._slice(position, start, end)
+      while low < high:
+        first = date.fromordinal(self.dates[low]).replace(day=1)
+        following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+        stop = bisect_left(self.dates, following.toordinal(), low, high)
+        totals[first] = totals.get(first, 0) + sum(self.amounts[low:stop])
+        low = stop
+    return {period: self._decimal(totals[period]) for period in sorted(totals)}
@@ -0,0 +1,53 @@
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from accounting.models import Account, Voucher
+from accounting.testing import LedgerTestCase
+from .ledger import write_snapshot, LedgerSnapshot
+
+class LedgerSnapshotTest(LedgerTestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.bank = self.account("Bank", "1.2", Account.AccountTypes.ASSET, self.assets)
+    self.post("2022-01-05", (self.cash, "10.25"), (self.sales, "10.25"))
+    self.post("2022-01-20", (self.bank, 100), (self.sales, 100))
+    self.post("2022-02-03", (self.cash, 5), (self.sales, 5))
+    self.post("2022-02-04", (self.cash, 999), (self.sales, 999), status=Voucher.Status.PENDING)
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    self.path = os.path.join(directory.name, 'ledger.snapshot')
+
+  def test_queries_match_the_ledger(self):
+    """account, subtree and period sums come from the mapped file"""
+    self.assertEqual(write_snapshot(self.path, batch_size=2), 6)
+    with LedgerSnapshot(self.path) as snapshot:
+      self.assertEqual(snapshot.balance(self.cash.pk), Decimal('15.25'))
+      self.assertEqual(snapshot.balance(self.assets.pk, subtree=True), Decimal('115.25'))
+      self.assertEqual(snapshot.balance(self.assets.pk, start=date(2022, 1, 10), subtree=True), Decimal(105))
+      self.assertEqual(snapshot.balances(end=date(2022, 1, 31)), {
+        self.cash.pk: Decimal('10.25'), self.bank.pk: Decimal(100), self.sales.pk: Decimal('110.25'),
+      })
+      self.assertEqual(snapshot.by_period(self.assets.pk), {
+        date(2022, 1, 1): Decimal('110.25'), date(2022, 2, 1): Decimal(5),
+      })
+      self.assertEqual(set(snapshot.vouchers), set(Voucher.objects.filter(status=Voucher.Status.APPROVED).values_list('pk', flat=True)))
+
+  def test_as_of_and_empty_snapshots(self):
+    """as_of cuts off later vouchers and empty snapshots still open"""
+    write_snapshot(self.path, as_of=date(2022, 1, 10))
+    with LedgerSnapshot(self.path) as snapshot:
+      self.assertEqual(snapshot.as_of, date(2022, 1, 10))
+      self.assertEqual(snapshot.balance(self.assets.pk, subtree=True), Decimal('10.25'))
+    write_snapshot(self.path, as_of=date(2021, 1, 1))
+    with LedgerSnapshot(self.path) as snapshot:
+      self.assertEqual(snapshot.count, 0)
+      self.assertEqual(snapshot.balances(), {})
+
+  def test_rejects_other_files(self):
+    """files without the snapshot header are refused"""
+    with open(self.path, 'wb') as file:
+      file.write(b'\0' * 64)
+    with self.assertRaises(ValueError):
+      LedgerSnapshot(self.path)
@@ -0,0 +1,200 @@
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from django.db import models
+from accounting.account.models import Account
+from accounting.account.tree import AccountTree
+from accounting.voucher.models import Voucher, Ledger
+from accounting.closing.models import YearClosing
+from accounting.archive.models import Archive, ArchivedLedger
+
+class StatementLine(NamedTuple):
+  label: str
+  amounts: Tuple[Decimal, ...]
+  account_id: Optional[int] = None
+  account_number: str = ''
+  depth: int = 0
+  total: bool = False
+
+class StatementSection(NamedTuple):
+  title: str
+  lines: List[StatementLine]
+  total: StatementLine
+
+class Statement(NamedTuple):
+  title: str
+  columns: Tuple[str, ...]
+  sections: List[StatementSection]
+  summary: List[StatementLine]
+
+  def to_dict(self) -> dict:
+    def line(item: StatementLine):
+      return {
+        'label': item.label,
+        'account_id': item.account_id,
+        'account_number': item.account_number or None,
+        'depth': item.depth,
+        'amounts': dict(zip(self.columns, item.amounts)),
+      }
+    return {
+      'title': self.title,
+      'columns': list(self.columns),
+      'sections': [
+        {'title': section.title, 'lines': [line(item) for item in section.lines], 'total': line(section.total)}
+        for section in self.sections
+      ],
+      'summary': [line(item) for item in self.summary],
+    }
+
+  def rows(self):
+    """flat (section, account number, label, *amounts) rows, e.g. for CSV"""
+    yield ('section', 'account_number', 'label', *self.columns)
+    for section in self.sections:
+      for item in section.lines:
+        yield (section.title, item.account_number, '  ' * item.depth + item.label, *item.amounts)
+      yield (section.title, '', section.total.label, *section.total.amounts)
+    for item in self.summary:
+      yield ('', '', item.label, *item.amounts)
+
+class StatementBuilder:
+  """
+  Computes every account of a statement from one grouped query: ledgers of
+  approved vouchers are summed per account with one conditional aggregate
+  per column, then rolled up the account hierarchy with AccountTree.
+  """
+
+  title = ''
+  section_types: Sequence[Tuple[str, int]] = ()
+  # periodic statements leave out year-end closing entries
+  exclude_closing = False
+
+  def __init__(self, columns: Sequence[Tuple[str, Optional[date], date]], tree: AccountTree = None):
+    # columns are (label, first day or None for everything before, last day)
+    self.columns = list(columns)
+    self.tree = tree
+
+  def column_filter(self, start: Optional[date], end: date, prefix: str = 'voucher__voucher_date'):
+    condition = models.Q(**{f'{prefix}__lte': end})
+    if start is not None:
+      condition &= models.Q(**{f'{prefix}__gte': start})
+    return condition
+
+  def restrict(self, ledgers):
+    if self.exclude_closing:
+      ledgers = ledgers.exclude(voucher__in=YearClosing.voucher_ids())
+    earliest = [start for _, start, _ in self.columns]
+    if None not in earliest:
+      ledgers = ledgers.filter(voucher__voucher_date__gte=min(earliest))
+    return ledgers.filter(voucher__status=Voucher.Status.APPROVED, voucher__voucher_date__lte=max(end for _, _, end in self.columns))
+
+  def balances(self) -> List[Dict[int, Decimal]]:
+    # columns reaching before the archive cutoff read archived ledgers instead of carry-forward vouchers
+    cutoff = Archive.latest_cutoff()
+    archived = [Archive.spans(start, end, cutoff) for _, start, end in self.columns]
+    aggregates = {}
+    for i, (_, start, end) in enumerate(self.columns):
+      condition = self.column_filter(start, end)
+      if archived[i]:
+        condition &= ~models.Q(voucher__in=Archive.voucher_ids())
+      aggregates[f'column_{i}'] = models.Sum('amount', filter=condition)
+    result = [{} for _ in self.columns]
+    self.add(result, self.restrict(Ledger.objects.all()), aggregates)
+    if any(archived):
+      aggregates = {
+        f'column_{i}': models.Sum('amount', filter=self.column_filter(start, end))
+        for i, (_, start, end) in enumerate(self.columns) if archived[i]
+      }
+      self.add(result, self.restrict(ArchivedLedger.objects.all()), aggregates)
+    return result
+
+  def add(self, result, ledgers, aggregates):
+    for row in ledgers.values('account_id').annotate(**aggregates).order_by():
+      for name, total in row.items():
+        if name != 'account_id' and total:
+          column = result[int(name[len('column_'):])]
+          column[row['account_id']] = column.get(row['account_id'], 0) + total
+
+  def build(self) -> Statement:
+    tree = self.tree if self.tree is not None else AccountTree.current()
+    columns = [tree.rollup(values, Decimal(0)).totals() for values in self.balances()]
+    names = dict(Account.objects.values_list('id', 'name'))
+    sections = []
+    for title, account_type in self.section_types:
+      lines = []
+      for position, account_id in enumerate(tree.ids):
+        if tree.types[position] != account_type:
+          continue
+        amounts = tuple(column[account_id] for column in columns)
+        if not any(amounts):
+          continue
+        lines.append(StatementLine(
+          names.get(account_id, ''), amounts, account_id, tree.numbers[position], tree.depth(account_id),
+        ))
+      roots = [line for line in lines if tree.parent(line.account_id) is None]
+      total = tuple(sum((line.amounts[i] for line in roots), Decimal(0)) for i in range(len(columns)))
+      sections.append(StatementSection(title, lines, StatementLine(f'Total {title}', total, total=True)))
+    return Statement(self.title, tuple(label for label, _, _ in self.columns), sections, self.summary(sections, columns, tree))
+
+  def summary(self, sections, columns, tree) -> List[StatementLine]:
+    return []
+
+def _type_total(columns, tree: AccountTree, account_type: int) -> Tuple[Decimal, ...]:
+  roots = [
+    account_id for position, account_id in enumerate(tree.ids)
+    if tree.parents[position] < 0 and tree.types[position] == account_type
+  ]
+  return tuple(sum((column[account_id] for account_id in roots), Decimal(0)) for column in columns)
+
+class BalanceSheet(StatementBuilder):
+
+  title = 'Balance Sheet'
+  section_types = (
+    ('Assets', Account.AccountTypes.ASSET),
+    ('Liabilities', Account.AccountTypes.LIABILITY),
+    ('Equity', Account.AccountTypes.EQUITY),
+  )
+
+  def __init__(self, as_of: date, compare_as_of: date = None, tree: AccountTree = None):
+    columns = [(as_of.isoformat(), None, as_of)]
+    if compare_as_of:
+      columns.append((compare_as_of.isoformat(), None, compare_as_of))
+    super().__init__(columns, tree)
+
+  def build(self) -> Statement:
+    statement = super().build()
+    # revenue and expense not yet closed into retained earnings still belong to equity
+    equity = statement.sections[2]
+    earnings = statement.summary[0]
+    if any(earnings.amounts):
+      equity.lines.append(earnings._replace(depth=0))
+      statement.sections[2] = equity._replace(total=equity.total._replace(
+        amounts=tuple(a + b for a, b in zip(equity.total.amounts, earnings.amounts))
+      ))
+    liabilities = statement.sections[1].total.amounts
+    total = tuple(a + b for a, b in zip(liabilities, statement.sections[2].total.amounts))
+    statement.summary[:] = [StatementLine('Total Liabilities and Equity', total, total=True)]
+    return statement
+
+  def summary(self, sections, columns, tree):
+    revenue = _type_total(columns, tree, Account.AccountTypes.REVENUE)
+    expense = _type_total(columns, tree, Account.AccountTypes.EXPENSE)
+    return [StatementLine('Current Earnings', tuple(r - e for r, e in zip(revenue, expense)))]
+
+class IncomeStatement(StatementBuilder):
+
+  title = 'Income Statement'
+  exclude_closing = True
+  section_types = (
+    ('Revenue', Account.AccountTypes.REVENUE),
+    ('Expenses', Account.AccountTypes.EXPENSE),
+  )
+
+  def __init__(self, start: date, end: date, compare_start: date = None, compare_end: date = None, tree: AccountTree = None):
+    columns = [(f'{start.isoformat()} - {end.isoformat()}', start, end)]
+    if compare_start and compare_end:
+      columns.append((f'{compare_start.isoformat()} - {compare_end.isoformat()}', compare_start, compare_end))
+    super().__init__(columns, tree)
+
+  def summary(self, sections, columns, tree):
+    revenue, expenses = sections[0].total.amounts, sections[1].total.amounts
+    return [StatementLine('Net Income', tuple(r - e for r, e in zip(revenue, expenses)), total=True)]
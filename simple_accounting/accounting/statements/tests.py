@@ -0,0 +1,65 @@
+import datetime
+import json
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from accounting.models import Account, Voucher
+from accounting.testing import LedgerTestCase
+from .builders import BalanceSheet, IncomeStatement
+
+class StatementTest(LedgerTestCase):
+
+  def setUp(self):
+    cache.clear()
+    super().setUp()
+    self.bank = self.account("Bank", "1.2", Account.AccountTypes.ASSET, self.assets)
+    self.loan = self.account("Loan", "2", Account.AccountTypes.LIABILITY)
+    self.capital = self.account("Capital", "3", Account.AccountTypes.EQUITY)
+    self.rent = self.account("Rent", "5", Account.AccountTypes.EXPENSE)
+    self.post("2021-06-01", (self.bank, 1000), (self.capital, 1000))
+    self.post("2021-07-01", (self.cash, 300), (self.sales, 300))
+    self.post("2022-02-01", (self.bank, 500), (self.loan, 500))
+    self.post("2022-03-01", (self.cash, 400), (self.sales, 400))
+    self.post("2022-03-02", (self.rent, 150), (self.bank, -150))
+    self.post("2022-03-03", (self.cash, 999), (self.sales, 999), status=Voucher.Status.PENDING)
+
+  def amounts(self, statement, label):
+    for section in statement.sections:
+      for line in section.lines + [section.total]:
+        if line.label == label:
+          return line.amounts
+    for line in statement.summary:
+      if line.label == label:
+        return line.amounts
+
+  def test_balance_sheet_rolls_up_and_balances(self):
+    """balance sheet rolls accounts up and includes unclosed earnings"""
+    with self.assertNumQueries(5):
+      statement = BalanceSheet(datetime.date(2022, 12, 31), datetime.date(2021, 12, 31)).build()
+    self.assertEqual(statement.sections[0].lines[0].label, 'Assets')
+    self.assertEqual(self.amounts(statement, 'Assets'), (Decimal(2050), Decimal(1300)))
+    self.assertEqual(self.amounts(statement, 'Cash'), (Decimal(700), Decimal(300)))
+    self.assertEqual(self.amounts(statement, 'Current Earnings'), (Decimal(550), Decimal(300)))
+    self.assertEqual(self.amounts(statement, 'Total Assets'), self.amounts(statement, 'Total Liabilities and Equity'))
+
+  def test_income_statement_compares_periods(self):
+    """income statement has current and comparative period from one query"""
+    statement = IncomeStatement(
+      datetime.date(2022, 1, 1), datetime.date(2022, 12, 31),
+      datetime.date(2021, 1, 1), datetime.date(2021, 12, 31),
+    ).build()
+    self.assertEqual(self.amounts(statement, 'Sales'), (Decimal(400), Decimal(300)))
+    self.assertEqual(self.amounts(statement, 'Rent'), (Decimal(150), Decimal(0)))
+    self.assertEqual(self.amounts(statement, 'Net Income'), (Decimal(250), Decimal(300)))
+
+  def test_renders_html_json_and_csv(self):
+    """statements render as html, json and csv"""
+    self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+    url = '/reports/balance-sheet/?as_of=2022-12-31'
+    self.assertContains(self.client.get(url), 'Total Liabilities and Equity')
+    data = json.loads(self.client.get(url + '&format=json').content)
+    self.assertEqual(data['sections'][0]['total']['amounts']['2022-12-31'], '2050.000000')
+    response = self.client.get('/reports/income-statement/?start=2022-01-01&end=2022-12-31&format=csv')
+    self.assertEqual(response['Content-Type'], 'text/csv')
+    self.assertIn('Net Income,250.000000', response.content.decode())
+    self.assertEqual(self.client.get('/reports/balance-sheet/?as_of=never').status_code, 400)
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'accounting_statements'
+
+urlpatterns = [
+  path('balance-sheet/', views.balance_sheet, name='balance_sheet'),
+  path('income-statement/', views.income_statement, name='income_statement'),
+]
@@ -0,0 +1,54 @@
+import csv
+from datetime import date
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest
+from django.shortcuts import render
+from django.utils import timezone
+from accounting.routers import reporting_reads
+from .builders import BalanceSheet, IncomeStatement, Statement
+
+def _date(request, name, default=None):
+  value = request.GET.get(name)
+  if not value:
+    return default
+  try:
+    return date.fromisoformat(value)
+  except ValueError:
+    raise ValueError(f'{name} must be a date (YYYY-MM-DD)')
+
+def render_statement(request, statement: Statement, filename: str):
+  output = request.GET.get('format', 'html')
+  if output == 'json':
+    return JsonResponse(statement.to_dict(), encoder=DjangoJSONEncoder)
+  if output == 'csv':
+    response = HttpResponse(content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    csv.writer(response).writerows(statement.rows())
+    return response
+  return render(request, 'accounting/statement.html', {'statement': statement, 'title': statement.title})
+
+@staff_member_required
+def balance_sheet(request):
+  try:
+    as_of = _date(request, 'as_of', timezone.localdate())
+    compare = _date(request, 'compare')
+  except ValueError as error:
+    return HttpResponseBadRequest(str(error))
+  with reporting_reads():
+    statement = BalanceSheet(as_of, compare).build()
+  return render_statement(request, statement, f'balance-sheet-{as_of}')
+
+@staff_member_required
+def income_statement(request):
+  today = timezone.localdate()
+  try:
+    end = _date(request, 'end', today)
+    start = _date(request, 'start', end.replace(month=1, day=1))
+    compare_start = _date(request, 'compare_start')
+    compare_end = _date(request, 'compare_end')
+  except ValueError as error:
+    return HttpResponseBadRequest(str(error))
+  with reporting_reads():
+    statement = IncomeStatement(start, end, compare_start, compare_end).build()
+  return render_statement(request, statement, f'income-statement-{start}-{end}')
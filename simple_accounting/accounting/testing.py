@@ -0,0 +1,25 @@
+from django.test import TestCase
+from accounting.models import Account, VoucherType, Voucher, Ledger
+
+class LedgerTestCase(TestCase):
+  """Base of tests that book vouchers: Cash under Assets, Sales, a journal voucher type and post()"""
+
+  def setUp(self):
+    self.assets = self.account("Assets", "1", Account.AccountTypes.ASSET)
+    self.cash = self.account("Cash", "1.1", Account.AccountTypes.ASSET, self.assets)
+    self.sales = self.account("Sales", "4.1", Account.AccountTypes.REVENUE)
+    self.vtype = VoucherType(name="Journal", prefix="JV")
+    self.vtype.save()
+
+  def account(self, name, number, account_type, parent=None, **fields):
+    account = Account(name=name, account_number=number, account_type=account_type, parent=parent, **fields)
+    account.save()
+    return account
+
+  def post(self, on, *lines, status=Voucher.Status.APPROVED):
+    """a voucher of (account, amount) lines, saved one by one like the admin does"""
+    voucher = Voucher(voucher_date=on, voucher_type=self.vtype, status=status)
+    voucher.save()
+    for account, amount in lines:
+      Ledger(voucher=voucher, account=account, amount=amount).save()
+    return voucher
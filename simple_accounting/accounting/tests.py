@@ -12,3 +12,88 @@ class ComplianceTest(unittest.TestCase):
     except ComplianceError:
       self.fail('Compliance raised error even when compliance is met')
     self.assertRaises(ComplianceError, a, __v=2)
+
+class ReplicaRouterTest(unittest.TestCase):
+
+  def make_router(self, lag=0.0, same_database=False):
+    from .routers import ReportingRouter
+    class Router(ReportingRouter):
+      def replica_is_primary(self):
+        return same_database
+      def replica_lag(self):
+        return lag
+    return Router()
+
+  def test_reads_stay_on_default_outside_reporting(self):
+    """reads outside reporting_reads() are not routed"""
+    from .models import Account
+    from .routers import replica_state
+    with replica_state():
+      self.assertIsNone(self.make_router().db_for_read(Account))
+
+  def test_reporting_reads_go_to_replica(self):
+    """reporting reads go to the replica"""
+    from .models import Account
+    from .routers import reporting_reads, replica_state
+    with replica_state(), reporting_reads():
+      self.assertEqual(self.make_router().db_for_read(Account), 'reporting')
+
+  def test_reads_after_write_stick_to_default(self):
+    """reads after a posting in the same request use default"""
+    from .models import Account, Voucher
+    from .routers import reporting_reads, replica_state
+    router = self.make_router()
+    with replica_state() as state, reporting_reads():
+      self.assertEqual(router.db_for_write(Voucher), 'default')
+      self.assertTrue(state.wrote)
+      self.assertEqual(router.db_for_read(Account), 'default')
+
+  def test_writes_outside_requests_pin_nothing(self):
+    """a write outside replica_state() leaves later reporting reads on the replica"""
+    from .models import Account, Voucher
+    from .routers import reporting_reads
+    router = self.make_router()
+    self.assertEqual(router.db_for_write(Voucher), 'default')
+    with reporting_reads():
+      self.assertEqual(router.db_for_read(Account), 'reporting')
+
+  def test_session_stickiness_pins_reads(self):
+    """a recent posting in the session pins reads to default"""
+    import time
+    from django.test import RequestFactory
+    from .models import Account
+    from .middleware import ReplicaStickinessMiddleware
+    from .routers import reporting_reads
+    router = self.make_router()
+    seen = []
+    def view(request):
+      with reporting_reads():
+        seen.append(router.db_for_read(Account))
+    middleware = ReplicaStickinessMiddleware(view)
+    request = RequestFactory().get('/')
+    request.session = {ReplicaStickinessMiddleware.session_key: time.time()}
+    middleware(request)
+    request.session = {ReplicaStickinessMiddleware.session_key: time.time() - 3600}
+    middleware(request)
+    self.assertEqual(seen, ['default', 'reporting'])
+
+  def test_lagging_replica_falls_back_to_default(self):
+    """a lagging replica falls back to default"""
+    from .models import Account
+    from .routers import reporting_reads, replica_state
+    with replica_state(), reporting_reads():
+      self.assertEqual(self.make_router(lag=3600).db_for_read(Account), 'default')
+      self.assertEqual(self.make_router(same_database=True).db_for_read(Account), 'default')
+
+  def test_bulk_loads_use_the_load_alias(self):
+    """reads and writes of a bulk load go to its alias, an unconfigured alias falls back to default"""
+    from django.test import override_settings
+    from .models import Account, Voucher
+    from .routers import bulk_loads, bulk_load_alias, replica_state
+    router = self.make_router()
+    with override_settings(ACCOUNTING_BULK_LOAD_ALIAS='missing'):
+      self.assertEqual(bulk_load_alias(), 'default')
+    with replica_state(), bulk_loads('bulk_load'):
+      self.assertEqual(bulk_load_alias(), 'bulk_load')
+      self.assertEqual(router.db_for_read(Account), 'bulk_load')
+      self.assertEqual(router.db_for_write(Voucher), 'bulk_load')
@@ -1,4 +1,11 @@
+import hashlib
+import json
+import re
+import unicodedata
 from django.core.exceptions import ValidationError
+from django.db import models
+from accounting.fields import to_minor
+from accounting.metrics.registry import timed
 
 class ComplianceError(Exception):
   def __init__(self, current, expected):
@@ -6,9 +13,45 @@ class ComplianceError(Exception):
 
 def comply(version):
   def _comply(func):
+    measured = timed(func.__qualname__)(func)
     def _func(*args, __v=None, **kwargs):
       if __v != version:
         raise ComplianceError(__v, version)
-      return func(*args, **kwargs)
+      return measured(*args, **kwargs)
     return _func
   return _comply
+
+def keyset_after(queryset, field, value, pk):
+  """rows strictly after (value, pk) in (field, pk) order"""
+  if value is None:
+    return queryset.order_by(field, 'pk')
+  return queryset.filter(
+    models.Q(**{f'{field}__gt': value}) | models.Q(**{field: value, 'pk__gt': pk})
+  ).order_by(field, 'pk')
+
+def prefix_range(field: str, prefix: str) -> models.Q:
+  """
+  startswith as a range on field, which an index serves on every backend,
+  unlike LIKE 'prefix%' under case insensitive or non C collations
+  """
+  successor = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+  return models.Q(**{f'{field}__gte': prefix, f'{field}__lt': successor})
+
+def tokenize(text, max_length=64):
+  """lowercased, accent stripped word tokens of text, in order of first appearance"""
+  if not text:
+    return []
+  text = unicodedata.normalize('NFKD', str(text))
+  text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+  return list(dict.fromkeys(token[:max_length] for token in re.findall(r'\w+', text)))
+
+def fingerprint(voucher_date, voucher_type_id, lines):
+  """
+  sha256 of a voucher's date, type and sorted (account, amount) lines, equal
+  for vouchers with the same content; None without lines
+  """
+  lines = sorted((int(account_id), to_minor(amount)) for account_id, amount in lines)
+  if not lines:
+    return None
+  canonical = json.dumps([str(voucher_date), int(voucher_type_id), lines], separators=(',', ':'))
+  return hashlib.sha256(canonical.encode()).hexdigest()
@@ -1,6 +1,12 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import ValidationError
 from .models import Ledger
+from .posting import reverse_vouchers
+from .search import search_vouchers
 from .forms import VoucherTypeForm, VoucherForm, LedgerInlineFormset, LedgerForm
+from accounting.routers import ReplicaChangelistMixin
 
 class VoucherTypeAdmin(admin.ModelAdmin):
   form = VoucherTypeForm
@@ -9,9 +15,74 @@ class LedgerInline(admin.TabularInline):
   model = Ledger
   form = LedgerForm
   formset = LedgerInlineFormset
+  autocomplete_fields = ('account',)
+  # page links below the rows, ?ledgers_page=<n> edits another page
+  template = 'admin/accounting/voucher/ledger_inline.html'
 
-class VoucherAdmin(admin.ModelAdmin):
+  def get_formset(self, request, obj=None, **kwargs):
+    formset = super().get_formset(request, obj, **kwargs)
+    if obj is None or obj.pk is None:
+      return formset
+    return type(formset.__name__, (formset,), {
+      'page_size': getattr(settings, 'ACCOUNTING_LEDGER_PAGE_SIZE', 100),
+      'page_number': request.GET.get('ledgers_page', 1),
+    })
+
+  def has_add_permission(self, request, obj=None):
+    return not (obj and obj.locked) and super().has_add_permission(request, obj)
+
+  def has_change_permission(self, request, obj=None):
+    return not (obj and obj.locked) and super().has_change_permission(request, obj)
+
+  def has_delete_permission(self, request, obj=None):
+    return not (obj and obj.locked) and super().has_delete_permission(request, obj)
+
+class VoucherChangeList(ChangeList):
+
+  def get_ordering(self, request, queryset):
+    # keep the search ranking instead of the admin ordering
+    if self.query.strip():
+      return ['search_rank', '-voucher_date', '-pk']
+    return super().get_ordering(request, queryset)
+
+class VoucherAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
   list_display = ('__str__', 'voucher_date', 'amount')
   ordering = ('voucher_number',)
   inlines = [LedgerInline]
-  form = VoucherForm
\ No newline at end of file
+  form = VoucherForm
+  actions = ['reverse']
+  # matched through search_vouchers, never with LIKE scans
+  search_fields = ('voucher_number',)
+
+  def get_changelist(self, request, **kwargs):
+    return VoucherChangeList
+
+  def get_search_results(self, request, queryset, search_term):
+    if not search_term.strip():
+      return super().get_search_results(request, queryset, search_term)
+    return search_vouchers(search_term, queryset), False
+
+  def has_change_permission(self, request, obj=None):
+    # approved vouchers are shown read-only
+    return not (obj and obj.locked) and super().has_change_permission(request, obj)
+
+  def has_delete_permission(self, request, obj=None):
+    return not (obj and obj.locked) and super().has_delete_permission(request, obj)
+
+  def save_related(self, request, form, formsets, change):
+    super().save_related(request, form, formsets, change)
+    duplicates = [number for formset in formsets for number in getattr(formset, 'duplicates', ())]
+    if duplicates:
+      self.message_user(request, f'{form.instance} looks like a duplicate of {", ".join(duplicates)}', messages.WARNING)
+
+  @admin.action(description='Reverse selected approved vouchers', permissions=['add'])
+  def reverse(self, request, queryset):
+    try:
+      reversals = reverse_vouchers(queryset.select_related('voucher_type'))
+    except ValidationError as error:
+      self.message_user(request, '; '.join(error.messages), messages.ERROR)
+      return
+    self.message_user(request, f'posted {len(reversals)} reversal vouchers', messages.SUCCESS)
+
+  def get_queryset(self, request):
+    return super().get_queryset(request).select_related('voucher_type').with_amount()
\ No newline at end of file
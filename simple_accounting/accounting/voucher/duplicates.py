@@ -0,0 +1,80 @@
+import logging
+from datetime import timedelta
+from typing import Dict, Iterable, List, Sequence, Tuple
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from .models import VoucherType, Voucher, DuplicateVoucher
+
+logger = logging.getLogger(__name__)
+
+def duplicate_mode() -> str:
+  """'warn', 'reject' or '' to skip the check"""
+  return getattr(settings, 'ACCOUNTING_DUPLICATE_VOUCHERS', 'warn') or ''
+
+def live(queryset=None):
+  """vouchers that count as duplicates: not rejected and not reversed, nor reversals themselves"""
+  queryset = Voucher.objects.all() if queryset is None else queryset
+  return (
+    queryset
+      .exclude(status=Voucher.Status.REJECTED)
+      .filter(reversal__isnull=True, reversal_of__isnull=True, fingerprint__isnull=False)
+  )
+
+def recent(fingerprints: Iterable[str], exclude: Sequence[int] = (), batch_size: int = 1000) -> Dict[str, List[str]]:
+  """numbers of live vouchers per fingerprint, created within ACCOUNTING_DUPLICATE_WINDOW_HOURS"""
+  since = timezone.now() - timedelta(hours=getattr(settings, 'ACCOUNTING_DUPLICATE_WINDOW_HOURS', 24))
+  fingerprints = list(fingerprints)
+  found: Dict[str, List[str]] = {}
+  for start in range(0, len(fingerprints), batch_size):
+    rows = (
+      live()
+        .filter(fingerprint__in=fingerprints[start:start + batch_size], created_at__gte=since)
+        .exclude(pk__in=list(exclude))
+        .order_by('pk')
+        .values_list('fingerprint', 'voucher_number')
+    )
+    for value, number in rows:
+      found.setdefault(value, []).append(number)
+  return found
+
+def check_duplicates(vouchers: Sequence[Voucher]) -> List[Tuple[Voucher, List[str]]]:
+  """
+  Vouchers whose fingerprint matches a recent live voucher or an earlier one
+  of the same batch. Rejected with DuplicateVoucher when
+  ACCOUNTING_DUPLICATE_VOUCHERS is 'reject', logged when it is 'warn'.
+  Inside a transaction the voucher types involved are locked first, so
+  concurrent checks of the same fingerprint wait for each other's insert.
+  """
+  mode = duplicate_mode()
+  vouchers = [voucher for voucher in vouchers if voucher.fingerprint]
+  if not mode or not vouchers:
+    return []
+  if transaction.get_connection().in_atomic_block:
+    # fingerprints include the voucher type, its row serializes them; taken in id order against deadlocks
+    type_ids = sorted({voucher.voucher_type_id for voucher in vouchers})
+    list(VoucherType.objects.select_for_update().filter(pk__in=type_ids).order_by('pk').values_list('pk', flat=True))
+  existing = recent({voucher.fingerprint for voucher in vouchers}, [voucher.pk for voucher in vouchers if voucher.pk])
+  found = []
+  for voucher in vouchers:
+    matches = existing.setdefault(voucher.fingerprint, [])
+    if matches:
+      found.append((voucher, list(matches)))
+    matches.append(str(voucher))
+  if found:
+    message = '; '.join(f'{voucher} duplicates {", ".join(matches)}' for voucher, matches in found[:5])
+    if mode == 'reject':
+      raise DuplicateVoucher(f'duplicate vouchers: {message}')
+    logger.warning('duplicate vouchers: %s', message)
+  return found
+
+def duplicate_groups(queryset=None) -> List[Tuple[str, int]]:
+  """(fingerprint, count) of every fingerprint shared by live vouchers, with one GROUP BY"""
+  return list(
+    live(queryset)
+      .values('fingerprint')
+      .annotate(count=models.Count('id'))
+      .filter(count__gt=1)
+      .order_by('-count', 'fingerprint')
+      .values_list('fingerprint', 'count')
+  )
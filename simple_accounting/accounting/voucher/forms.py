@@ -1,7 +1,17 @@
+from decimal import Decimal
 from django import forms
-from .models import VoucherType, Voucher, Ledger
-from accounting.account.models import Account
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+from typing import List, Tuple
+from .models import VoucherType, Voucher, Ledger, DEBIT_ACCOUNT_TYPES
+from .posting import post_ledgers
+from .duplicates import check_duplicates
 from django.core.exceptions import ValidationError
+from accounting.utils import fingerprint
+from accounting.journal.recorder import record_saved
+from accounting.metrics.registry import timed
 
 class VoucherTypeForm(forms.ModelForm):
 
@@ -15,12 +25,30 @@ class VoucherTypeForm(forms.ModelForm):
 
 class VoucherForm(forms.ModelForm):
 
+  def clean(self):
+    if self.instance.locked:
+      raise ValidationError("Approved vouchers can't be changed, reverse them instead")
+    return super().clean()
+
   class Meta:
     fields = '__all__'
     model = Voucher
 
 
 
+class CachedModelChoiceField(forms.ModelChoiceField):
+  """looks choices up in `cache`, filled by a formset for all its forms with one query"""
+
+  cache = None
+
+  def to_python(self, value):
+    if self.cache is None or value in self.empty_values or isinstance(value, self.queryset.model):
+      return super().to_python(value)
+    try:
+      return self.cache[self.queryset.model._meta.pk.to_python(value)]
+    except (KeyError, ValidationError):
+      raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+
 class LedgerForm(forms.ModelForm):
 
   def clean_amount(self):
@@ -29,34 +57,151 @@ class LedgerForm(forms.ModelForm):
       raise ValidationError('This field can not be 0')
     return value
 
+  def _get_validation_exclusions(self):
+    exclude = super()._get_validation_exclusions()
+    if self.fields['account'].cache is not None:
+      # the cached account came from the field's queryset, the model check would query it again
+      exclude.append('account')
+    return exclude
+
   class Meta:
     fields = '__all__'
     model = Ledger
+    field_classes = {'account': CachedModelChoiceField}
 
 class _LedgerInlineFormset(forms.BaseInlineFormSet):
+  """
+  Ledger lines of one voucher, fit for vouchers with hundreds of them: the
+  accounts and ledgers the posted forms refer to are fetched with one query
+  each, and saving writes the changed lines with bulk statements. With
+  `page_size` set only one page of ledgers is edited, balanced against the
+  ledgers stored on the other pages.
+  """
+
+  page_size = None
+  page_number = 1
+
+  @cached_property
+  def page(self):
+    if not self.page_size:
+      return None
+    return Paginator(super().get_queryset(), self.page_size).get_page(self.page_number)
+
+  def get_queryset(self):
+    if not hasattr(self, '_ledgers'):
+      queryset = super().get_queryset() if self.page is None else self.page.object_list
+      self._ledgers = queryset.select_related('voucher', 'account')
+    return self._ledgers
 
+  def _posted_ids(self, name: str):
+    ids = set()
+    for i in range(min(self.total_form_count(), self.absolute_max)):
+      try:
+        ids.add(int(self.data.get(f'{self.add_prefix(i)}-{name}')))
+      except (TypeError, ValueError):
+        pass
+    return ids
+
+  @cached_property
+  def accounts(self):
+    field = self.form.base_fields['account']
+    return field.queryset.in_bulk(self._posted_ids('account'))
+
+  @cached_property
+  def existing(self):
+    return {ledger.pk: ledger for ledger in self.get_queryset()}
+
+  def add_fields(self, form, index):
+    super().add_fields(form, index)
+    if not self.is_bound:
+      return
+    form.fields['account'].cache = self.accounts
+    pk = form.fields[self._pk_field.name]
+    form.fields[self._pk_field.name] = CachedModelChoiceField(pk.queryset, initial=pk.initial, required=False, widget=pk.widget)
+    form.fields[self._pk_field.name].cache = self.existing
+
+  def _existing_object(self, pk):
+    return self.existing.get(pk)
+
+  def elsewhere(self) -> List[Tuple[int, int, Decimal]]:
+    """(account type, account, amount) of the voucher's ledgers on other pages"""
+    if self.page is None or self.page.paginator.num_pages == 1 or self.instance.pk is None:
+      return []
+    return list(
+      Ledger.objects
+        .filter(voucher=self.instance)
+        .exclude(pk__in=list(self.existing))
+        .values_list('account__account_type', 'account_id', 'amount')
+    )
+
+  @timed('LedgerInlineFormset.clean')
   def clean(self):
     super().clean()
-    debit = 0
-    credit = 0
+    if self.instance.locked and self.has_changed():
+      raise ValidationError("Ledgers of approved vouchers can't be changed")
+    lines = self.elsewhere()
+    entity_id = self.instance.voucher_type.entity_id if self.instance.voucher_type_id else None
+    foreign = []
     for form in self.forms:
-      cleaned_data = form.clean()
-      if not form.is_valid() or not cleaned_data or cleaned_data.get('DELETE'):
+      if not form.is_valid() or not form.cleaned_data or self._should_delete_form(form):
         continue
-      amount = cleaned_data.get('amount')
-      account = cleaned_data.get('account')
-      account_type = account.account_type if account else None
-      if amount > 0:
-        if account_type in [Account.AccountTypes.ASSET, Account.AccountTypes.EXPENSE]:
-          debit += amount
-        else:
-          credit += amount
-      elif amount < 0:
-        if account_type in [Account.AccountTypes.LIABILITY, Account.AccountTypes.EQUITY, Account.AccountTypes.REVENUE]:
-          debit += amount
-        else:
-          credit += amount
-    if debit != credit:
+      account = form.cleaned_data.get('account')
+      if account:
+        lines.append((account.account_type, account.pk, form.cleaned_data.get('amount') or 0))
+        if account.entity_id != entity_id:
+          foreign.append(str(account))
+    if foreign:
+      raise ValidationError(f'Accounts of other entities: {", ".join(foreign[:5])}')
+    # debit positive, credit negative, the rule of signed_amount
+    if sum(amount if account_type in DEBIT_ACCOUNT_TYPES else -amount for account_type, _, amount in lines) != 0:
       raise ValidationError('Debit Credit must be equal')
+    self.refingerprinted = False
+    self.duplicates = []
+    if self.instance.voucher_date and self.instance.voucher_type_id:
+      voucher_date = Voucher._meta.get_field('voucher_date').to_python(self.instance.voucher_date)
+      value = fingerprint(voucher_date, self.instance.voucher_type_id, [(account, amount) for _, account, amount in lines])
+      if self.has_changed() or value != self.instance.fingerprint:
+        self.refingerprinted = True
+        self.instance.fingerprint = value
+        self.duplicates = [number for _, numbers in check_duplicates([self.instance]) for number in numbers]
+
+  def save(self, commit=True):
+    if not commit:
+      return super().save(commit)
+    self.new_objects, self.changed_objects, self.deleted_objects = [], [], []
+    deleted_forms = set(self.deleted_forms)
+    for form in self.initial_forms:
+      ledger = form.instance
+      if ledger.pk is None:
+        continue
+      ledger.voucher = self.instance
+      if form in deleted_forms:
+        ledger.refuse_locked('deleted')
+        self.deleted_objects.append(ledger)
+      elif form.has_changed():
+        ledger.refuse_locked('changed')
+        self.changed_objects.append((ledger, form.changed_data))
+    for form in self.extra_forms:
+      if form.has_changed() and form not in deleted_forms:
+        form.instance.voucher = self.instance
+        self.new_objects.append(form.instance)
+    with transaction.atomic():
+      if self.deleted_objects:
+        Ledger.objects.filter(pk__in=[ledger.pk for ledger in self.deleted_objects]).delete()
+      changed = [ledger for ledger, _ in self.changed_objects]
+      if changed:
+        now = timezone.now()
+        fields = {'updated_at', 'currency', 'currency_amount'}
+        for ledger, names in self.changed_objects:
+          ledger.prepare()
+          ledger.updated_at = now
+          fields.update(name for name in names if name in self.form.base_fields)
+        Ledger.objects.bulk_update(changed, list(fields))
+        record_saved(changed)
+      if self.new_objects:
+        post_ledgers(self.instance, self.new_objects)
+      if getattr(self, 'refingerprinted', False):
+        Voucher.objects.set_fingerprints({self.instance.pk: self.instance.fingerprint})
+    return changed + self.new_objects
 
-LedgerInlineFormset = forms.inlineformset_factory(Voucher, Ledger, form=LedgerForm, formset=_LedgerInlineFormset)
\ No newline at end of file
+LedgerInlineFormset = forms.inlineformset_factory(Voucher, Ledger, form=LedgerForm, formset=_LedgerInlineFormset)
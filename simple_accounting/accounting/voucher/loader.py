@@ -0,0 +1,298 @@
+import tempfile
+from datetime import date
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+from django.utils import timezone
+from accounting.fields import from_minor, to_minor
+from accounting.account.models import Account
+from accounting.currency.rates import MissingRate, RateTable, is_foreign
+from accounting.journal.recorder import entry, queue, snapshots
+from accounting.outbox.recorder import event, publish
+from accounting.routers import bulk_load_alias, bulk_loads
+from accounting.utils import fingerprint
+from .models import VoucherType, Voucher, Ledger, VoucherSearchToken, DEBIT_ACCOUNT_TYPES, voucher_fulltext
+
+# rows per executemany on backends without a native bulk path
+STAGE_CHUNK_SIZE = 20000
+
+VOUCHER_STAGE = 'accounting_voucher_load'
+LEDGER_STAGE = 'accounting_ledger_load'
+TOKEN_STAGE = 'accounting_voucher_search_token_load'
+
+class LedgerRow(NamedTuple):
+  """one line of a load; lines sharing a reference make one voucher"""
+  reference: str
+  voucher_date: date
+  voucher_type: str  # prefix
+  account: str  # account number
+  amount: Optional[Decimal]  # None converts currency_amount
+  currency: str = ''
+  currency_amount: Optional[Decimal] = None
+  description: str = ''
+
+class Load(NamedTuple):
+  vouchers: int
+  ledgers: int
+
+def _connection():
+  return connections[bulk_load_alias()]
+
+def _quote(name: str) -> str:
+  return _connection().ops.quote_name(name)
+
+def _columns(model, *names: str) -> str:
+  return ', '.join(_quote(model._meta.get_field(name).column) for name in names)
+
+def native_method() -> Optional[str]:
+  """the backend's bulk path into the stage tables, None for executemany"""
+  connection = _connection()
+  if connection.vendor == 'postgresql':
+    return 'copy'
+  if connection.vendor == 'mysql' and connection.settings_dict.get('OPTIONS', {}).get('local_infile'):
+    return 'load_data'
+  return None
+
+def tsv_value(value) -> str:
+  """a value in the text format shared by COPY and LOAD DATA: \\N for NULL, backslash escapes"""
+  if value is None:
+    return '\\N'
+  return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def _stage(cursor, table: str, columns: Sequence[str], rows: Iterator[tuple]):
+  names = ', '.join(columns)
+  method = native_method()
+  if method is None:
+    sql = f'INSERT INTO {table} ({names}) VALUES ({", ".join(["%s"] * len(columns))})'
+    while True:
+      chunk = list(islice(rows, STAGE_CHUNK_SIZE))
+      if not chunk:
+        return
+      cursor.executemany(sql, chunk)
+  with tempfile.NamedTemporaryFile('w+', encoding='utf-8', newline='\n', suffix='.tsv') as file:
+    for row in rows:
+      file.write('\t'.join(map(tsv_value, row)) + '\n')
+    file.flush()
+    if method == 'copy':
+      file.seek(0)
+      cursor.copy_expert(f'COPY {table} ({names}) FROM STDIN', file)
+    else:
+      cursor.execute(f'LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 ({names})', [file.name])
+
+def _create_stages(cursor):
+  # left behind by a failed load on MySQL, where creating them isn't rolled back
+  _drop_stages(cursor)
+  cursor.execute(
+    f'CREATE TEMPORARY TABLE {VOUCHER_STAGE} (reference VARCHAR(64) PRIMARY KEY, position INTEGER NOT NULL, '
+    'voucher_number VARCHAR(12) NOT NULL, voucher_date DATE NOT NULL, voucher_type_id BIGINT NOT NULL, '
+    'entity_id BIGINT NULL, description TEXT NULL, fingerprint VARCHAR(64) NULL)'
+  )
+  cursor.execute(
+    f'CREATE TEMPORARY TABLE {LEDGER_STAGE} (line INTEGER NOT NULL, reference VARCHAR(64) NOT NULL, '
+    'account_number VARCHAR(32) NOT NULL, amount BIGINT NOT NULL, currency VARCHAR(3) NOT NULL, currency_amount BIGINT NULL)'
+  )
+  cursor.execute(f'CREATE TEMPORARY TABLE {TOKEN_STAGE} (reference VARCHAR(64) NOT NULL, token VARCHAR(64) NOT NULL)')
+
+def _drop_stages(cursor):
+  # a plain DROP TABLE would commit the transaction on MySQL
+  temporary = 'TEMPORARY TABLE' if _connection().vendor == 'mysql' else 'TABLE'
+  for table in (TOKEN_STAGE, LEDGER_STAGE, VOUCHER_STAGE):
+    cursor.execute(f'DROP {temporary} IF EXISTS {table}')
+
+def _ledger_rows(rows: Iterable[LedgerRow], headers: Dict[str, list]) -> Iterator[tuple]:
+  """stage rows of ledgers, collecting the voucher of every reference into headers"""
+  rates = RateTable.current()
+  date_field = Voucher._meta.get_field('voucher_date')
+  for line, row in enumerate(rows, 1):
+    if not row.reference or len(row.reference) > 64:
+      raise ValidationError(f'line {line}: references must have 1 to 64 characters')
+    voucher_date = date_field.to_python(row.voucher_date)
+    header = headers.get(row.reference)
+    if header is None:
+      headers[row.reference] = [len(headers), voucher_date, row.voucher_type, row.description or None]
+    elif header[1] != voucher_date or header[2] != row.voucher_type:
+      raise ValidationError(f'line {line}: {row.reference} has another date or voucher type on an earlier line')
+    currency, amount, currency_amount = (row.currency or '').upper(), row.amount, row.currency_amount
+    if not is_foreign(currency):
+      currency, currency_amount = '', None
+    elif amount is None and currency_amount is not None:
+      try:
+        amount = rates.convert(Decimal(str(currency_amount)), currency, voucher_date)
+      except MissingRate as error:
+        raise ValidationError(f'line {line}: {error}')
+    if amount is None:
+      raise ValidationError(f'line {line}: amount is missing')
+    yield (
+      line, row.reference, row.account, to_minor(amount), currency,
+      None if currency_amount is None else to_minor(currency_amount),
+    )
+
+def _fingerprints(cursor, headers: Dict[str, list], types: Dict[str, VoucherType]) -> Dict[str, Optional[str]]:
+  """reference -> fingerprint, streamed from the staged lines in reference order"""
+  cursor.execute(
+    f'SELECT l.reference, a.{_quote("id")}, l.amount FROM {LEDGER_STAGE} l '
+    f'JOIN {_quote(Account._meta.db_table)} a ON a.{_quote("account_number")} = l.account_number ORDER BY l.reference'
+  )
+  fingerprints = {}
+  reference, lines = None, []
+  while True:
+    rows = cursor.fetchmany(STAGE_CHUNK_SIZE)
+    for row in rows:
+      if row[0] != reference:
+        if lines:
+          fingerprints[reference] = fingerprint(headers[reference][1], types[headers[reference][2]].pk, lines)
+        reference, lines = row[0], []
+      lines.append((row[1], from_minor(row[2])))
+    if not rows:
+      break
+  if lines:
+    fingerprints[reference] = fingerprint(headers[reference][1], types[headers[reference][2]].pk, lines)
+  return fingerprints
+
+def _voucher_types(headers: Dict[str, list]) -> Dict[str, VoucherType]:
+  prefixes = {header[2] for header in headers.values()}
+  types = VoucherType.objects.in_bulk(prefixes, field_name='prefix')
+  unknown = sorted(prefixes - set(types))
+  if unknown:
+    raise ValidationError(f'unknown voucher types: {", ".join(unknown[:5])}')
+  return types
+
+def _voucher_rows(headers: Dict[str, list], types: Dict[str, VoucherType], fingerprints: Dict[str, Optional[str]], tokens: list) -> Iterator[tuple]:
+  """stage rows of vouchers, numbered from one reserved block per voucher type; collects their search tokens"""
+  by_type: Dict[str, List[str]] = {}
+  for reference, header in headers.items():
+    by_type.setdefault(header[2], []).append(reference)
+  index = not voucher_fulltext()
+  ops = _connection().ops
+  for prefix, references in by_type.items():
+    voucher_type = types[prefix]
+    for reference, number in zip(references, voucher_type.reserve_numbers(len(references))):
+      position, voucher_date, _, description = headers[reference]
+      if index:
+        tokens.extend((reference, token) for token in VoucherSearchToken.words(number, description))
+      yield (
+        reference, position, number, ops.adapt_datefield_value(voucher_date),
+        voucher_type.pk, voucher_type.entity_id, description, fingerprints.get(reference),
+      )
+
+def _refuse(cursor, sql: str, message: str, params=()):
+  cursor.execute(f'{sql} LIMIT 5', params)
+  found = [str(row[0]) for row in cursor.fetchall()]
+  if found:
+    raise ValidationError(f'{message}: {", ".join(found)}')
+
+def _validate_accounts(cursor):
+  _refuse(
+    cursor,
+    f'SELECT DISTINCT l.account_number FROM {LEDGER_STAGE} l '
+    f'LEFT JOIN {_quote(Account._meta.db_table)} a ON a.{_quote("account_number")} = l.account_number '
+    f'WHERE a.{_quote("id")} IS NULL',
+    'unknown accounts',
+  )
+
+def _validate_vouchers(cursor):
+  account = _quote(Account._meta.db_table)
+  _refuse(
+    cursor,
+    f'SELECT DISTINCT l.account_number FROM {LEDGER_STAGE} l '
+    f'JOIN {VOUCHER_STAGE} v ON v.reference = l.reference '
+    f'JOIN {account} a ON a.{_quote("account_number")} = l.account_number '
+    f'WHERE COALESCE(a.{_quote("entity_id")}, 0) <> COALESCE(v.entity_id, 0)',
+    'accounts of other entities than their voucher type',
+  )
+  _refuse(
+    cursor,
+    f'SELECT l.reference FROM {LEDGER_STAGE} l '
+    f'JOIN {account} a ON a.{_quote("account_number")} = l.account_number '
+    f'GROUP BY l.reference '
+    f'HAVING SUM(CASE WHEN a.{_quote("account_type")} IN (%s, %s) THEN l.amount ELSE -l.amount END) <> 0',
+    'unbalanced vouchers',
+    [int(account_type) for account_type in DEBIT_ACCOUNT_TYPES],
+  )
+
+def _merge(cursor, status: int) -> int:
+  """INSERT ... SELECT of the staged rows into the voucher, ledger and search token tables"""
+  now = Voucher._meta.get_field('created_at').get_db_prep_value(timezone.now(), _connection())
+  voucher = _quote(Voucher._meta.db_table)
+  cursor.execute(
+    f'INSERT INTO {voucher} '
+    f'({_columns(Voucher, "voucher_number", "voucher_date", "voucher_type", "description", "status", "fingerprint", "entity", "created_at", "updated_at")}) '
+    f'SELECT voucher_number, voucher_date, voucher_type_id, description, %s, fingerprint, entity_id, %s, %s '
+    f'FROM {VOUCHER_STAGE} ORDER BY position',
+    [int(status), now, now],
+  )
+  cursor.execute(
+    f'INSERT INTO {_quote(Ledger._meta.db_table)} '
+    f'({_columns(Ledger, "voucher", "account", "amount", "currency", "currency_amount", "entity", "created_at", "updated_at")}) '
+    f'SELECT v.{_quote("id")}, a.{_quote("id")}, l.amount, l.currency, l.currency_amount, s.entity_id, %s, %s '
+    f'FROM {LEDGER_STAGE} l '
+    f'JOIN {VOUCHER_STAGE} s ON s.reference = l.reference '
+    f'JOIN {voucher} v ON v.{_quote("voucher_number")} = s.voucher_number '
+    f'JOIN {_quote(Account._meta.db_table)} a ON a.{_quote("account_number")} = l.account_number '
+    f'ORDER BY l.line',
+    [now, now],
+  )
+  ledgers = cursor.rowcount
+  cursor.execute(
+    f'INSERT INTO {_quote(VoucherSearchToken._meta.db_table)} ({_columns(VoucherSearchToken, "voucher", "token")}) '
+    f'SELECT v.{_quote("id")}, t.token FROM {TOKEN_STAGE} t '
+    f'JOIN {VOUCHER_STAGE} s ON s.reference = t.reference '
+    f'JOIN {voucher} v ON v.{_quote("voucher_number")} = s.voucher_number'
+  )
+  return ledgers
+
+def _loaded_ids(cursor) -> List[int]:
+  cursor.execute(
+    f'SELECT v.{_quote("id")} FROM {VOUCHER_STAGE} s '
+    f'JOIN {_quote(Voucher._meta.db_table)} v ON v.{_quote("voucher_number")} = s.voucher_number ORDER BY s.position'
+  )
+  return [row[0] for row in cursor.fetchall()]
+
+def _record(ids: List[int], batch_size: int):
+  """the audit journal entry and outbox event of every merged voucher, its ledgers nested like post_vouchers"""
+  for start in range(0, len(ids), batch_size):
+    chunk = ids[start:start + batch_size]
+    ledgers: Dict[int, List[dict]] = {}
+    for ledger in snapshots(Ledger.objects.filter(voucher_id__in=chunk).order_by('id')):
+      ledgers.setdefault(ledger['voucher_id'], []).append(ledger)
+    vouchers = {voucher['id']: {**voucher, 'ledgers': ledgers.get(voucher['id'], [])} for voucher in snapshots(Voucher.objects.filter(pk__in=chunk))}
+    publish([event(Voucher, pk, 'create', vouchers[pk]) for pk in chunk])
+    queue([entry(Voucher, pk, 'create', None, vouchers[pk]) for pk in chunk])
+
+def load_vouchers(rows: Iterable[LedgerRow], status: int = Voucher.Status.APPROVED, batch_size: int = 1000) -> Load:
+  """
+  Loads historical ledgers through the backend's fastest bulk path: rows are
+  staged into temporary tables with COPY (PostgreSQL), LOAD DATA LOCAL INFILE
+  (MySQL with the local_infile option, see ACCOUNTING_BULK_LOAD_ALIAS) or
+  executemany in large chunks, checked with set-based queries and merged into
+  the voucher, ledger and search token tables with INSERT ... SELECT. Numbers, fingerprints, the audit journal and
+  the outbox are kept like post_vouchers keeps them; duplicates aren't
+  checked, loaded vouchers are history.
+  """
+  headers: Dict[str, list] = {}
+  tokens: List[tuple] = []
+  alias = bulk_load_alias()
+  # the journal queues on default, which commits after the load
+  with transaction.atomic(), transaction.atomic(using=alias, savepoint=False), bulk_loads(alias), connections[alias].cursor() as cursor:
+    _create_stages(cursor)
+    _stage(cursor, LEDGER_STAGE, ('line', 'reference', 'account_number', 'amount', 'currency', 'currency_amount'), _ledger_rows(rows, headers))
+    ledgers, ids = 0, []
+    if headers:
+      _validate_accounts(cursor)
+      types = _voucher_types(headers)
+      fingerprints = _fingerprints(cursor, headers, types)
+      _stage(
+        cursor, VOUCHER_STAGE,
+        ('reference', 'position', 'voucher_number', 'voucher_date', 'voucher_type_id', 'entity_id', 'description', 'fingerprint'),
+        _voucher_rows(headers, types, fingerprints, tokens),
+      )
+      _stage(cursor, TOKEN_STAGE, ('reference', 'token'), iter(tokens))
+      _validate_vouchers(cursor)
+      ledgers = _merge(cursor, status)
+      ids = _loaded_ids(cursor)
+    # on errors PostgreSQL and SQLite roll the stages back with the transaction
+    _drop_stages(cursor)
+    _record(ids, batch_size)
+  return Load(len(ids), ledgers)
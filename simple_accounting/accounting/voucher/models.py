@@ -1,26 +1,90 @@
-from django.db import models
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, models
 from datetime import datetime, date
+from django.utils import timezone
 from django.db import transaction
 from sequences import get_next_value
-from accounting.utils import comply
+from sequences.models import Sequence
+from typing import Dict, List, Optional
+from accounting.utils import comply, fingerprint, tokenize
+from accounting.metrics.registry import timed
+from accounting.journal.recorder import Journaled, record_update
+from accounting.fields import MinorUnitAmountField
 from accounting.account.models import Account
+from accounting.entity.models import Entity
+from accounting.currency.rates import RateTable, is_foreign
 from decimal import Decimal
 
+DEBIT_ACCOUNT_TYPES = (Account.AccountTypes.ASSET, Account.AccountTypes.EXPENSE)
+
+def signed_amount(account_type='account__account_type', amount='amount'):
+  """ledger amount as debit positive, credit negative; sums to 0 for a balanced voucher"""
+  return models.Case(
+    models.When(**{f'{account_type}__in': DEBIT_ACCOUNT_TYPES}, then=models.F(amount)),
+    default=-models.F(amount),
+    output_field=MinorUnitAmountField(),
+  )
+
+def debit_condition(prefix=''):
+  """Q for ledgers on the debit side, the same split as Voucher.debits"""
+  account_type = f'{prefix}account__account_type__in'
+  return (
+    models.Q(**{f'{prefix}amount__gt': 0, account_type: DEBIT_ACCOUNT_TYPES}) |
+    (models.Q(**{f'{prefix}amount__lt': 0}) & ~models.Q(**{account_type: DEBIT_ACCOUNT_TYPES}))
+  )
+
+def approved_immutable() -> bool:
+  return getattr(settings, 'ACCOUNTING_IMMUTABLE_APPROVED_VOUCHERS', True)
+
+def voucher_fulltext() -> bool:
+  """MySQL searches vouchers with its FULLTEXT index, other backends with VoucherSearchToken"""
+  return connection.vendor == 'mysql' and getattr(settings, 'ACCOUNTING_VOUCHER_FULLTEXT', True)
+
+class ImmutableVoucher(ValidationError):
+  pass
+
+class DuplicateVoucher(ValidationError):
+  pass
+
 class VoucherType(models.Model):
   
   name: str = models.CharField(max_length=128, blank=False)
+  # unique across entities, so each entity numbers its vouchers from its own sequences
   prefix: str = models.CharField(max_length=4, unique=True, blank=False)
+  entity: Entity = models.ForeignKey(Entity, null=True, blank=True, on_delete=models.PROTECT, related_name='voucher_types')
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['entity', 'prefix']),
+    ]
 
+  @timed('VoucherType.generate_number')
   def generate_number(self):
-    return f'{self.prefix}-{str(get_next_value(self.prefix)).zfill(4)}'
+    return self.format_number(get_next_value(self.prefix))
+
+  def format_number(self, value: int) -> str:
+    return f'{self.prefix}-{str(value).zfill(4)}'
+
+  def reserve_numbers(self, count: int) -> List[str]:
+    """`count` consecutive voucher numbers taken from the sequence with one locked update"""
+    if count < 1:
+      return []
+    with transaction.atomic():
+      sequence, created = Sequence.objects.select_for_update().get_or_create(name=self.prefix, defaults={'last': count})
+      if not created:
+        sequence.last += count
+        sequence.save(update_fields=['last'])
+    return [self.format_number(value) for value in range(sequence.last - count + 1, sequence.last + 1)]
 
   def __str__(self):
     return f'{self.name} ({self.prefix})'
 
 class VoucherQuerySet(models.QuerySet):
 
-  version = 1
+  version = 2
   # 1 - autogenerates number from type when created, number is not editable
+  # 2 - approved vouchers can't be updated or deleted, they are reversed instead
 
   @comply(version)
   def create(self, **kwargs):
@@ -28,23 +92,83 @@ class VoucherQuerySet(models.QuerySet):
 
   @comply(version)
   def update(self, **kwargs) -> int:
-    return super().update(**kwargs)
+    self.refuse_approved('changed')
+    # auto_now is only applied by save(), incremental jobs walk updated_at
+    kwargs.setdefault('updated_at', timezone.now())
+    described = list(self.values_list('pk', flat=True)) if 'description' in kwargs else []
+    updated = record_update(self, kwargs, super().update)
+    if described:
+      VoucherSearchToken.index(Voucher.objects.filter(pk__in=described))
+    return updated
+
+  def delete(self):
+    self.refuse_approved('deleted')
+    return super().delete()
 
-class Voucher(models.Model):
+  def refresh_fingerprints(self, batch_size: int = 1000) -> int:
+    """recomputes the fingerprints of these vouchers from their stored ledgers"""
+    refreshed = 0
+    last = 0
+    while True:
+      vouchers = list(self.filter(pk__gt=last).order_by('pk').values_list('pk', 'voucher_date', 'voucher_type_id')[:batch_size])
+      if not vouchers:
+        return refreshed
+      last = vouchers[-1][0]
+      lines = {}
+      for voucher_id, account_id, amount in Ledger.objects.filter(voucher_id__in=[pk for pk, _, _ in vouchers]).values_list('voucher_id', 'account_id', 'amount'):
+        lines.setdefault(voucher_id, []).append((account_id, amount))
+      refreshed += Voucher.objects.set_fingerprints({
+        pk: fingerprint(voucher_date, type_id, lines.get(pk, ())) for pk, voucher_date, type_id in vouchers
+      })
+
+  def set_fingerprints(self, fingerprints: Dict[int, Optional[str]]) -> int:
+    # derived from the ledgers, so written on approved vouchers too; journaled like update()
+    if not fingerprints:
+      return 0
+    vouchers = self.filter(pk__in=list(fingerprints))
+    return record_update(vouchers, {'fingerprint': models.Case(
+      *(models.When(pk=pk, then=models.Value(value)) for pk, value in fingerprints.items()),
+      output_field=models.CharField(),
+    )}, super(VoucherQuerySet, vouchers).update)
+
+  def refuse_approved(self, action: str):
+    if approved_immutable() and self.filter(status=Voucher.Status.APPROVED).exists():
+      raise ImmutableVoucher(f"approved vouchers can't be {action}, reverse them instead")
+
+  def with_amount(self):
+    """annotates the debit total summed in the database, read back by Voucher.amount"""
+    return self.annotate(total_amount=models.Sum('ledgers__amount', filter=debit_condition('ledgers__')))
+
+class Voucher(Journaled, models.Model):
+
+  objects = VoucherQuerySet.as_manager()
 
   class Status(models.IntegerChoices):
     PENDING = 1
     APPROVED = 2
     REJECTED = 3
 
-  voucher_number: str = models.CharField(max_length=12, editable=False)
+  voucher_number: str = models.CharField(max_length=12, editable=False, db_index=True)
   voucher_date: date = models.DateField()
-  voucher_type: VoucherType = models.ForeignKey(VoucherType, on_delete=models.CASCADE, blank=False, null=False)
+  voucher_type: VoucherType = models.ForeignKey(VoucherType, on_delete=models.PROTECT, blank=False, null=False)
   description: str = models.TextField(null=True, blank=True)
   status: int = models.IntegerField(choices=Status.choices, blank=False, default=Status.PENDING)
+  reversal_of: "Voucher" = models.OneToOneField('self', on_delete=models.PROTECT, null=True, blank=True, editable=False, related_name='reversal')
+  # sha256 of date, type and lines, kept by post_vouchers, the ledger formset and saves
+  fingerprint: str = models.CharField(max_length=64, null=True, blank=True, editable=False)
+  # the voucher type's entity
+  entity: Entity = models.ForeignKey(Entity, null=True, blank=True, editable=False, on_delete=models.PROTECT, related_name='+')
   created_at: datetime = models.DateTimeField(auto_now_add=True)
   updated_at: datetime = models.DateTimeField(auto_now=True)
 
+  class Meta:
+    indexes = [
+      models.Index(fields=['updated_at', 'id']),
+      models.Index(fields=['voucher_date', 'status']),
+      models.Index(fields=['fingerprint', 'created_at']),
+      models.Index(fields=['entity', 'voucher_date', 'status']),
+    ]
+
   @property
   def debits(self):
     ledgers = self.ledgers.all()
@@ -69,24 +193,183 @@ class Voucher(models.Model):
 
   @property
   def amount(self):
-    return sum(item.amount for item in self.debits)
+    if 'total_amount' in self.__dict__:
+      return self.total_amount or 0
+    if 'ledgers' in getattr(self, '_prefetched_objects_cache', {}):
+      return sum(item.amount for item in self.debits)
+    return self.ledgers.filter(debit_condition()).aggregate(total=models.Sum('amount'))['total'] or 0
 
+  @property
+  def locked(self) -> bool:
+    """
+    Stored as approved: ledgers and fields stay as they are. The instance
+    that inserted the voucher posts its ledgers until its transaction commits.
+    """
+    if self._state.adding or not approved_immutable() or getattr(self, '_posting', False):
+      return False
+    before = getattr(self, '_journal_before', None)
+    return (before['status'] if before else self.status) == Voucher.Status.APPROVED
+
+  @timed('Voucher.save')
   def save(self, **kwargs):
+    if self.locked:
+      raise ImmutableVoucher(f"{self} is approved and can't be changed, reverse it instead")
     with transaction.atomic():
-      if self._state.adding:
+      adding = self._state.adding
+      if adding:
         self.voucher_number = self.voucher_type.generate_number()
+        self._posting = True
+        transaction.on_commit(lambda: setattr(self, '_posting', False))
+      before = getattr(self, '_journal_before', None)
+      self.entity_id = self.voucher_type.entity_id
       super(Voucher, self).save(**kwargs)
+      VoucherSearchToken.index([self], replace=not adding)
+      if before and before['entity_id'] != self.entity_id:
+        Ledger.objects.filter(voucher=self).set_entity(self.entity_id)
+      if before and (before['voucher_date'], before['voucher_type_id']) != (self._meta.get_field('voucher_date').to_python(self.voucher_date), self.voucher_type_id):
+        Voucher.objects.filter(pk=self.pk).refresh_fingerprints()
+
+  def delete(self, **kwargs):
+    if self.locked:
+      raise ImmutableVoucher(f"{self} is approved and can't be deleted, reverse it instead")
+    return super(Voucher, self).delete(**kwargs)
 
   def __str__(self):
     return self.voucher_number
 
-class Ledger(models.Model):
+class VoucherSearchToken(models.Model):
+  """Normalized words of voucher numbers and descriptions, searched by prefix instead of LIKE '%term%' scans"""
+
+  voucher: Voucher = models.ForeignKey(Voucher, on_delete=models.CASCADE, related_name='search_tokens')
+  token: str = models.CharField(max_length=64)
+
+  class Meta:
+    indexes = [
+      models.Index(fields=['token', 'voucher']),
+    ]
+
+  @staticmethod
+  def tokens(voucher: Voucher) -> List[str]:
+    return VoucherSearchToken.words(voucher.voucher_number, voucher.description)
+
+  @staticmethod
+  def words(voucher_number: str, description: Optional[str]) -> List[str]:
+    # only the serial of the number, its type prefix would match every voucher of the type
+    serial = voucher_number.rsplit('-', 1)[-1]
+    return list(dict.fromkeys(tokenize(serial) + tokenize(description)))
+
+  @classmethod
+  def index(cls, vouchers, replace: bool = True, batch_size: int = 1000):
+    """(re)writes the tokens of vouchers; replace=False for vouchers just inserted"""
+    if voucher_fulltext():
+      return
+    vouchers = list(vouchers)
+    if replace:
+      for start in range(0, len(vouchers), batch_size):
+        cls.objects.filter(voucher__in=[voucher.pk for voucher in vouchers[start:start + batch_size]]).delete()
+    cls.objects.bulk_create(
+      (cls(voucher_id=voucher.pk, token=token) for voucher in vouchers for token in cls.tokens(voucher)),
+      batch_size=batch_size,
+    )
+
+  def __str__(self):
+    return self.token
+
+# the fields a voucher fingerprint is computed from
+FINGERPRINTED_FIELDS = {'account', 'account_id', 'amount'}
+
+class LedgerQuerySet(models.QuerySet):
+
+  def update(self, **kwargs) -> int:
+    self.refuse_locked('changed')
+    kwargs.setdefault('updated_at', timezone.now())
+    vouchers = list(self.order_by().values_list('voucher_id', flat=True).distinct()) if FINGERPRINTED_FIELDS & set(kwargs) else []
+    updated = record_update(self, kwargs, super().update)
+    if vouchers:
+      Voucher.objects.filter(pk__in=vouchers).refresh_fingerprints()
+    return updated
+
+  def delete(self):
+    self.refuse_locked('deleted')
+    return super().delete()
+
+  def bulk_update(self, objs, fields, batch_size=None) -> int:
+    # journaled with record_saved and refingerprinted by the caller, who knows the loaded values
+    objs = list(objs)
+    self.filter(pk__in=[obj.pk for obj in objs]).refuse_locked('changed')
+    return models.QuerySet(self.model, using=self.db).bulk_update(objs, fields, batch_size)
+
+  def set_entity(self, entity_id: Optional[int]) -> int:
+    # copied from the voucher like its fingerprint, so written on approved vouchers too
+    return record_update(self, {'entity': entity_id}, super().update)
+
+  def refuse_locked(self, action: str):
+    if approved_immutable() and self.filter(voucher__status=Voucher.Status.APPROVED).exists():
+      raise ImmutableVoucher(f"ledgers of approved vouchers can't be {action}, reverse them instead")
+
+class Ledger(Journaled, models.Model):
+
+  objects = LedgerQuerySet.as_manager()
 
   voucher: Voucher = models.ForeignKey(Voucher, on_delete=models.CASCADE, null=False, blank=False, related_name='ledgers')
-  account: Account = models.ForeignKey(Account, on_delete=models.CASCADE, null=False, blank=False, related_name='+')
-  amount: Decimal = models.DecimalField(max_digits=30, decimal_places=6)
+  account: Account = models.ForeignKey(Account, on_delete=models.PROTECT, null=False, blank=False, related_name='+')
+  # base currency amount; currency and currency_amount hold the transaction currency when it differs
+  amount: Decimal = MinorUnitAmountField()
+  currency: str = models.CharField(max_length=3, blank=True, default='')
+  currency_amount: Decimal = MinorUnitAmountField(null=True, blank=True)
+  # copied from the voucher, so entity balances don't join vouchers
+  entity: Entity = models.ForeignKey(Entity, null=True, blank=True, editable=False, on_delete=models.PROTECT, related_name='+')
   created_at: datetime = models.DateTimeField(auto_now_add=True)
   updated_at: datetime = models.DateTimeField(auto_now=True)
 
+  class Meta:
+    indexes = [
+      models.Index(fields=['updated_at', 'id']),
+      models.Index(fields=['account', 'currency']),
+      models.Index(fields=['entity', 'account']),
+    ]
+
+  def prepare(self, rates: RateTable = None):
+    """normalizes the currency, converts foreign amounts and copies the voucher's entity, before save or a bulk insert"""
+    self.entity_id = self.voucher.entity_id
+    self.currency = self.currency.upper()
+    if not is_foreign(self.currency):
+      self.currency = ''
+      self.currency_amount = None
+    elif self.amount is None and self.currency_amount is not None:
+      voucher_date = Voucher._meta.get_field('voucher_date').to_python(self.voucher.voucher_date)
+      self.amount = (rates or RateTable.current()).convert(self.currency_amount, self.currency, voucher_date)
+
+  def refuse_locked(self, action: str):
+    if self.voucher.locked:
+      raise ImmutableVoucher(f"ledgers of approved voucher {self.voucher} can't be {action}")
+
+  @classmethod
+  def refuse_foreign(cls, ledgers: List["Ledger"]):
+    """prepared ledgers must book accounts of their voucher's entity; accounts not loaded yet are read in one query"""
+    loaded = cls._meta.get_field('account').is_cached
+    entities = {ledger.account_id: ledger.account.entity_id for ledger in ledgers if loaded(ledger)}
+    unloaded = {ledger.account_id for ledger in ledgers} - set(entities)
+    if unloaded:
+      entities.update(Account.objects.filter(pk__in=unloaded).values_list('pk', 'entity_id'))
+    foreign = sorted({str(ledger.account_id) for ledger in ledgers if entities.get(ledger.account_id) != ledger.entity_id})
+    if foreign:
+      raise ValidationError(f'Accounts of other entities: {", ".join(foreign[:5])}')
+
+  def save(self, **kwargs):
+    self.refuse_locked('changed')
+    self.prepare()
+    Ledger.refuse_foreign([self])
+    with transaction.atomic():
+      super(Ledger, self).save(**kwargs)
+      Voucher.objects.filter(pk=self.voucher_id).refresh_fingerprints()
+
+  def delete(self, **kwargs):
+    self.refuse_locked('deleted')
+    with transaction.atomic():
+      deleted = super(Ledger, self).delete(**kwargs)
+      Voucher.objects.filter(pk=self.voucher_id).refresh_fingerprints()
+    return deleted
+
   def __str__(self):
     return f'{self.voucher.voucher_number} - {self.account.name}'
\ No newline at end of file
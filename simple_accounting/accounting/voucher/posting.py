@@ -0,0 +1,145 @@
+from typing import Dict, List, Sequence, Tuple
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from accounting.currency.rates import RateTable
+from accounting.journal.recorder import record_created, record_posted, snapshot
+from accounting.outbox.recorder import event, publish, publish_posted
+from accounting.utils import fingerprint
+from .models import VoucherType, Voucher, Ledger, VoucherSearchToken, ImmutableVoucher
+from . import duplicates
+
+def _chunks(items: list, size: int):
+  for start in range(0, len(items), size):
+    yield items[start:start + size]
+
+def post_vouchers(entries: Sequence[Tuple[Voucher, List[Ledger]]], batch_size: int = 1000, check_duplicates: bool = True) -> List[Voucher]:
+  """
+  Saves many new vouchers and their ledgers with bulk inserts. Voucher numbers
+  are reserved in one block per voucher type; everything Voucher.save and
+  Ledger.save would do on the way (numbering, currency conversion, search
+  tokens, fingerprints, the audit journal and the outbox, with one entry per
+  voucher) is done here for the whole batch. Vouchers generated by the
+  ledger itself pass check_duplicates=False.
+  """
+  if not entries:
+    return []
+  with transaction.atomic():
+    by_type: Dict[int, List[Voucher]] = {}
+    for voucher, _ in entries:
+      by_type.setdefault(voucher.voucher_type_id, []).append(voucher)
+    types = VoucherType.objects.in_bulk(list(by_type))
+    for type_id, vouchers in by_type.items():
+      for voucher, number in zip(vouchers, types[type_id].reserve_numbers(len(vouchers))):
+        voucher.voucher_number = number
+        voucher.entity_id = types[type_id].entity_id
+    rates = RateTable.current()
+    for voucher, lines in entries:
+      for ledger in lines:
+        ledger.voucher = voucher
+        ledger.prepare(rates)
+      voucher_date = Voucher._meta.get_field('voucher_date').to_python(voucher.voucher_date)
+      voucher.fingerprint = fingerprint(voucher_date, voucher.voucher_type_id, [(ledger.account_id, ledger.amount) for ledger in lines])
+    Ledger.refuse_foreign([ledger for _, lines in entries for ledger in lines])
+    if check_duplicates:
+      duplicates.check_duplicates([voucher for voucher, _ in entries])
+    vouchers = Voucher.objects.bulk_create([voucher for voucher, _ in entries], batch_size=batch_size)
+    if any(voucher.pk is None for voucher in vouchers):
+      # backends without RETURNING (MySQL): numbers were just reserved, so they identify the rows
+      ids = {}
+      for chunk in _chunks([voucher.voucher_number for voucher in vouchers], batch_size):
+        ids.update(Voucher.objects.filter(voucher_number__in=chunk).values_list('voucher_number', 'id'))
+      for voucher in vouchers:
+        voucher.pk = ids[voucher.voucher_number]
+        voucher._state.adding = False
+    ledgers = []
+    for voucher, lines in entries:
+      for ledger in lines:
+        # sets voucher_id, now that the voucher has one
+        ledger.voucher = voucher
+        ledgers.append(ledger)
+    Ledger.objects.bulk_create(ledgers, batch_size=batch_size)
+    if any(ledger.pk is None for ledger in ledgers):
+      # one multi row insert takes consecutive ids in row order
+      ids: Dict[int, List[int]] = {}
+      for chunk in _chunks([voucher.pk for voucher in vouchers], batch_size):
+        for voucher_id, ledger_id in Ledger.objects.filter(voucher_id__in=chunk).order_by('id').values_list('voucher_id', 'id'):
+          ids.setdefault(voucher_id, []).append(ledger_id)
+      for voucher, lines in entries:
+        for ledger, ledger_id in zip(lines, ids.get(voucher.pk, [])):
+          ledger.pk = ledger_id
+          ledger._state.adding = False
+    VoucherSearchToken.index(vouchers, replace=False, batch_size=batch_size)
+    posted = {voucher.pk: lines for voucher, lines in entries}
+    publish_posted(vouchers, posted)
+    record_posted(vouchers, posted)
+  return vouchers
+
+def post_ledgers(voucher: Voucher, ledgers: List[Ledger], batch_size: int = 1000) -> List[Ledger]:
+  """adds new ledgers to a saved voucher with bulk inserts, converted, journaled and published like Ledger.save"""
+  if voucher.locked:
+    raise ImmutableVoucher(f"ledgers can't be added to approved voucher {voucher}, reverse it instead")
+  with transaction.atomic():
+    rates = RateTable.current()
+    for ledger in ledgers:
+      ledger.voucher = voucher
+      ledger.prepare(rates)
+    Ledger.refuse_foreign(ledgers)
+    Ledger.objects.bulk_create(ledgers, batch_size=batch_size)
+    if any(ledger.pk is None for ledger in ledgers):
+      # the voucher's newest ids, taken in row order
+      ids = Ledger.objects.filter(voucher=voucher).order_by('-id').values_list('id', flat=True)[:len(ledgers)]
+      for ledger, ledger_id in zip(ledgers, reversed(list(ids))):
+        ledger.pk = ledger_id
+        ledger._state.adding = False
+    publish([event(Ledger, ledger.pk, 'create', snapshot(ledger)) for ledger in ledgers])
+    record_created(ledgers)
+  return ledgers
+
+def reverse_vouchers(vouchers: Sequence[Voucher], voucher_date=None, voucher_type: VoucherType = None, batch_size: int = 1000) -> List[Voucher]:
+  """
+  Posts an approved reversal for each approved voucher: the same ledgers with
+  negated amounts, dated like the original unless `voucher_date` is given.
+  """
+  vouchers = list(vouchers)
+  refused = [
+    str(voucher) for voucher in vouchers
+    if voucher.status != Voucher.Status.APPROVED or voucher.reversal_of_id is not None
+  ]
+  for chunk in _chunks([voucher.pk for voucher in vouchers], batch_size):
+    refused += Voucher.objects.filter(reversal_of__in=chunk).values_list('reversal_of__voucher_number', flat=True)
+  if refused:
+    raise ValidationError(f'only approved vouchers not yet reversed can be reversed: {", ".join(refused[:5])}')
+  ledgers: Dict[int, List[Ledger]] = {}
+  for chunk in _chunks([voucher.pk for voucher in vouchers], batch_size):
+    for ledger in Ledger.objects.filter(voucher_id__in=chunk).order_by('id'):
+      ledgers.setdefault(ledger.voucher_id, []).append(Ledger(
+        account_id=ledger.account_id,
+        amount=-ledger.amount,
+        currency=ledger.currency,
+        currency_amount=None if ledger.currency_amount is None else -ledger.currency_amount,
+      ))
+  return post_vouchers([
+    (Voucher(
+      voucher_date=voucher_date or voucher.voucher_date,
+      voucher_type=voucher_type or voucher.voucher_type,
+      description=f'Reversal of {voucher}',
+      status=Voucher.Status.APPROVED,
+      reversal_of=voucher,
+    ), ledgers.get(voucher.pk, []))
+    for voucher in vouchers
+  ], batch_size=batch_size, check_duplicates=False)
+
+def correct_voucher(voucher: Voucher, ledgers: List[Ledger], voucher_date=None, **fields) -> Tuple[Voucher, Voucher]:
+  """reverses an approved voucher and posts its corrected replacement, returns both"""
+  with transaction.atomic():
+    reversal, = reverse_vouchers([voucher], voucher_date)
+    correction = Voucher(
+      voucher_date=voucher_date or voucher.voucher_date,
+      voucher_type=voucher.voucher_type,
+      description=voucher.description,
+      status=Voucher.Status.APPROVED,
+    )
+    for name, value in fields.items():
+      setattr(correction, name, value)
+    post_vouchers([(correction, ledgers)])
+  return reversal, correction
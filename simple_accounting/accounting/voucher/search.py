@@ -0,0 +1,74 @@
+from django.db import models
+from accounting.utils import prefix_range, tokenize
+from accounting.account.models import AccountNameToken
+from .models import VoucherType, Voucher, Ledger, VoucherSearchToken, voucher_fulltext
+
+class Match(models.Func):
+  """MySQL MATCH ... AGAINST in boolean mode, served by the voucher FULLTEXT index"""
+
+  template = 'MATCH (%(expressions)s) AGAINST (%(query)s IN BOOLEAN MODE)'
+  output_field = models.FloatField()
+
+  def __init__(self, *expressions, query, **extra):
+    super().__init__(*expressions, **extra)
+    self.query = query
+
+  def as_sql(self, compiler, connection, **extra_context):
+    sql, params = super().as_sql(compiler, connection, query='%s', **extra_context)
+    return sql, (*params, self.query)
+
+def _number_prefix(term: str) -> models.Q:
+  # numbers are usually typed in lower case, their prefixes are upper case
+  condition = models.Q()
+  for number in dict.fromkeys((term, term.upper())):
+    condition |= prefix_range('voucher_number', number)
+  return condition
+
+def _rank(term: str):
+  return models.Case(
+    models.When(voucher_number__in=list(dict.fromkeys((term, term.upper()))), then=models.Value(0)),
+    models.When(_number_prefix(term), then=models.Value(1)),
+    default=models.Value(2),
+    output_field=models.IntegerField(),
+  )
+
+def _type_ids(types, token: str):
+  return [pk for pk, words in types if any(word.startswith(token) for word in words)]
+
+def _text_matches(token: str) -> models.Q:
+  """vouchers whose number or description has a word starting with token"""
+  if voucher_fulltext():
+    return models.Q(pk__in=Voucher.objects.alias(match=Match('voucher_number', 'description', query=f'+{token}*')).filter(match__gt=0).values('pk'))
+  return models.Q(pk__in=VoucherSearchToken.objects.filter(prefix_range('token', token)).values('voucher_id'))
+
+def _account_matches(token: str) -> models.Q:
+  """vouchers with a ledger on an account whose name has a word starting with token"""
+  accounts = AccountNameToken.objects.filter(prefix_range('token', token)).values('account_id')
+  return models.Q(pk__in=Ledger.objects.filter(account_id__in=accounts).values('voucher_id'))
+
+def search_vouchers(term: str, queryset=None):
+  """
+  Vouchers matching term: voucher number prefixes, or every word of term
+  starting a word of the voucher number, description, voucher type name or
+  the name of an account on its ledgers. Exact numbers rank first, then
+  number prefixes, then the most recent vouchers.
+  """
+  queryset = Voucher.objects.all() if queryset is None else queryset
+  term = term.strip()
+  if not term:
+    return queryset
+  condition = _number_prefix(term)
+  tokens = tokenize(term)
+  if tokens:
+    # voucher types are few, their names are matched here instead of indexed
+    types = [(pk, tokenize(name)) for pk, name in VoucherType.objects.values_list('pk', 'name')]
+    words = models.Q()
+    for token in tokens:
+      words &= _text_matches(token) | models.Q(voucher_type_id__in=_type_ids(types, token)) | _account_matches(token)
+    condition |= words
+  return (
+    queryset
+      .filter(condition)
+      .annotate(search_rank=_rank(term))
+      .order_by('search_rank', '-voucher_date', '-pk')
+  )
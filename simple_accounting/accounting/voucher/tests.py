@@ -1,8 +1,22 @@
-from django.test import TestCase
-from .models import VoucherType, Voucher, Account, Ledger
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from .models import VoucherType, Voucher, Account, Ledger, ImmutableVoucher, DuplicateVoucher, signed_amount
+from .posting import post_vouchers, post_ledgers, reverse_vouchers, correct_voucher
+from .search import search_vouchers
+from .loader import LedgerRow, load_vouchers, tsv_value
+from accounting.journal.models import JournalEntry
+from accounting.entity.models import Entity
+from accounting.utils import fingerprint
 from .forms import VoucherTypeForm, VoucherForm, LedgerForm, LedgerInlineFormset
 from .models import Account, VoucherType, Voucher, Ledger
 import datetime
+from decimal import Decimal
+from django.db import models
 
 class VoucherTypeFormTest(TestCase):
 
@@ -202,6 +216,18 @@ class LedgerModelTest(TestCase):
     ledger.save()
     self.assertEqual(str(ledger), f'{ledger.voucher.voucher_number} - {ledger.account.name}')
 
+  def test_accounts_of_other_entities_are_refused(self):
+    """saving or bulk posting a ledger on another entity's account fails"""
+    branch = Account(name="Branch Cash", account_number="9.1", account_type=Account.AccountTypes.ASSET, entity=Entity.objects.create(code="B", name="Branch"))
+    branch.save()
+    with self.assertRaisesMessage(ValidationError, 'Accounts of other entities'):
+      Ledger(voucher=self.voucher, account=branch, amount=100).save()
+    with self.assertRaisesMessage(ValidationError, 'Accounts of other entities'):
+      post_ledgers(self.voucher, [Ledger(account_id=branch.pk, amount=100), Ledger(account=self.cash, amount=-100)])
+    with self.assertRaisesMessage(ValidationError, 'Accounts of other entities'):
+      post_vouchers([(Voucher(voucher_date="2022-01-02", voucher_type=self.vtype), [Ledger(account_id=branch.pk, amount=100), Ledger(account=self.cash, amount=-100)])])
+    self.assertFalse(Ledger.objects.filter(account=branch).exists())
+
 class LedgerInlineFormsetTest(TestCase):
 
   def setUp(self):
@@ -280,6 +306,68 @@ class LedgerInlineFormsetTest(TestCase):
     formset = LedgerInlineFormset(self.prepare_form_data(ledgers, 'ledgers'))
     self.assertFalse(formset.is_valid())
 
+  def test_negative_amounts_balance_by_sign(self):
+    """a negative debit account amount is a credit"""
+    ledgers = [{"account": self.cash.pk, "amount": -300}, {"account": self.bank.pk, "amount": 300}]
+    data = {**self.prepare_form_data(ledgers, 'ledgers'), 'ledgers-TOTAL_FORMS': '2'}
+    self.assertTrue(LedgerInlineFormset(data).is_valid())
+    data['ledgers-1-account'] = self.revenue.pk
+    self.assertFalse(LedgerInlineFormset(data).is_valid())
+
+class LargeVoucherFormsetTest(TestCase):
+
+  def setUp(self):
+    self.cash = Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET)
+    self.wages = Account(name="Wages", account_number="5.1", account_type=Account.AccountTypes.EXPENSE)
+    self.cash.save()
+    self.wages.save()
+    self.vtype = VoucherType(name="Payroll", prefix="PR")
+    self.vtype.save()
+    self.voucher, = post_vouchers([(
+      Voucher(voucher_date="2022-01-31", voucher_type=self.vtype),
+      [Ledger(account=account, amount=amount) for _ in range(150) for account, amount in ((self.wages, 10), (self.cash, -10))],
+    )])
+    self.voucher = Voucher.objects.get(pk=self.voucher.pk)
+
+  def prepare_form_data(self, ledgers, extra=()):
+    data = {'ledgers-TOTAL_FORMS': str(len(ledgers) + len(extra)), 'ledgers-INITIAL_FORMS': str(len(ledgers))}
+    for i, ledger in enumerate([*ledgers, *extra]):
+      for name in ('id', 'account', 'amount', 'DELETE'):
+        value = getattr(ledger, f'{name}_id' if name == 'account' else name, None) if isinstance(ledger, Ledger) else ledger.get(name)
+        if value not in (None, False):
+          data[f'ledgers-{i}-{name}'] = value
+    return data
+
+  def test_validates_and_saves_in_bulk(self):
+    """queries don't grow with the number of ledgers"""
+    ledgers = list(self.voucher.ledgers.order_by('id'))
+    ledgers[0].amount = 15
+    ledgers[2].DELETE = True
+    data = self.prepare_form_data(ledgers, [{'account': self.wages.pk, 'amount': 10}, {'account': self.cash.pk, 'amount': -5}])
+    with self.assertNumQueries(5):
+      formset = LedgerInlineFormset(data, instance=self.voucher)
+      self.assertTrue(formset.is_valid())
+    with self.assertNumQueries(21):
+      formset.save()
+    self.assertEqual((len(formset.new_objects), len(formset.changed_objects), len(formset.deleted_objects)), (2, 1, 1))
+    self.assertEqual(self.voucher.ledgers.count(), 301)
+    self.assertEqual(Ledger.objects.get(pk=ledgers[0].pk).amount, 15)
+    self.assertEqual(self.voucher.ledgers.aggregate(total=models.Sum(signed_amount()))['total'], 0)
+    self.assertTrue(all(ledger.pk for ledger in formset.new_objects))
+
+  def test_pages_balance_against_the_other_pages(self):
+    """one page is edited, the rest of the voucher counts toward the balance"""
+    paginated = type('PaginatedFormset', (LedgerInlineFormset,), {'page_size': 10, 'page_number': 2})
+    page = list(self.voucher.ledgers.order_by('id')[10:20])
+    page[0].amount = 15
+    formset = paginated(self.prepare_form_data(page), instance=self.voucher)
+    self.assertEqual(formset.page.paginator.num_pages, 30)
+    self.assertFalse(formset.is_valid())
+    formset = paginated(self.prepare_form_data(page, [{'account': self.cash.pk, 'amount': -5}]), instance=self.voucher)
+    self.assertTrue(formset.is_valid())
+    formset.save()
+    self.assertEqual(self.voucher.ledgers.count(), 301)
+
 class VoucherModelTest(TestCase):
 
   def setUp(self):
@@ -385,3 +473,276 @@ class VoucherModelTest(TestCase):
     voucher = Voucher(**self.voucher_data)
     voucher.save()
     self.assertEqual(str(voucher), voucher.voucher_number)
+
+class MinorUnitAmountTest(TestCase):
+
+  def setUp(self):
+    self.cash = Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET)
+    self.revenue = Account(name="Revenue", account_number="3.1", account_type=Account.AccountTypes.REVENUE)
+    self.cash.save()
+    self.revenue.save()
+    self.vtype = VoucherType(name="Sale Voucher", prefix="SV")
+    self.vtype.save()
+    self.voucher = Voucher(voucher_date="2022-01-01", voucher_type=self.vtype)
+    self.voucher.save()
+    Ledger(voucher=self.voucher, account=self.cash, amount=Decimal('12.345678')).save()
+    Ledger(voucher=self.voucher, account=self.revenue, amount=Decimal('12.345678')).save()
+
+  def test_amounts_are_stored_as_scaled_integers(self):
+    """amounts round trip as Decimal and are stored as minor units"""
+    ledger = Ledger.objects.get(account=self.cash)
+    self.assertEqual(ledger.amount, Decimal('12.345678'))
+    self.assertEqual(Ledger.objects.filter(account=self.cash).values_list('amount__minor', flat=True).get(), 12345678)
+    self.assertEqual(Ledger.objects.aggregate(total=models.Sum('amount'))['total'], Decimal('24.691356'))
+    self.assertTrue(Ledger.objects.filter(amount__gt=12).exists())
+
+  def test_form_accepts_decimal_amounts(self):
+    """ledger form keeps six decimal places"""
+    self.assertTrue(LedgerForm({'voucher': self.voucher.pk, 'account': self.cash.pk, 'amount': '0.000001'}).is_valid())
+    self.assertFalse(LedgerForm({'voucher': self.voucher.pk, 'account': self.cash.pk, 'amount': '0.0000001'}).is_valid())
+
+  def test_voucher_amount_is_summed_in_the_database(self):
+    """voucher amount is one aggregate, or none when annotated"""
+    with self.assertNumQueries(1):
+      self.assertEqual(self.voucher.amount, Decimal('12.345678'))
+    voucher = Voucher.objects.with_amount().get(pk=self.voucher.pk)
+    with self.assertNumQueries(0):
+      self.assertEqual(voucher.amount, Decimal('12.345678'))
+    voucher = Voucher.objects.prefetch_related('ledgers__account').get(pk=self.voucher.pk)
+    with self.assertNumQueries(0):
+      self.assertEqual(voucher.amount, Decimal('12.345678'))
+
+class ImmutableVoucherTest(TestCase):
+
+  def setUp(self):
+    self.cash = Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET)
+    self.revenue = Account(name="Revenue", account_number="3.1", account_type=Account.AccountTypes.REVENUE)
+    self.cash.save()
+    self.revenue.save()
+    self.vtype = VoucherType(name="Sale Voucher", prefix="SV")
+    self.vtype.save()
+    self.voucher = Voucher(voucher_date="2022-01-01", voucher_type=self.vtype, status=Voucher.Status.APPROVED)
+    self.voucher.save()
+    Ledger(voucher=self.voucher, account=self.cash, amount=100).save()
+    Ledger(voucher=self.voucher, account=self.revenue, amount=100).save()
+    self.voucher = Voucher.objects.get(pk=self.voucher.pk)
+
+  def balance(self, account):
+    return Ledger.objects.filter(account=account).aggregate(total=models.Sum('amount'))['total']
+
+  def test_approved_vouchers_are_read_only(self):
+    """saves, updates, deletes and forms are refused once approved"""
+    self.voucher.description = "changed"
+    self.assertRaises(ImmutableVoucher, self.voucher.save)
+    self.assertRaises(ImmutableVoucher, self.voucher.delete)
+    self.assertRaises(ImmutableVoucher, Voucher.objects.filter(pk=self.voucher.pk).update, description="changed", __v=2)
+    self.assertRaises(ImmutableVoucher, Voucher.objects.all().delete)
+    ledger = self.voucher.ledgers.first()
+    ledger.amount = 50
+    self.assertRaises(ImmutableVoucher, ledger.save)
+    form = VoucherForm({'voucher_date': '2022-01-02', 'voucher_type': self.vtype.pk, 'status': Voucher.Status.APPROVED}, instance=self.voucher)
+    self.assertFalse(form.is_valid())
+
+  def test_ledgers_can_only_be_added_while_posting(self):
+    """new ledgers, bulk updates and deletes of approved vouchers are refused too"""
+    self.assertRaises(ImmutableVoucher, Ledger(voucher=self.voucher, account=self.cash, amount=5).save)
+    self.assertRaises(ImmutableVoucher, post_ledgers, self.voucher, [Ledger(account=self.cash, amount=5)])
+    self.assertRaises(ImmutableVoucher, Ledger.objects.filter(voucher=self.voucher).update, amount=5)
+    self.assertRaises(ImmutableVoucher, Ledger.objects.filter(account=self.cash).delete)
+    self.assertRaises(models.ProtectedError, self.cash.delete)
+    self.assertRaises(models.ProtectedError, self.vtype.delete)
+    self.assertEqual(self.balance(self.cash), 100)
+
+  def test_pending_vouchers_can_be_approved(self):
+    """updates that approve pending vouchers still go through"""
+    pending = Voucher(voucher_date="2022-01-01", voucher_type=self.vtype)
+    pending.save()
+    self.assertEqual(Voucher.objects.filter(pk=pending.pk).update(status=Voucher.Status.APPROVED, __v=2), 1)
+    with self.settings(ACCOUNTING_IMMUTABLE_APPROVED_VOUCHERS=False):
+      self.assertEqual(Voucher.objects.filter(pk=pending.pk).update(description="edited", __v=2), 1)
+
+  def test_corrections_are_reversal_plus_new_voucher(self):
+    """a correction reverses the original and posts the replacement"""
+    reversal, correction = correct_voucher(self.voucher, [
+      Ledger(account=self.cash, amount=120), Ledger(account=self.revenue, amount=120),
+    ])
+    self.assertEqual(reversal.reversal_of, self.voucher)
+    self.assertEqual(self.voucher.reversal, reversal)
+    self.assertEqual(sorted(reversal.ledgers.values_list('amount', flat=True)), [-100, -100])
+    self.assertEqual(correction.status, Voucher.Status.APPROVED)
+    self.assertEqual((self.balance(self.cash), self.balance(self.revenue)), (120, 120))
+    self.assertRaises(ValidationError, reverse_vouchers, [self.voucher])
+    self.assertRaises(ValidationError, reverse_vouchers, [reversal])
+
+class VoucherSearchTest(TestCase):
+
+  def setUp(self):
+    self.cash = Account(name="Petty Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET)
+    self.rent = Account(name="Office Rent", account_number="5.1", account_type=Account.AccountTypes.EXPENSE)
+    self.cash.save()
+    self.rent.save()
+    self.sales = VoucherType(name="Sale Voucher", prefix="SV")
+    self.payments = VoucherType(name="Payment", prefix="PV")
+    self.sales.save()
+    self.payments.save()
+    self.sale = self.post(self.sales, "2022-01-01", "Invoice 1042 for Café Müller")
+    self.payment = self.post(self.payments, "2022-02-01", "Rent for February", self.rent)
+
+  def post(self, voucher_type, on, description, account=None):
+    voucher = Voucher(voucher_date=on, voucher_type=voucher_type, description=description)
+    voucher.save()
+    Ledger(voucher=voucher, account=account or self.cash, amount=10).save()
+    return voucher
+
+  def test_tokens_follow_descriptions(self):
+    """numbers and descriptions are tokenized on save and update"""
+    self.assertEqual(sorted(self.sale.search_tokens.values_list('token', flat=True)), ['0001', '1042', 'cafe', 'for', 'invoice', 'muller'])
+    Voucher.objects.filter(pk=self.sale.pk).update(description="Refund", __v=2)
+    self.assertEqual(sorted(self.sale.search_tokens.values_list('token', flat=True)), ['0001', 'refund'])
+
+  def test_matches_every_word(self):
+    """words match descriptions, type names and account names"""
+    self.assertEqual(list(search_vouchers('cafe inv')), [self.sale])
+    self.assertEqual(list(search_vouchers('payment febr')), [self.payment])
+    self.assertEqual(list(search_vouchers('office')), [self.payment])
+    self.assertEqual(list(search_vouchers('petty')), [self.sale])
+    self.assertEqual(list(search_vouchers('for')), [self.payment, self.sale])
+    self.assertEqual(list(search_vouchers('voice')), [])
+
+  def test_exact_number_ranks_first(self):
+    """exact numbers come first, then the most recent vouchers"""
+    other = self.post(self.sales, "2022-03-01", "Invoice for SV-0001 customer")
+    self.assertEqual(list(search_vouchers('sv-0001')), [self.sale, other])
+    self.assertEqual(list(search_vouchers('SV-')), [other, self.sale])
+    self.assertEqual(list(search_vouchers('0001')), [other, self.payment, self.sale])
+
+  def test_bulk_posted_vouchers_are_indexed(self):
+    """post_vouchers writes tokens for the whole batch"""
+    voucher, = post_vouchers([(Voucher(voucher_date="2022-04-01", voucher_type=self.sales, description="Quarterly dues"), [])])
+    self.assertEqual(list(search_vouchers('quarter')), [voucher])
+
+class DuplicateVoucherTest(TestCase):
+
+  def setUp(self):
+    self.cash = Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET)
+    self.revenue = Account(name="Revenue", account_number="3.1", account_type=Account.AccountTypes.REVENUE)
+    self.cash.save()
+    self.revenue.save()
+    self.vtype = VoucherType(name="Sale Voucher", prefix="SV")
+    self.vtype.save()
+
+  def post(self, *amounts, voucher_date="2022-01-01"):
+    voucher, = post_vouchers([(
+      Voucher(voucher_date=voucher_date, voucher_type=self.vtype),
+      [Ledger(account=account, amount=amount) for amount in amounts for account in (self.cash, self.revenue)],
+    )])
+    return voucher
+
+  def test_same_content_is_warned_about(self):
+    """the fingerprint ignores line order and descriptions"""
+    first = self.post(100, 50)
+    with self.assertLogs('accounting.voucher.duplicates', 'WARNING'):
+      second = self.post(50, 100)
+    self.assertEqual(first.fingerprint, second.fingerprint)
+    self.assertNotEqual(first.fingerprint, self.post(100, 50, voucher_date="2022-01-02").fingerprint)
+
+  @override_settings(ACCOUNTING_DUPLICATE_VOUCHERS='reject')
+  def test_rejects_within_the_window(self):
+    """only recent live vouchers count as originals"""
+    first = self.post(100)
+    self.assertRaises(DuplicateVoucher, self.post, 100)
+    self.assertEqual(Voucher.objects.count(), 1)
+    Voucher.objects.filter(pk=first.pk).update(created_at=timezone.now() - datetime.timedelta(days=2), __v=2)
+    second = self.post(100)
+    Voucher.objects.filter(pk=second.pk).update(status=Voucher.Status.APPROVED, __v=2)
+    reverse_vouchers([Voucher.objects.get(pk=second.pk)])
+    self.post(100)
+
+  def test_fingerprints_follow_ledger_and_date_changes(self):
+    """single ledger saves and date changes refresh the stored fingerprint"""
+    voucher = self.post(100)
+    ledger = voucher.ledgers.first()
+    ledger.amount = 70
+    ledger.save()
+    other = self.post(100)
+    self.assertNotEqual(Voucher.objects.get(pk=voucher.pk).fingerprint, other.fingerprint)
+    voucher = Voucher.objects.get(pk=voucher.pk)
+    voucher.voucher_date = datetime.date(2022, 2, 1)
+    voucher.save()
+    lines = voucher.ledgers.values_list('account_id', 'amount')
+    self.assertEqual(Voucher.objects.get(pk=voucher.pk).fingerprint, fingerprint(datetime.date(2022, 2, 1), self.vtype.pk, lines))
+
+  def test_command_groups_duplicates_across_history(self):
+    """one GROUP BY finds every fingerprint posted more than once"""
+    with self.settings(ACCOUNTING_DUPLICATE_VOUCHERS=''):
+      first, second, _ = self.post(100), self.post(100), self.post(200)
+      rejected = self.post(200)
+    Voucher.objects.filter(pk=rejected.pk).update(status=Voucher.Status.REJECTED, __v=2)
+    out = StringIO()
+    call_command('find_duplicate_vouchers', '--refresh', stdout=out)
+    self.assertIn(f'2 vouchers {first.fingerprint[:12]}: {first}, {second}', out.getvalue())
+    self.assertIn('1 duplicate groups', out.getvalue())
+
+
+class LoaderTest(TestCase):
+
+  def setUp(self):
+    self.cash = Account(name="Cash", account_number="1.1", account_type=Account.AccountTypes.ASSET)
+    self.revenue = Account(name="Revenue", account_number="3.1", account_type=Account.AccountTypes.REVENUE)
+    self.cash.save()
+    self.revenue.save()
+    self.vtype = VoucherType(name="Sale Voucher", prefix="SV")
+    self.vtype.save()
+
+  def rows(self, reference, amount, **fields):
+    return [
+      LedgerRow(reference, fields.get("voucher_date", "2021-03-01"), fields.get("voucher_type", "SV"), "1.1", amount, description="Opening sales"),
+      LedgerRow(reference, fields.get("voucher_date", "2021-03-01"), fields.get("voucher_type", "SV"), fields.get("account", "3.1"), fields.get("credit", amount)),
+    ]
+
+  def test_loads_vouchers_like_posting(self):
+    """staged rows become numbered, fingerprinted and searchable vouchers"""
+    with self.captureOnCommitCallbacks(execute=True):
+      load = load_vouchers(self.rows("a", Decimal("100.25")) + self.rows("b", 40))
+    self.assertEqual(load, (2, 4))
+    self.assertEqual(JournalEntry.objects.filter(model='accounting.voucher').count(), 2)
+    first, second = Voucher.objects.order_by('pk')
+    self.assertEqual((first.voucher_number, second.voucher_number), ("SV-0001", "SV-0002"))
+    self.assertEqual(first.status, Voucher.Status.APPROVED)
+    self.assertEqual(first.description, "Opening sales")
+    self.assertEqual(sorted(first.ledgers.values_list('amount', flat=True)), [Decimal("100.25"), Decimal("100.25")])
+    posted, = post_vouchers([(
+      Voucher(voucher_date="2021-03-01", voucher_type=self.vtype),
+      [Ledger(account=self.cash, amount=40), Ledger(account=self.revenue, amount=40)],
+    )], check_duplicates=False)
+    self.assertEqual(Voucher.objects.get(pk=second.pk).fingerprint, posted.fingerprint)
+    self.assertEqual(list(search_vouchers("opening")), [second, first])
+
+  def test_refuses_invalid_rows_set_based(self):
+    """unknown accounts and types, unbalanced vouchers and mixed headers load nothing"""
+    for rows, message in (
+      (self.rows("a", 10, account="9.9"), "unknown accounts: 9.9"),
+      (self.rows("a", 10, voucher_type="XX"), "unknown voucher types: XX"),
+      (self.rows("a", 10) + self.rows("b", 10, credit=9), "unbalanced vouchers: b"),
+      (self.rows("a", 10) + self.rows("a", 10, voucher_date="2021-03-02"), "another date"),
+      ([LedgerRow("a", "2021-03-01", "SV", "1.1", None)], "amount is missing"),
+    ):
+      with self.assertRaisesMessage(ValidationError, message):
+        load_vouchers(rows)
+    self.assertEqual((Voucher.objects.count(), Ledger.objects.count()), (0, 0))
+    load_vouchers(self.rows("a", 10))
+    self.assertEqual(Voucher.objects.get().voucher_number, "SV-0001")
+
+  def test_command_loads_csv(self):
+    """the command reads ledgers from a CSV with a header row"""
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+      file.write("reference,voucher_date,voucher_type,account,amount,description\n1,2021-03-01,SV,1.1,5,Till\n1,2021-03-01,SV,3.1,5,\n")
+    self.addCleanup(os.remove, file.name)
+    out = StringIO()
+    call_command('load_vouchers', file.name, '--pending', stdout=out)
+    self.assertIn('loaded 1 vouchers and 2 ledgers', out.getvalue())
+    self.assertEqual(Voucher.objects.get().status, Voucher.Status.PENDING)
+
+  def test_escapes_native_bulk_text(self):
+    """COPY and LOAD DATA rows escape separators and mark NULL"""
+    self.assertEqual([tsv_value(value) for value in (None, "a\tb", "a\tb\nc\\", 5)], ["\\N", "a\\tb", "a\\tb\\nc\\\\", "5"])
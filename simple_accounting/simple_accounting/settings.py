@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounting.middleware.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,9 +85,102 @@ DATABASES = {
         'PORT': '3306',
         'USERNAME': 'hridoy',
         'PASSWORD': '1234',
-    }
+    },
+    # only accounting.voucher.loader connects with local_infile, to stage
+    # rows with LOAD DATA LOCAL INFILE
+    'bulk_load': {
+        'ENGINE': 'django.db.backends.mysql',
+        'NAME': 'simple_accounting',
+        'HOST': 'localhost',
+        'PORT': '3306',
+        'USERNAME': 'hridoy',
+        'PASSWORD': '1234',
+        'OPTIONS': {
+            'local_infile': 1,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+# The reporting replica is set per deployment: REPORTING_DB_HOST (and
+# REPORTING_DB_PORT) name the MySQL replica of default. Without it reporting
+# reads stay on default; an alias with default's ENGINE/NAME/HOST/PORT is
+# treated the same way.
+
+if os.environ.get('REPORTING_DB_HOST'):
+    DATABASES['reporting'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['REPORTING_DB_HOST'],
+        'PORT': os.environ.get('REPORTING_DB_PORT', DATABASES['default']['PORT']),
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+
+DATABASE_ROUTERS = ['accounting.routers.ReportingRouter']
+
+# Reads inside accounting.routers.reporting_reads() go to the replica unless
+# it lags behind by more than ACCOUNTING_REPLICA_MAX_LAG seconds, or the
+# session posted within the last ACCOUNTING_REPLICA_STICKY_SECONDS.
+
+ACCOUNTING_REPLICA_ALIAS = 'reporting'
+
+ACCOUNTING_REPLICA_MAX_LAG = 5
+
+ACCOUNTING_REPLICA_STICKY_SECONDS = 10
+
+# accounting.voucher.loader runs loads on this alias when it is configured;
+# a load called inside a transaction on default stays on default
+
+ACCOUNTING_BULK_LOAD_ALIAS = 'bulk_load'
+
+# Ledger.amount is kept in this currency, ExchangeRate.rate converts into it
+
+ACCOUNTING_BASE_CURRENCY = 'USD'
+
+# Equity account number receiving the net income when a year is closed
+
+ACCOUNTING_RETAINED_EARNINGS_ACCOUNT = None
+
+# Approved vouchers are read-only, corrections are posted as a reversal
+# voucher plus a new one, so figures over approved vouchers never change
+
+ACCOUNTING_IMMUTABLE_APPROVED_VOUCHERS = True
+
+# On MySQL voucher search uses a FULLTEXT index instead of the token table
+
+ACCOUNTING_VOUCHER_FULLTEXT = True
+
+# Hot path metrics are kept per process; with several workers, point
+# ACCOUNTING_METRICS_DIR at a directory they share so /metrics sums them.
+# Scrapers authenticate with "Authorization: Bearer <ACCOUNTING_METRICS_TOKEN>".
+
+ACCOUNTING_METRICS_DIR = None
+
+ACCOUNTING_METRICS_FLUSH_SECONDS = 5
+
+ACCOUNTING_METRICS_TOKEN = None
+
+# The ledger inline of the voucher admin edits this many ledgers per page,
+# balancing them against the ledgers on the other pages
+
+ACCOUNTING_LEDGER_PAGE_SIZE = 100
+
+# Posted vouchers whose date, type and lines match a live voucher created
+# within ACCOUNTING_DUPLICATE_WINDOW_HOURS are logged ('warn'), refused
+# ('reject') or let through ('')
+
+ACCOUNTING_DUPLICATE_VOUCHERS = 'warn'
+
+ACCOUNTING_DUPLICATE_WINDOW_HOURS = 24
+
+# Group consolidation computes the entities' trial balances on this many
+# threads, each reading from a reporting replica over its own connection
+
+ACCOUNTING_CONSOLIDATION_WORKERS = 4
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
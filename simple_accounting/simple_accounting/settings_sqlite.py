@@ -0,0 +1,20 @@
+"""
+Local settings with the primary and the reporting replica as two SQLite
+files, e.g. `python manage.py test --settings=simple_accounting.settings_sqlite`
+"""
+
+from .settings import *
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    'reporting': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'reporting.sqlite3',
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
@@ -14,8 +14,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+from accounting.metrics.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/', include('accounting.api.urls')),
+    path('reports/', include('accounting.statements.urls')),
+    path('metrics', metrics, name='metrics'),
 ]